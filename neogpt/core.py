@@ -4,11 +4,18 @@ This class is in development and will fully be replacing manager.py in the futur
 
 import json
 import os
+import threading
 from datetime import datetime
+from itertools import islice
 
 from interface import terminal_chat
 from llm.llm import LLM
-from loaders.dirloader import DirectoryLoader
+from loaders.dirloader import (
+    CharacterTextSplitter,
+    DirectoryLoader,
+    TokenTextSplitter,
+)
+from loaders.manifest import IngestionManifest
 from machine.machine import Machine
 from playground import playground
 from prompts.prompt import PROMPT
@@ -18,6 +25,7 @@ from server import server
 from settings import Settings
 from utils.cprint import cprint
 from vectorstore.neostore import NeoStore
+from vectorstore.shards import ShardedNeoStore
 
 
 class NeoGPT:
@@ -40,9 +48,12 @@ class NeoGPT:
         persona=None,
         data_dir=None,
         show_source_document=False,
+        warm_up=False,
     ) -> None:
         """
         The NeoGPT class is the main class for the NeoGPT Project. It is used to interact with the model and build the vector database.
+
+        The vector database and its embedding model are loaded on the first message. Pass ``vector_db=False`` to chat without retrieval, or ``warm_up=True`` to load them in the background right away.
         """
         self.messages = [] if messages is None else messages
         self.offline = offline
@@ -61,6 +72,11 @@ class NeoGPT:
         self.machine = Machine(self) if machine is None else machine
         self.data_dir = Settings.DATA_DIR if data_dir is None else data_dir
         self.show_source_document = show_source_document
+        self._vector_db_lock = threading.Lock()
+        self._warm_up_thread = None
+
+        if warm_up:
+            self.warm_up()
 
     def chat(self, prompt=None, display=True, stream=False):
         """
@@ -139,27 +155,153 @@ class NeoGPT:
         """
         playground(self, *args, **kwargs)
 
-    def build(self, data_dir: str = Settings.DATA_DIR):
+    def build(
+        self,
+        data_dir: str = Settings.DATA_DIR,
+        chunking: str = "characters",
+        pdf_workers: int = 0,
+    ):
         """
-        This function is used to build the vector database.
+        This function is used to build the vector database. A NeoStore built before is updated with the added, modified and removed files only, unless it was built with another embedding model, index or quantization than the configured store.
+
+        Files are split into chunks of 1000 "characters", or of at most the maximum sequence length of the embedding model, in "tokens" or in "approximate-tokens" estimated from the number of characters.
+
+        The pages of a large PDF file are extracted by ``pdf_workers`` worker processes, 0 extracts them in-process.
         """
-        if isinstance(self.vector_db, NeoStore):
-            docs = DirectoryLoader(path=data_dir).load_in_chunks()
+        if not isinstance(self.vector_db, (NeoStore, ShardedNeoStore)):
+            return
+
+        splitter = (
+            CharacterTextSplitter()
+            if chunking == "characters"
+            else TokenTextSplitter.from_embedder(
+                self.vector_db.embeddings_model,
+                approximate=chunking == "approximate-tokens",
+            )
+        )
+        # Parse the files with one worker process per CPU.
+        loader = DirectoryLoader(
+            path=data_dir, num_workers=None, splitter=splitter, pdf_workers=pdf_workers
+        )
+
+        if isinstance(self.vector_db, ShardedNeoStore):
+            docs = loader.load_in_chunks()
             self.vector_db.build_store(docs=docs, persist=True)
             cprint("Vector Database built successfully.")
             return self.vector_db
 
+        store_path = NeoStore._resolve_store_path(Settings.VECTOR_STORE_DIR)
+        manifest = IngestionManifest.load(
+            f"{store_path}.ingestion.json",
+            splitter.chunk_size,
+            splitter.overlap_ratio,
+            splitter.name,
+            # A store built with another embedding model or index is rebuilt.
+            store=self.vector_db.build_config,
+        )
+        if not os.path.isdir(store_path):
+            manifest.files = {}
+
+        if manifest.files and self.vector_db.path != store_path:
+            self.vector_db = self._open_vector_db()
+        incremental = bool(manifest.files)
+
+        changes = manifest.scan(loader.list_files())
+        changed = changes.added + changes.modified
+
+        if not incremental and not changed:
+            cprint(f"No files found in {data_dir}.")
+            return self.vector_db
+
+        if not incremental:
+            # Stream the chunks into the store files, so memory does not grow with the corpus.
+            self.vector_db.build_store_streaming(
+                manifest.track(loader.lazy_load_chunks(file_paths=changed))
+            )
+        elif changed or changes.removed:
+            for file_path in changes.modified + changes.removed:
+                self.vector_db.delete_where(file_path=file_path)
+            # Append the chunks in blocks, so memory does not grow with the changed files.
+            chunks = manifest.track(loader.lazy_load_chunks(file_paths=changed))
+            while block := list(islice(chunks, 4096)):
+                self.vector_db.add_documents(block)
+        manifest.save()
+
+        cprint(
+            f"Vector Database built successfully. Re-indexed {len(changed)} files, skipped {len(changes.unchanged)} unchanged and removed {len(changes.removed)}."
+        )
+        return self.vector_db
+
+    def _open_vector_db(self):
+        """
+        This function is used to open the vector database saved on disk with the options of the configured one, such as its search mode, nprobe and embedding cache. The embedding model of the configured store is kept, without loading the default one.
+        """
+        configured = self.vector_db
+        options = {
+            "embedder": configured._embeddings_model,
+            "similarity_metric": configured.similarity_metric,
+            "search_mode": configured.search_mode,
+            "hybrid_weight": configured.hybrid_weight,
+            "query_cache_size": configured._results.maxsize,
+        }
+        if isinstance(configured, ShardedNeoStore):
+            return ShardedNeoStore.load_embeddings(
+                Settings.VECTOR_STORE_DIR,
+                num_workers=configured.num_workers,
+                **options,
+                **configured.store_kwargs,
+            )
+        return NeoStore.load_embeddings(
+            Settings.VECTOR_STORE_DIR,
+            nprobe=configured.nprobe,
+            rerank_factor=configured.rerank_factor,
+            compaction_threshold=configured.compaction_threshold,
+            embedding_cache=configured.embedding_cache,
+            embedding_model_name=configured.embedding_model_name,
+            encode_workers=configured.encode_workers,
+            **options,
+        )
+
+    def warm_up(self):
+        """
+        This function is used to load the vector database and its embedding model in a background thread, e.g. while the user types the first message.
+        """
+        if self._warm_up_thread is None:
+            self._warm_up_thread = threading.Thread(
+                target=self._load_vector_db,
+                kwargs={"load_embedder": True},
+                name="neogpt-warm-up",
+                daemon=True,
+            )
+            self._warm_up_thread.start()
+        return self._warm_up_thread
+
+    def _load_vector_db(self, load_embedder=False):
+        """
+        This function is used to load the vector database from disk if it is not loaded yet. A query waits here for a warm-up still in progress.
+        """
+        with self._vector_db_lock:
+            if (
+                isinstance(self.vector_db, (NeoStore, ShardedNeoStore))
+                and not self.vector_db.is_loaded
+            ):
+                try:
+                    self.vector_db = self._open_vector_db()
+                except FileNotFoundError:
+                    cprint(
+                        "No vector database found, chatting without retrieval. Run with --build to create one."
+                    )
+                    self.vector_db = None
+
+            if load_embedder and isinstance(self.vector_db, (NeoStore, ShardedNeoStore)):
+                # Accessing the embedding model loads it.
+                self.vector_db.embeddings_model
+
     def _engine(self):
         # Load embeddings if not already loaded
-        if (
-            isinstance(self.vector_db, NeoStore)
-            and self.vector_db._NeoStore__vectorstore is None
-        ):
-            embeddings_path = os.path.join(Settings.VECTOR_STORE_DIR, "neostore.npz")
-            self.vector_db = self.vector_db.load_embeddings(embeddings_path)
-            # print(f"Embeddings loaded: {self.vector_db}")
-
-        if isinstance(self.vector_db, NeoStore):
+        self._load_vector_db()
+
+        if isinstance(self.vector_db, (NeoStore, ShardedNeoStore)):
             query = self.messages[-1]["content"]
             relevant_docs = self.vector_db.search(query)  # Adjust k as needed
 
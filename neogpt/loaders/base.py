@@ -1,9 +1,59 @@
+import io
+from contextlib import contextmanager
+
+
 class BaseLoader:
-    def __init__(self, path: str):
+    # Whether consecutive segments of ``load_segments`` may share a chunk, e.g.
+    # the pages of a PDF. Chunks then carry the range of their segments.
+    merge_segments = True
+    # Separator joining the pieces of ``lazy_load`` in ``load``.
+    separator = "\n"
+
+    def __init__(self, path: str, fileobj=None):
         self.path = path
+        # Binary file object read instead of the file at path, e.g. an archive
+        # member. The path then only names the content.
+        self.fileobj = fileobj
 
     def load(self):
-        raise NotImplementedError("load method is not implemented")
+        """Load the whole content, joining the pieces of ``lazy_load`` once."""
+        return self.separator.join(self.lazy_load())
 
     def lazy_load(self):
-        return self.load()
+        """
+        Load the content in pieces of bounded size, e.g. pages or paragraphs.
+
+        Yields:
+            str: The text of every piece.
+        """
+        raise NotImplementedError("lazy_load method is not implemented")
+
+    def load_segments(self):
+        """
+        Load the content in segments, e.g. pages, with the metadata of each.
+
+        Yields:
+            Tuple[str, dict]: The text and metadata of every segment.
+        """
+        yield self.load(), {}
+
+    def _source(self):
+        """The file object to read, or else the path, for parsers accepting both."""
+        return self.path if self.fileobj is None else self.fileobj
+
+    @contextmanager
+    def _open_text(self, encoding: str = None, newline: str = None):
+        """Open the content as text."""
+        if self.fileobj is None:
+            with open(self.path, encoding=encoding, newline=newline) as f:
+                yield f
+            return
+
+        f = io.TextIOWrapper(
+            self.fileobj, encoding=encoding or "utf-8", errors="replace", newline=newline
+        )
+        try:
+            yield f
+        finally:
+            # Leave the file object open for its owner.
+            f.detach()
@@ -1,10 +1,19 @@
+import math
+import multiprocessing
 import os
 import time
+from bisect import bisect_left, bisect_right
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from typing import List, NamedTuple
 
-from loaders.file import LOADER_MAP
+from loaders.file import LOADER_MAP, PDFLoader, TableLoader
 from utils.cprint import cprint
 
+# Separator between the segments of a file, e.g. its pages, in the joined text.
+SEGMENT_SEPARATOR = "\n\n"
+
 
 class Document(NamedTuple):
     """
@@ -18,8 +27,18 @@ class Document(NamedTuple):
 class CharacterTextSplitter:
     """
     A utility class to split text into chunks based on specified parameters.
+
+    The text is split recursively: at paragraph breaks first, then at line
+    breaks, then at spaces, and only as a last resort between characters. The
+    resulting pieces are merged into chunks of at most ``chunk_size`` characters
+    that overlap by up to ``overlap_size`` characters. Each level scans the text
+    once and pieces are tracked as offsets, so splitting is linear in the length
+    of the text.
     """
 
+    # Unit of chunk sizes, recorded by the ingestion manifest.
+    name = "characters"
+
     def __init__(self, chunk_size: int = 1000, overlap_ratio: float = 0.2):
         """
         Initialize the CharacterTextSplitter.
@@ -29,9 +48,138 @@ class CharacterTextSplitter:
             overlap_ratio (float): The overlap ratio between consecutive chunks.
         """
         self.chunk_size = chunk_size
+        self.overlap_ratio = overlap_ratio
         self.overlap_size = int(chunk_size * overlap_ratio)
         self.separators = ["\n\n", "\n", " ", ""]
 
+    @property
+    def max_chunk_chars(self) -> int:
+        """Number of characters that always fit in a single chunk."""
+        return self.chunk_size
+
+    def _length_function(self, text: str):
+        """
+        Get the function measuring ``text[start:end]`` in units of ``chunk_size``.
+        """
+        return lambda start, end: end - start
+
+    def _split_pieces(self, text: str, start: int, end: int, length, level: int = 0):
+        """
+        Split ``text[start:end]`` into contiguous pieces of at most ``chunk_size``.
+
+        Pieces end after a separator, so no text is dropped and the pieces of a
+        chunk are contiguous.
+
+        Yields:
+            Tuple[int, int]: Start and end offsets of every piece.
+        """
+        if length(start, end) <= self.chunk_size:
+            yield start, end
+            return
+        yield from self._split_at_separator(text, start, end, length, level)
+
+    def _split_at_separator(self, text: str, start: int, end: int, length, level: int):
+        """Split ``text[start:end]`` at the separator of a level, see ``_split_pieces``."""
+        separator = self.separators[level]
+        if not separator:
+            # A window of chunk_size characters never has more than chunk_size tokens.
+            for piece_start in range(start, end, self.chunk_size):
+                yield piece_start, min(piece_start + self.chunk_size, end)
+            return
+
+        position = start
+        while position < end:
+            found = text.find(separator, position, end)
+            piece_end = end if found == -1 else found + len(separator)
+            if length(position, piece_end) > self.chunk_size:
+                yield from self._split_pieces(
+                    text, position, piece_end, length, level + 1
+                )
+            else:
+                yield position, piece_end
+            position = piece_end
+
+    @staticmethod
+    def _window_chunk(text: str, offset: int, window):
+        """The stripped chunk of the pieces in the window, or None if it is blank."""
+        start, end = window[0][0], window[-1][1]
+        chunk = text[start:end]
+        stripped = chunk.strip()
+        if not stripped:
+            return None
+        start += offset + len(chunk) - len(chunk.lstrip())
+        return stripped, start, start + len(stripped)
+
+    def split_text(self, text: str) -> list[tuple[str, int, int]]:
+        """
+        Split the given text into chunks, keeping their position in the text.
+
+        Args:
+            text (str): The text to be split into chunks.
+
+        Returns:
+            List[Tuple[str, int, int]]: Every chunk with its start and end
+            character offsets in ``text``, stripped of surrounding whitespace.
+        """
+        return list(self.split_segments([text]))
+
+    def split_segments(self, texts, separator: str = "\n\n"):
+        """
+        Split texts joined by a separator, e.g. the pages of a document, one at a time.
+
+        The joined text is never built: only the current text and the pieces
+        carried over from the previous ones as the overlap of the next chunk are
+        held. Texts are split at the separator between them, like paragraphs.
+
+        Args:
+            texts (Iterable[str]): The texts, in order.
+            separator (str): The separator joining consecutive texts.
+
+        Yields:
+            Tuple[str, int, int]: Every chunk with its start and end character
+            offsets in the joined text, stripped of surrounding whitespace.
+        """
+        texts = iter(texts)
+        text = next(texts, None)
+        single = True
+        # The joined text from offset on, and the pieces of the next chunk in it.
+        buffer, offset = "", 0
+        window = deque()
+
+        while text is not None:
+            following = next(texts, None)
+            single = single and following is None
+            start = len(buffer)
+            buffer += text if following is None else text + separator
+            length = self._length_function(buffer)
+            pieces = (
+                self._split_pieces(buffer, start, len(buffer), length)
+                if single
+                # The joined text is split at its separators first.
+                else self._split_at_separator(buffer, start, len(buffer), length, 0)
+            )
+
+            for piece in pieces:
+                if window and length(window[0][0], piece[1]) > self.chunk_size:
+                    if chunk := self._window_chunk(buffer, offset, window):
+                        yield chunk
+                    # Carry the last pieces over into the next chunk as its overlap.
+                    while window and (
+                        length(window[0][0], window[-1][1]) > self.overlap_size
+                        or length(window[0][0], piece[1]) > self.chunk_size
+                    ):
+                        window.popleft()
+                window.append(piece)
+
+            # Text before the window is in no later chunk.
+            cut = window[0][0] if window else len(buffer)
+            buffer, offset = buffer[cut:], offset + cut
+            window = deque((piece_start - cut, piece_end - cut) for piece_start, piece_end in window)
+            text = following
+
+        if window and (chunk := self._window_chunk(buffer, offset, window)):
+            yield chunk
+
     def split_text_into_chunks(self, text: str) -> list[str]:
         """
         Split the given text into chunks using predefined separators or by lines.
@@ -42,15 +190,105 @@ class CharacterTextSplitter:
         Returns:
             List[str]: A list of chunks extracted from the text.
         """
-        chunks = []
-        text_length = len(text)
+        return [chunk for chunk, _, _ in self.split_text(text)]
+
+
+class TokenTextSplitter(CharacterTextSplitter):
+    """
+    A text splitter measuring chunks in tokens of the embedding model.
+
+    Chunks of at most the model's maximum sequence length are embedded without
+    truncation. The text is tokenized once and the tokens of a span are counted
+    from their offsets. The approximate mode skips tokenization and estimates
+    the number of tokens from the number of characters, for fast bulk builds.
+    """
+
+    def __init__(
+        self,
+        tokenizer=None,
+        chunk_size: int = 254,
+        overlap_ratio: float = 0.2,
+        chars_per_token: float = 4.0,
+    ):
+        """
+        Initialize the TokenTextSplitter.
+
+        Args:
+            tokenizer (PreTrainedTokenizerFast, optional): Tokenizer of the
+                embedding model. None estimates the number of tokens instead.
+            chunk_size (int): The maximum number of tokens of each chunk.
+            overlap_ratio (float): The overlap ratio between consecutive chunks.
+            chars_per_token (float): Average number of characters per token used
+                by the estimate.
+        """
+        super().__init__(chunk_size, overlap_ratio)
+        self.tokenizer = tokenizer
+        self.chars_per_token = chars_per_token
+        self.name = "tokens" if tokenizer is not None else "approximate-tokens"
+
+    @classmethod
+    def from_embedder(
+        cls, embedder, overlap_ratio: float = 0.2, approximate: bool = False
+    ):
+        """
+        Create a splitter sized to the maximum sequence length of an embedding model.
+
+        Args:
+            embedder (SentenceTransformer): The embedding model.
+            overlap_ratio (float): The overlap ratio between consecutive chunks.
+            approximate (bool): Whether to estimate the number of tokens.
+
+        Returns:
+            TokenTextSplitter: The splitter.
+        """
+        tokenizer = embedder.tokenizer
+        max_length = embedder.max_seq_length or tokenizer.model_max_length
+        # The special tokens added by the model count towards its limit.
+        chunk_size = max_length - tokenizer.num_special_tokens_to_add()
+        return cls(None if approximate else tokenizer, chunk_size, overlap_ratio)
+
+    @property
+    def max_chunk_chars(self) -> int:
+        if self.tokenizer is None:
+            return int(self.chunk_size * self.chars_per_token)
+        # A token spans at least one character.
+        return self.chunk_size
+
+    def _length_function(self, text: str):
+        if self.tokenizer is None:
+            return lambda start, end: math.ceil((end - start) / self.chars_per_token)
+
+        offsets = self.tokenizer(
+            text,
+            add_special_tokens=False,
+            return_offsets_mapping=True,
+            return_attention_mask=False,
+            verbose=False,
+        )["offset_mapping"]
+        starts = [token_start for token_start, _ in offsets]
+        # A token belongs to the span its first character is in.
+        return lambda start, end: bisect_left(starts, end) - bisect_left(starts, start)
+
+
+# Marks a file in flight that is processed in the main process.
+_IN_PROCESS = object()
 
-        for i in range(0, text_length, self.chunk_size - self.overlap_size):
-            end = min(i + self.chunk_size, text_length)
-            buffer = text[i:end].strip()
-            chunks.append(buffer)
+# Text splitter of the current worker process, sent once when it starts.
+_worker_splitter = None
 
-        return chunks
+
+def _init_worker(splitter) -> None:
+    global _worker_splitter
+    _worker_splitter = splitter
+
+
+def _process_file_worker(
+    file_path: str, chunk_size: int, overlap_ratio: float
+) -> list[Document]:
+    """Process a single file in a worker process."""
+    return DirectoryLoader(file_path, splitter=_worker_splitter)._process_file(
+        file_path, chunk_size, overlap_ratio
+    )
 
 
 class DirectoryLoader:
@@ -58,22 +296,44 @@ class DirectoryLoader:
     A data loader class to load data from files and process it in chunks.
     """
 
-    def __init__(self, path: str):
+    # Number of times a file may be in flight when a worker process dies before
+    # it is skipped as the likely cause.
+    max_crashes = 2
+    # Size in bytes above which a file is processed in-process and streamed
+    # instead of being parsed by a worker process.
+    max_pooled_file_size = 64 << 20
+
+    def __init__(
+        self, path: str, num_workers: int = 0, splitter=None, pdf_workers: int = 0
+    ):
         """
         Initialize the DataLoader with the file or directory path.
 
         Args:
             path (str): The path to the file or directory to load.
+            num_workers (int, optional): Number of worker processes parsing files
+                in parallel. 0 parses in-process and None uses every CPU.
+            splitter (CharacterTextSplitter, optional): Splitter used instead of a
+                CharacterTextSplitter of ``chunk_size`` characters, e.g. a
+                TokenTextSplitter.
+            pdf_workers (int, optional): Number of worker processes extracting the
+                pages of a PDF file parsed in-process, e.g. one larger than
+                ``max_pooled_file_size``. 0 extracts in-process.
         """
         self.path = path
         self.is_directory = os.path.isdir(path)  # Check if path is a directory
+        self.num_workers = num_workers
+        self.splitter = splitter
+        self.pdf_workers = pdf_workers
 
-    def _get_loader(self, file_path: str):
+    def _get_loader(self, file_path: str, splitter=None):
         """
         Get the appropriate loader for the file based on its extension.
 
         Args:
             file_path (str): The path to the file.
+            splitter (CharacterTextSplitter, optional): Splitter of the loaded
+                text. Table rows are batched to fit in one of its chunks.
 
         Returns:
             loader: An instance of the appropriate loader for the file.
@@ -82,6 +342,10 @@ class DirectoryLoader:
         loader_class = LOADER_MAP.get(file_ext)
         if not loader_class:
             print(f"No loader found for file extension {file_ext}")
+        if loader_class is not None and issubclass(loader_class, PDFLoader):
+            return loader_class(file_path, num_workers=self.pdf_workers)
+        if splitter is not None and issubclass(loader_class, TableLoader):
+            return loader_class(file_path, max_batch_length=splitter.max_chunk_chars)
         return loader_class(file_path)
 
     def _load_file(self, file_path: str) -> str:
@@ -118,32 +382,155 @@ class DirectoryLoader:
         Returns:
             List[Document]: A list of Document namedtuple containing content chunks and metadata.
         """
-        processed_file = 0
         if self.is_directory:
             start = time.time()
-            # print(os.path.abspath(self.path))
+            file_paths = self.list_files()
             documents = []
-            for root, _, files in os.walk(os.path.abspath(self.path)):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    documents.extend(
-                        self._process_file(file_path, chunk_size, overlap_ratio)
-                    )
-                    processed_file += 1
+            for file_documents in self._process_files(
+                file_paths, chunk_size, overlap_ratio
+            ):
+                documents.extend(file_documents)
             print(
-                f"Loaded {processed_file} files from : {self.path} in {time.time() - start:.2f} seconds"
+                f"Loaded {len(file_paths)} files from : {self.path} in {time.time() - start:.2f} seconds"
             )
             return documents
         else:
             print(f"Loaded 1 document from file: {self.path}")
             return self._process_file(self.path, chunk_size, overlap_ratio)
 
+    def list_files(self) -> list[str]:
+        """
+        List the files under the directory in a deterministic order.
+
+        Returns:
+            List[str]: Absolute file paths, sorted per directory.
+        """
+        if not self.is_directory:
+            return [os.path.abspath(self.path)]
+
+        file_paths = []
+        for root, dirs, files in os.walk(os.path.abspath(self.path)):
+            dirs.sort()
+            file_paths.extend(os.path.join(root, file) for file in sorted(files))
+        return file_paths
+
+    def _process_files(
+        self, file_paths: list[str], chunk_size: int, overlap_ratio: float
+    ):
+        """
+        Process files in order, in-process or with a pool of worker processes.
+
+        Args:
+            file_paths (List[str]): Paths of the files to process.
+            chunk_size (int): The size of each chunk.
+            overlap_ratio (float): The overlap ratio between consecutive chunks.
+
+        Files larger than ``max_pooled_file_size`` are processed in-process, so
+        that their documents are streamed instead of being sent back at once.
+
+        Yields:
+            Iterable[Document]: The documents of every file, in the order of
+            ``file_paths``. Consume them before getting the next file's.
+        """
+        if self.num_workers == 0 or len(file_paths) <= 1:
+            for file_path in file_paths:
+                yield self._iter_documents(file_path, chunk_size, overlap_ratio)
+            return
+
+        num_workers = self.num_workers or os.cpu_count() or 1
+        # Files in flight are bounded so results are consumed as they complete
+        # and a crash only implicates a few files.
+        max_pending = 2 * num_workers
+        to_submit = deque(file_paths)
+        pending = deque()
+        crashes = {}
+        pool = self._new_pool(num_workers, self.splitter)
+
+        try:
+            while pending or to_submit:
+                while to_submit and len(pending) < max_pending:
+                    file_path = to_submit[0]
+                    crashed = crashes.get(file_path, 0)
+                    # Files in flight during a crash are retried alone, so an
+                    # innocent file is never skipped because of another one.
+                    isolating = any(
+                        crashes.get(path) and future not in (None, _IN_PROCESS)
+                        for path, future in pending
+                    )
+                    if crashed >= self.max_crashes:
+                        pending.append((file_path, None))
+                    elif os.path.getsize(file_path) > self.max_pooled_file_size:
+                        pending.append((file_path, _IN_PROCESS))
+                    elif isolating or (crashed and pending):
+                        break
+                    else:
+                        pending.append(
+                            (
+                                file_path,
+                                pool.submit(
+                                    _process_file_worker,
+                                    file_path,
+                                    chunk_size,
+                                    overlap_ratio,
+                                ),
+                            )
+                        )
+                    to_submit.popleft()
+
+                file_path, future = pending[0]
+                if future is None:
+                    pending.popleft()
+                    yield []
+                    continue
+                if future is _IN_PROCESS:
+                    pending.popleft()
+                    yield self._iter_documents(file_path, chunk_size, overlap_ratio)
+                    continue
+
+                try:
+                    documents = future.result()
+                except BrokenProcessPool:
+                    # A worker died, e.g. a parser crashed. Retry the files that
+                    # were in flight and skip those that keep crashing.
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    pool = self._new_pool(num_workers, self.splitter)
+                    for file_path, future in pending:
+                        if future not in (None, _IN_PROCESS):
+                            crashes[file_path] = crashes.get(file_path, 0) + 1
+                            if crashes[file_path] >= self.max_crashes:
+                                cprint(f"Skipping {file_path}: its parser crashed.")
+                    to_submit.extendleft(reversed([path for path, _ in pending]))
+                    pending.clear()
+                    continue
+                except Exception as e:
+                    print(f"Failed to process {file_path}: {e}")
+                    documents = []
+
+                pending.popleft()
+                yield documents
+        finally:
+            pool.shutdown(cancel_futures=True)
+
+    @staticmethod
+    def _new_pool(num_workers: int, splitter=None) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=num_workers,
+            # Forking a process that has loaded torch is unsafe.
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(splitter,),
+        )
+
     def _process_file(
         self, file_path: str, chunk_size: int = 1000, overlap_ratio: float = 0.2
     ) -> list[Document]:
         """
         Process a single file, loading data and splitting it into chunks.
 
+        The segments of the file, e.g. its pages, are joined and split together
+        unless the loader keeps them apart with ``merge_segments = False``, in
+        which case every chunk carries the metadata of its segment.
+
         Args:
             file_path (str): The path to the file.
             chunk_size (int): Optional. The size of each chunk.
@@ -152,16 +539,100 @@ class DirectoryLoader:
         Returns:
             List[Document]: A list of Document namedtuple containing content chunks and metadata.
         """
-        splitter = CharacterTextSplitter(chunk_size, overlap_ratio)
-        data = self._load_file(file_path)
+        return list(self._iter_documents(file_path, chunk_size, overlap_ratio))
 
-        chunks = splitter.split_text_into_chunks(data)
-        documents = [
-            Document(content=chunk, metadata={"file_path": file_path})
-            for chunk in chunks
-        ]
+    def _iter_documents(
+        self, file_path: str, chunk_size: int = 1000, overlap_ratio: float = 0.2
+    ):
+        """
+        Lazily process a single file, see ``_process_file``.
 
-        return documents
+        The chunks of segments that are not merged are yielded as the loader
+        reads them, so a large table is never held in memory. A file failing to
+        be split is skipped like a file failing in a worker process, after the
+        chunks already yielded.
+
+        Yields:
+            Document: Content chunks and metadata.
+        """
+        splitter = self.splitter or CharacterTextSplitter(chunk_size, overlap_ratio)
+        try:
+            loader = self._get_loader(file_path, splitter)
+        except Exception as e:
+            print(
+                "File type not supported",
+                os.extsep.join(os.path.basename(file_path).split(os.extsep)[1:]),
+                e,
+            )
+            return
+
+        try:
+            yield from self._split_segments(loader, splitter, file_path)
+        except Exception as e:
+            print(f"Failed to process {file_path}: {e}")
+
+    def _split_segments(self, loader, splitter, file_path: str):
+        """Split the segments of a file into chunks, see ``_iter_documents``."""
+        segments = self._load_segments(loader, file_path)
+        if loader.merge_segments:
+            yield from self._split_merged_segments(segments, splitter, file_path)
+            return
+
+        offset = 0
+        for text, metadata in segments:
+            for chunk, start, end in splitter.split_text(text):
+                yield Document(
+                    content=chunk,
+                    metadata={
+                        "file_path": file_path,
+                        **metadata,
+                        "start_index": offset + start,
+                        "end_index": offset + end,
+                    },
+                )
+            offset += len(text) + len(SEGMENT_SEPARATOR)
+
+    @staticmethod
+    def _load_segments(loader, file_path: str):
+        try:
+            yield from loader.load_segments()
+        except Exception as e:
+            print(f"Failed to load {file_path}: {e}")
+
+    @staticmethod
+    def _split_merged_segments(segments, splitter, file_path: str):
+        """
+        Split the joined segments of a file, e.g. its pages.
+
+        Segments are split one at a time, carrying the overlap across segment
+        boundaries, so the text of a whole document is never held. Every chunk
+        records the range of segments it spans: a segment metadata key such as
+        ``page`` becomes ``page_start`` and ``page_end``.
+
+        Yields:
+            Document: Content chunks and metadata.
+        """
+        metadatas, starts = [], []
+
+        def texts():
+            position = 0
+            for text, metadata in segments:
+                metadatas.append(metadata)
+                starts.append(position)
+                position += len(text) + len(SEGMENT_SEPARATOR)
+                yield text
+
+        for chunk, start, end in splitter.split_segments(texts(), SEGMENT_SEPARATOR):
+            # Chunks are stripped, so their first and last characters are in a segment.
+            first = metadatas[bisect_right(starts, start) - 1]
+            last = metadatas[bisect_right(starts, end - 1) - 1]
+            metadata = {"file_path": file_path}
+            for key, value in first.items():
+                metadata[f"{key}_start"] = value
+                metadata[f"{key}_end"] = last.get(key, value)
+            metadata["start_index"] = start
+            metadata["end_index"] = end
+            yield Document(content=chunk, metadata=metadata)
 
     def load_in_chunks(
         self, chunk_size: int = 1000, overlap_ratio: float = 0.2
@@ -178,3 +649,34 @@ class DirectoryLoader:
         """
         return self.load_data(chunk_size, overlap_ratio)
 
+    def lazy_load_chunks(
+        self,
+        chunk_size: int = 1000,
+        overlap_ratio: float = 0.2,
+        file_paths: list[str] = None,
+    ):
+        """
+        Lazily load the file or directory in chunks with optional overlap.
+
+        Files are parsed as the chunks are consumed, so only the chunks of the
+        files in flight are held in memory.
+
+        Args:
+            chunk_size (int): Optional. The size of each chunk.
+            overlap_ratio (float): Optional. The overlap ratio between consecutive chunks.
+            file_paths (List[str], optional): Only load these files, e.g. the
+                changed files of ``list_files``.
+
+        Yields:
+            Document: Content chunks and metadata, in the order of ``load_in_chunks``.
+        """
+        if file_paths is None and not self.is_directory:
+            yield from self._iter_documents(self.path, chunk_size, overlap_ratio)
+            return
+
+        for file_documents in self._process_files(
+            self.list_files() if file_paths is None else file_paths,
+            chunk_size,
+            overlap_ratio,
+        ):
+            yield from file_documents
@@ -0,0 +1,245 @@
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from settings import Settings
+
+# Directory of the pages cached by WebLoader, set by Settings.VECTOR_STORE_DIR.
+# Entries persist across runs until the directory is deleted. A page is replaced
+# when the server reports it changed, content without validators such as
+# YouTube transcripts is kept as is.
+WEB_CACHE_PATH = os.path.join(Settings.VECTOR_STORE_DIR, "web_cache")
+
+
+class ResponseCache:
+    """
+    An on-disk cache of parsed web pages with their ETag and Last-Modified.
+
+    A cached page is requested again conditionally, and a 304 Not Modified
+    response reuses its text without downloading or parsing it. Every URL is
+    kept in its own JSON file, named after the hash of the URL.
+    """
+
+    def __init__(self, path: str = WEB_CACHE_PATH) -> None:
+        """
+        Initialize the ResponseCache.
+
+        Args:
+            path (str): Directory of the cache, created on first use.
+        """
+        self.path = path
+
+    def _entry_path(self, url: str) -> str:
+        digest = hashlib.blake2b(url.encode(), digest_size=16).hexdigest()
+        return os.path.join(self.path, f"{digest}.json")
+
+    def get(self, url: str):
+        """
+        Look up a cached page.
+
+        Returns:
+            Optional[dict]: The ``etag``, ``last_modified`` and ``text`` of the
+            page, or None if it is not cached.
+        """
+        try:
+            with open(self._entry_path(url)) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return entry if entry.get("url") == url else None
+
+    def put(self, url: str, etag: str, last_modified: str, text: str) -> None:
+        """Cache a page, replacing its previous entry atomically."""
+        os.makedirs(self.path, exist_ok=True)
+        path = self._entry_path(url)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(
+                {"url": url, "etag": etag, "last_modified": last_modified, "text": text},
+                f,
+            )
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def validators(entry) -> dict:
+        """Headers making a request conditional on a cached entry."""
+        headers = {}
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+
+class WebFetcher:
+    """
+    Fetch web pages concurrently over a pooled HTTP session.
+
+    Requests share the connections of one ``requests.Session``, are retried
+    with exponential backoff on connection errors and on 429 and 5xx
+    responses, and time out. At most ``max_per_host`` requests are sent to the
+    same host at a time. Use it as a context manager to close its threads and
+    connections.
+    """
+
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(
+        self,
+        max_workers: int = 8,
+        max_per_host: int = 2,
+        timeout: tuple = (5, 30),
+        retries: int = 3,
+        backoff_factor: float = 0.5,
+        cache=True,
+    ) -> None:
+        """
+        Initialize the WebFetcher.
+
+        Args:
+            max_workers (int): Number of requests in flight.
+            max_per_host (int): Number of requests in flight to the same host.
+            timeout (Tuple[float, float]): Connect and read timeouts in seconds.
+            retries (int): Number of retries of a failed request.
+            backoff_factor (float): Base of the exponential delay between retries,
+                in seconds.
+            cache (ResponseCache | bool): Cache of the fetched pages. True uses
+                the cache under ``WEB_CACHE_PATH``, False disables it.
+        """
+        self.max_workers = max_workers
+        self.max_per_host = max_per_host
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.cache = ResponseCache() if cache is True else cache or None
+        self._session = None
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        if self._session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            from urllib3.util.retry import Retry
+
+            adapter = HTTPAdapter(
+                pool_connections=self.max_workers,
+                pool_maxsize=self.max_workers,
+                max_retries=Retry(
+                    total=self.retries,
+                    backoff_factor=self.backoff_factor,
+                    status_forcelist=self.RETRY_STATUSES,
+                    allowed_methods=frozenset({"GET"}),
+                ),
+            )
+            session = requests.Session()
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self._session = session
+        return self._session
+
+    @contextmanager
+    def host_slot(self, url: str):
+        """Wait for one of the ``max_per_host`` request slots of the URL's host."""
+        host = urlsplit(url).netloc.lower()
+        with self._lock:
+            semaphore = self._hosts.get(host)
+            if semaphore is None:
+                semaphore = self._hosts[host] = threading.BoundedSemaphore(
+                    self.max_per_host
+                )
+        with semaphore:
+            yield
+
+    def fetch(self, url: str, parse):
+        """
+        Fetch a page and parse it, unless it did not change since it was cached.
+
+        Args:
+            url (str): The URL of the page.
+            parse (Callable[[requests.Response], str]): Extract the text of a
+                response.
+
+        Returns:
+            str: The text of the page.
+
+        Raises:
+            requests.exceptions.RequestException: If the page cannot be fetched.
+        """
+        import requests
+
+        entry = self.cache.get(url) if self.cache is not None else None
+        response = self._get(url, ResponseCache.validators(entry))
+        if response.status_code == 304:
+            if entry is not None:
+                return entry["text"]
+            # Nothing was cached to reuse, so the page is requested unconditionally.
+            response = self._get(url, {"Cache-Control": "no-cache"})
+            if response.status_code == 304:
+                raise requests.exceptions.HTTPError(
+                    f"304 Not Modified for the uncached page {url}", response=response
+                )
+        response.raise_for_status()
+
+        text = parse(response)
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if self.cache is not None and (etag or last_modified):
+            self.cache.put(url, etag, last_modified, text)
+        return text
+
+    def _get(self, url: str, headers: dict):
+        with self.host_slot(url):
+            return self.session.get(url, headers=headers, timeout=self.timeout)
+
+    def load(self, url: str, load):
+        """
+        Load a URL with a loader of its own, e.g. a YouTube transcript, once.
+
+        The content has no validators to revalidate it with, so it is cached
+        until its entry is deleted.
+
+        Args:
+            url (str): The URL.
+            load (Callable[[requests.Session], str]): Load the content of the URL
+                over the session of the fetcher.
+
+        Returns:
+            str: The content.
+        """
+        entry = self.cache.get(url) if self.cache is not None else None
+        if entry is not None:
+            return entry["text"]
+
+        with self.host_slot(url):
+            text = load(self.session)
+        if self.cache is not None:
+            self.cache.put(url, None, None, text)
+        return text
+
+    def map(self, function, urls):
+        """
+        Call a function on every URL in a pool of threads.
+
+        Yields:
+            The results, in the order of ``urls``.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            yield from pool.map(function, urls)
+
+    def close(self) -> None:
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -1,33 +1,91 @@
+import bz2
+import csv
+import gzip
+import io
 import json
+import lzma
+import multiprocessing
 import os
-import tempfile
+import posixpath
+import tarfile
 import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
 from loaders.base import BaseLoader
+from loaders.fetcher import WebFetcher
+from loaders.sections import html_sections, markdown_sections
 
 
 class TxtLoader(BaseLoader):
-    def load(self):
-        with open(self.path) as f:
-            return f.read()
+    separator = ""
+    # Number of characters per piece of ``lazy_load``.
+    block_size = 1 << 16
 
     def lazy_load(self):
-        with open(self.path) as f:
-            yield from f
+        with self._open_text() as f:
+            while block := f.read(self.block_size):
+                yield block
 
 
 class JSONLoader(BaseLoader):
-    def load(self):
-        with open(self.path) as f:
-            return json.load(f)
+    """
+    Load JSON files as text, one piece per top-level item.
+
+    Every item of a top-level array, or every key of a top-level object with its
+    value, is serialized on its own line.
+    """
 
     def lazy_load(self):
-        with open(self.path) as f:
-            yield from json.load(f)
+        with self._open_text() as f:
+            data = json.load(f)
+
+        if isinstance(data, dict):
+            items = ({key: value} for key, value in data.items())
+        elif isinstance(data, list):
+            items = iter(data)
+        else:
+            items = iter([data])
+        for item in items:
+            yield json.dumps(item, ensure_ascii=False)
+
+
+def _page_text(page_layout) -> str:
+    from pdfminer.layout import LTTextContainer
+
+    return "".join(
+        element.get_text()
+        for element in page_layout
+        if isinstance(element, LTTextContainer)
+    ).strip()
+
+
+def _extract_pdf_pages(path: str, first: int, last: int) -> list[str]:
+    """Extract the text of pages ``first`` to ``last - 1`` in a worker process."""
+    from pdfminer.high_level import extract_pages
+
+    return [
+        _page_text(page_layout)
+        for page_layout in extract_pages(path, page_numbers=range(first, last))
+    ]
 
 
 class PDFLoader(BaseLoader):
-    def __init__(self, path: str):
+    """
+    Load PDF files page by page.
+
+    Pages are extracted one at a time, so a long document is never held as a
+    single layout. With ``num_workers``, ranges of ``pages_per_task`` pages are
+    extracted by a pool of worker processes and yielded in page order.
+    """
+
+    # Number of worker processes extracting the pages of a PDF file. 0 extracts
+    # in-process.
+    num_workers = 0
+    # Number of consecutive pages extracted per worker task.
+    pages_per_task = 16
+
+    def __init__(self, path: str, fileobj=None, num_workers: int = None):
         try:
             from pdfminer.high_level import extract_text
         except ImportError as err:
@@ -37,125 +95,202 @@ class PDFLoader(BaseLoader):
                 `pip install pdfminer.six`
             """) from err
 
-        super().__init__(path)
+        super().__init__(path, fileobj)
+        if num_workers is not None:
+            self.num_workers = num_workers
+
+    def _count_pages(self) -> int:
+        from pdfminer.pdfpage import PDFPage
+
+        with open(self.path, "rb") as f:
+            return sum(1 for _ in PDFPage.get_pages(f))
+
+    def _pages(self):
+        from pdfminer.high_level import extract_pages
+
+        # Archive members are read sequentially from their file object.
+        if not self.num_workers or self.fileobj is not None:
+            for page_layout in extract_pages(self._source()):
+                yield _page_text(page_layout)
+            return
+
+        num_pages = self._count_pages()
+        with ProcessPoolExecutor(
+            max_workers=self.num_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        ) as pool:
+            tasks = deque()
+            for first in range(0, num_pages, self.pages_per_task):
+                # Bound the pages in flight, so results are consumed in order.
+                if len(tasks) >= 2 * self.num_workers:
+                    yield from tasks.popleft().result()
+                last = min(first + self.pages_per_task, num_pages)
+                tasks.append(pool.submit(_extract_pdf_pages, self.path, first, last))
+
+            while tasks:
+                yield from tasks.popleft().result()
 
     def load(self):
-        from pdfminer.high_level import extract_text
-
-        return extract_text(self.path).strip()
+        return "\n\n".join(self.lazy_load()).strip()
 
     def lazy_load(self):
-        from pdfminer.high_level import extract_text
-
-        yield extract_text(self.path)
-
+        for text, _ in self.load_segments():
+            yield text
+
+    def load_segments(self):
+        for page_number, text in enumerate(self._pages(), start=1):
+            yield text, {"page": page_number}
+
+
+class TableLoader(BaseLoader):
+    """
+    Base class of the loaders of tabular files, read in batches of rows.
+
+    Every batch of rows is rendered as a compact text table under the column
+    names, so that it reads on its own, and is loaded as one segment with the
+    range of its rows, ``row_start`` and ``row_end``. Rows are numbered from 1
+    after the header. A batch holds at most ``rows_per_batch`` rows and, unless
+    a single row is longer, ``max_batch_length`` characters, so that it is not
+    split again into chunks without the header. Only one batch is held in
+    memory.
+    """
+
+    merge_segments = False
+    separator = "\n\n"
+    # Maximum number of rows per batch.
+    rows_per_batch = 50
+    # Maximum number of characters per batch, the default chunk size.
+    max_batch_length = 1000
+    CELL_SEPARATOR = " | "
+
+    def __init__(
+        self,
+        path: str,
+        fileobj=None,
+        rows_per_batch: int = None,
+        max_batch_length: int = None,
+    ):
+        super().__init__(path, fileobj)
+        if rows_per_batch is not None:
+            self.rows_per_batch = rows_per_batch
+        if max_batch_length is not None:
+            self.max_batch_length = max_batch_length
+
+    def _tables(self):
+        """
+        Read the tables of the file, e.g. the sheets of a workbook.
 
-class CSVLoader(BaseLoader):
-    def __init__(self, path: str):
-        try:
-            import pandas as pd
-        except ImportError as err:
-            raise ImportError("""
-                Please install pandas to use the CSVLoader.
-                You can install it using:
-                `pip install pandas`
-            """) from err
+        Yields:
+            Tuple[List[str], Iterable[Tuple], dict]: Column names, rows and
+            metadata of every table.
+        """
+        raise NotImplementedError("_tables method is not implemented")
 
-        super().__init__(path)
+    @classmethod
+    def _render_row(cls, row) -> str:
+        return cls.CELL_SEPARATOR.join("" if value is None else str(value) for value in row)
 
-    def load(self):
-        import pandas as pd
+    def _table_batches(self, header, rows):
+        """
+        Group the rows of a table into batches.
 
-        return pd.read_csv(self.path, engine="pyarrow")
+        Yields:
+            Tuple[str, int, int]: The rendered batch and the numbers of its first
+            and last rows.
+        """
+        header_line = self._render_row(header)
+        lines, length, row_start = [header_line], len(header_line), 1
+        row_number = 0
+        for row_number, row in enumerate(rows, 1):
+            line = self._render_row(row)
+            if not line.replace(self.CELL_SEPARATOR, "").strip():
+                continue
+            if len(lines) > 1 and (
+                len(lines) > self.rows_per_batch
+                or length + 1 + len(line) > self.max_batch_length
+            ):
+                yield "\n".join(lines), row_start, row_number - 1
+                lines, length, row_start = [header_line], len(header_line), row_number
+            lines.append(line)
+            length += 1 + len(line)
+
+        if len(lines) > 1:
+            yield "\n".join(lines), row_start, row_number
 
     def lazy_load(self):
-        import pandas as pd
+        for text, _ in self.load_segments():
+            yield text
 
-        yield pd.read_csv(self.path)
+    def load_segments(self):
+        for header, rows, metadata in self._tables():
+            for text, row_start, row_end in self._table_batches(header, rows):
+                yield text, {**metadata, "row_start": row_start, "row_end": row_end}
 
 
-class TSVLoader(BaseLoader):
-    def __init__(self, path: str):
-        try:
-            import pandas as pd
-        except ImportError as err:
-            raise ImportError("""
-                Please install pandas to use the TSVLoader.
-                You can install it using:
-                `pip install pandas`
-            """) from err
+class CSVLoader(TableLoader):
+    """Load delimited text files, with their first row as the header."""
 
-        super().__init__(path)
+    delimiter = ","
 
-    def load(self):
-        import pandas as pd
+    def _tables(self):
+        with self._open_text(encoding="utf-8-sig", newline="") as f:
+            # Blank lines are not rows.
+            rows = (row for row in csv.reader(f, delimiter=self.delimiter) if row)
+            header = next(rows, None)
+            if header is not None:
+                yield header, rows, {}
 
-        return pd.read_csv(self.path, sep="\t", engine="pyarrow")
 
-    def lazy_load(self):
-        import pandas as pd
+class TSVLoader(CSVLoader):
+    delimiter = "\t"
 
-        yield pd.read_csv(self.path, sep="\t")
 
+class SectionLoader(BaseLoader):
+    """
+    Base class of the loaders of documents structured by headings.
 
-class MarkdownLoader(BaseLoader):
-    def __init__(self, path: str):
-        try:
-            import markdown
-        except ImportError as err:
-            raise ImportError("""
-                Please install markdown to use the MarkdownLoader.
-                You can install it using:
-                `pip install markdown`
-            """) from err
+    Every section, from a heading to the next one, is loaded as one segment
+    with the path of its headings as ``section``, e.g. "Install > Linux".
+    Sections are not merged, so they bound the chunks.
+    """
 
-        super().__init__(path)
+    merge_segments = False
+    separator = "\n\n"
 
-    def load(self):
-        import markdown
+    def _sections(self, f):
+        """
+        Split the document into sections.
 
-        with open(self.path) as f:
-            return markdown.markdown(f.read())
+        Yields:
+            Tuple[str, dict]: Text and metadata of every section.
+        """
+        raise NotImplementedError("_sections method is not implemented")
 
     def lazy_load(self):
-        import markdown
-
-        with open(self.path) as f:
-            yield markdown.markdown(f.read())
+        for text, _ in self.load_segments():
+            yield text
 
+    def load_segments(self):
+        with self._open_text(encoding="utf-8") as f:
+            yield from self._sections(f)
 
-class HTMLLoader(BaseLoader):
-    def __init__(self, path: str):
-        try:
-            from bs4 import BeautifulSoup
-        except ImportError as err:
-            raise ImportError("""
-                Please install beautifulsoup4 to use the HTMLLoader.
-                You can install it using:
-                `pip install beautifulsoup4`
-            """) from err
 
-        super().__init__(path)
+class MarkdownLoader(SectionLoader):
+    """Load the Markdown source of a document, split at its headings."""
 
-    def load(self):
-        from bs4 import BeautifulSoup
+    def _sections(self, f):
+        return markdown_sections(f)
 
-        with open(self.path, encoding="utf-8") as f:
-            soup = BeautifulSoup(f.read(), "html.parser")
-            # Extract text content excluding HTML tags
-            return soup.get_text(separator="\n", strip=True)
 
-    def lazy_load(self):
-        from bs4 import BeautifulSoup
+class HTMLLoader(SectionLoader):
+    """Load the text of an HTML document, split at its headings."""
 
-        with open(self.path, encoding="utf-8") as f:
-            soup = BeautifulSoup(f.read(), "html.parser")
-            # Yield clean text content in chunks
-            yield soup.get_text(separator="\n", strip=True)
+    def _sections(self, f):
+        return html_sections(f)
 
 
 class DocxLoader(BaseLoader):
-    def __init__(self, path: str):
+    def __init__(self, path: str, fileobj=None):
         try:
             from docx import Document
         except ImportError as err:
@@ -165,24 +300,18 @@ class DocxLoader(BaseLoader):
                 `pip install python-docx`
             """) from err
 
-        super().__init__(path)
-
-    def load(self):
-        from docx import Document
-
-        doc = Document(self.path)
-        return "\n".join([p.text for p in doc.paragraphs])
+        super().__init__(path, fileobj)
 
     def lazy_load(self):
         from docx import Document
 
-        doc = Document(self.path)
+        doc = Document(self._source())
         for p in doc.paragraphs:
             yield p.text
 
 
 class PPTXLoader(BaseLoader):
-    def __init__(self, path: str):
+    def __init__(self, path: str, fileobj=None):
         try:
             from pptx import Presentation
         except ImportError as err:
@@ -192,48 +321,72 @@ class PPTXLoader(BaseLoader):
                 `pip install python-pptx`
             """) from err
 
-        super().__init__(path)
-
-    def load(self):
-        from pptx import Presentation
-
-        prs = Presentation(self.path)
-        return "\n".join([slide.text for slide in prs.slides])
+        super().__init__(path, fileobj)
 
     def lazy_load(self):
         from pptx import Presentation
 
-        prs = Presentation(self.path)
+        prs = Presentation(self._source())
         for slide in prs.slides:
-            yield slide.text
+            yield "\n".join(
+                shape.text_frame.text for shape in slide.shapes if shape.has_text_frame
+            )
+
 
+class XLSXLoader(TableLoader):
+    """
+    Load every sheet of a workbook, with the first row of a sheet as its header.
 
-class XLSXLoader(BaseLoader):
-    def __init__(self, path: str):
+    ``.xlsx`` workbooks are streamed with openpyxl in read-only mode. Legacy
+    ``.xls`` workbooks are read whole with pandas.
+    """
+
+    def __init__(self, path: str, fileobj=None, **kwargs):
         try:
+            import openpyxl
             import pandas as pd
         except ImportError as err:
             raise ImportError("""
-                Please install pandas to use the XLSXLoader.
-                You can install it using:
-                `pip install pandas`
+                Please install pandas and openpyxl to use the XLSXLoader.
+                You can install them using:
+                `pip install pandas openpyxl`
             """) from err
 
-        super().__init__(path)
+        super().__init__(path, fileobj, **kwargs)
 
-    def load(self):
-        import pandas as pd
+    def _sheets(self):
+        """
+        Yields:
+            Tuple[str, Iterator[Tuple]]: Name and rows of every sheet.
+        """
+        if self.path.lower().endswith(".xls"):
+            import pandas as pd
 
-        return pd.read_excel(self.path)
+            sheets = pd.read_excel(self._source(), sheet_name=None, header=None, dtype=str)
+            for name, sheet in sheets.items():
+                yield name, sheet.where(sheet.notna(), None).itertuples(
+                    index=False, name=None
+                )
+            return
 
-    def lazy_load(self):
-        import pandas as pd
+        from openpyxl import load_workbook
 
-        yield pd.read_excel(self.path)
+        workbook = load_workbook(self._source(), read_only=True, data_only=True)
+        try:
+            for sheet in workbook.worksheets:
+                yield sheet.title, sheet.iter_rows(values_only=True)
+        finally:
+            workbook.close()
+
+    def _tables(self):
+        for name, rows in self._sheets():
+            header = next(rows, None)
+            if header is not None:
+                yield header, rows, {"sheet": name}
 
 
 class EPUBLoader(BaseLoader):
-    def __init__(self, path: str):
+    def __init__(self, path: str, fileobj=None):
         try:
             from bs4 import BeautifulSoup
             from ebooklib import epub
@@ -244,12 +397,13 @@ class EPUBLoader(BaseLoader):
                 `pip install EbookLib`
             """) from err
 
-        super().__init__(path)
+        super().__init__(path, fileobj)
+
+    separator = ""
 
     def _clean_epub_text(self, text):
         from bs4 import BeautifulSoup
 
-        formatted_text = ""
         soup = BeautifulSoup(text, "html.parser")
         all_text = soup.find_all(text=True)
         remove_tags = [
@@ -262,88 +416,187 @@ class EPUBLoader(BaseLoader):
             "input",
             "script",
         ]
-        for t in all_text:
-            if t.parent.name not in remove_tags:
-                formatted_text += f"{t} "
+        return "".join(f"{t} " for t in all_text if t.parent.name not in remove_tags)
 
-        return formatted_text
-
-    def load(self):
+    def lazy_load(self):
+        import ebooklib
         from ebooklib import epub
 
-        book = epub.read_epub(self.path)
-        text = ""
-        for item in book.get_items():
-            text += self._clean_epub_text(item.get_body_content())
-        return text
+        book = epub.read_epub(self._source())
+        # Chapters only, not images or stylesheets.
+        for item in book.get_items_of_type(ebooklib.ITEM_DOCUMENT):
+            yield self._clean_epub_text(item.get_body_content())
+
+
+def _is_hidden(name: str) -> bool:
+    """Whether an archive member is a hidden or system file, e.g. under __MACOSX."""
+    return any(
+        part.startswith(".") or part == "__MACOSX"
+        for part in name.split("/")
+        if part not in ("", ".", "..")
+    )
+
+
+class ArchiveLoader(BaseLoader):
+    """
+    Base class of the loaders reading the files inside an archive.
+
+    Members are read from the archive in memory, without extracting them to
+    disk, and parsed by the loader of their extension. Archives nested up to
+    ``max_depth`` levels are loaded recursively. Archive members are streamed
+    to the nested loader, while other members are read into memory and skipped
+    when larger than ``max_member_size`` bytes.
+
+    Every member is loaded in its own segments, with its name as ``member``, so
+    chunks never span two files. The segments of a member whose loader merges
+    them, e.g. the pages of a PDF, are joined into one with their range.
+    """
+
+    merge_segments = False
+    separator = "\n\n"
+    # Whether the loader reads its file object sequentially, so archive members
+    # are streamed to it instead of being read into memory first.
+    streaming = True
+    # Maximum size in bytes of a member read into memory.
+    max_member_size = 256 << 20
+    # Maximum nesting depth of archives inside the archive.
+    max_depth = 4
+
+    def __init__(self, path: str, fileobj=None, depth: int = 0):
+        super().__init__(path, fileobj)
+        self.depth = depth
+
+    def _members(self):
+        """
+        Iterate over the members of the archive.
+
+        Yields:
+            Tuple[str, int, BinaryIO]: Name, size (None if unknown) and file
+            object of every member, valid until the next member.
+        """
+        raise NotImplementedError("_members method is not implemented")
+
+    def _member_segments(self, name: str, size: int, fileobj):
+        # Members of tarballs made with `tar -C dir .` are named "./a.txt".
+        name = posixpath.normpath(name)
+        member_path = f"{self.path}/{name}"
+        if _is_hidden(name):
+            return
+
+        loader_class = LOADER_MAP.get(os.path.splitext(name)[1].lower())
+        if loader_class is None:
+            return
+
+        is_archive = issubclass(loader_class, ArchiveLoader)
+        if is_archive and self.depth >= self.max_depth:
+            print(f"Skipping {member_path}: archives are nested too deep.")
+            return
+
+        if not getattr(loader_class, "streaming", False):
+            if size is not None and size > self.max_member_size:
+                print(f"Skipping {member_path}: larger than {self.max_member_size} bytes.")
+                return
+            data = fileobj.read(self.max_member_size + 1)
+            if len(data) > self.max_member_size:
+                print(f"Skipping {member_path}: larger than {self.max_member_size} bytes.")
+                return
+            fileobj = io.BytesIO(data)
+
+        try:
+            if is_archive:
+                loader = loader_class(member_path, fileobj, self.depth + 1)
+                for text, metadata in loader.load_segments():
+                    yield text, {**metadata, "member": f"{name}/{metadata['member']}"}
+                return
+
+            loader = loader_class(member_path, fileobj)
+            segments = loader.load_segments()
+            if not loader.merge_segments:
+                for text, metadata in segments:
+                    yield text, {"member": name, **metadata}
+                return
+
+            # The segments of a member are merged, e.g. its pages, and loaded
+            # as one segment with their range.
+            texts, first, last = [], {}, {}
+            for text, metadata in segments:
+                if not isinstance(text, str):
+                    print(f"Skipping {member_path}: its loader does not return text.")
+                    return
+                texts.append(text)
+                first = first or metadata
+                last = metadata
+            metadata = {"member": name}
+            for key in first:
+                metadata[f"{key}_start"] = first[key]
+                metadata[f"{key}_end"] = last[key]
+            yield self.separator.join(texts), metadata
+        except Exception as e:
+            print(f"Error processing file {member_path}: {e}")
 
     def lazy_load(self):
-        from ebooklib import epub
+        for text, _ in self.load_segments():
+            yield text
 
-        book = epub.read_epub(self.path)
-        for item in book.get_items():
-            yield self._clean_epub_text(item.get_body_content())
+    def load_segments(self):
+        """
+        Load every member in its own segments, with its name as ``member``.
 
+        Yields:
+            Tuple[str, dict]: The text and metadata of every segment.
+        """
+        for name, size, fileobj in self._members():
+            yield from self._member_segments(name, size, fileobj)
 
-class ZipLoader(BaseLoader):
-    """Add support for loading .7z and other archive formats here."""
 
-    def _extract_file(self, file, temp_dir):
-        ext = os.path.splitext(file)[1].lower()
-        loader_class = LOADER_MAP.get(ext)
+class ZipLoader(ArchiveLoader):
+    # Zip archives are read from their central directory at the end.
+    streaming = False
 
-        if loader_class:
-            file_path = os.path.join(temp_dir, file)
-            loader = loader_class(file_path)
-            try:
-                content = loader.load()
-                return content.encode("utf-8", errors="ignore").decode("utf-8")
-            except (UnicodeDecodeError, AttributeError) as e:
-                print(f"Error processing file {file}: {e}")
-                return ""
+    def _members(self):
+        with zipfile.ZipFile(self._source()) as z:
+            for info in z.infolist():
+                if info.is_dir():
+                    continue
+                with z.open(info) as f:
+                    yield info.filename, info.file_size, f
+
+
+class TarLoader(ArchiveLoader):
+    """Load tar archives, compressed or not, in a single sequential pass."""
+
+    def _members(self):
+        # Stream mode reads the members in order without seeking, so a tarball
+        # is never loaded into memory or extracted.
+        with tarfile.open(
+            name=None if self.fileobj is not None else self.path,
+            fileobj=self.fileobj,
+            mode="r|*",
+        ) as tar:
+            for member in tar:
+                if not member.isfile():
+                    continue
+                f = tar.extractfile(member)
+                yield member.name, member.size, f
 
-        return ""
 
-    def load(self):
-        extracted_data = ""
-        with zipfile.ZipFile(self.path, "r") as z:  # noqa: SIM117
-            with tempfile.TemporaryDirectory() as temp_dir:
-                z.extractall(temp_dir)
-                for file in z.namelist():
-                    # Ignore system files like __MACOSX and .DS_Store
-                    if (
-                        file.startswith("__MACOSX/")
-                        or file.endswith(".DS_Store")
-                        or file.startswith(".")
-                    ):
-                        continue
-                    extracted_data += self._extract_file(file, temp_dir)
-        return extracted_data
+class CompressedLoader(ArchiveLoader):
+    """
+    Load a single compressed file, e.g. notes.txt.gz or data.tar.bz2, with the
+    loader of its name without the compression extension.
+    """
 
-    def lazy_load(self):
-        with zipfile.ZipFile(self.path, "r") as z:  # noqa: SIM117
-            with tempfile.TemporaryDirectory() as temp_dir:
-                z.extractall(temp_dir)
-                for file in z.namelist():
-                    # Ignore system files . files that are internal hidden files
-                    if (
-                        file.startswith("__MACOSX/")
-                        or file.endswith(".DS_Store")
-                        or file.split(".")
-                    ):
-                        continue
-                    ext = os.path.splitext(file)[1].lower()
-                    loader_class = LOADER_MAP.get(ext)
-                    if loader_class:
-                        file_path = os.path.join(temp_dir, file)
-                        loader = loader_class(file_path)
-                        try:
-                            for content in loader.lazy_load():
-                                yield content.encode("utf-8", errors="ignore").decode(
-                                    "utf-8"
-                                )
-                        except (UnicodeDecodeError, AttributeError) as e:
-                            print(f"Error processing file {file}: {e}")
+    OPENERS = {
+        ".gz": gzip.open,
+        ".bz2": bz2.open,
+        ".lzma": lzma.open,
+        ".xz": lzma.open,
+    }
+
+    def _members(self):
+        name, ext = os.path.splitext(os.path.basename(self.path))
+        with self.OPENERS[ext.lower()](self._source(), "rb") as f:
+            yield name, None, f
 
 
 class AudioLoader(BaseLoader):
@@ -365,20 +618,34 @@ class SQLLoader(BaseLoader):
 
 
 class WebLoader(BaseLoader):
-    """Add support for loading web pages and scraping content using Beautiful Soup or Scrapy"""
-
-    def __init__(self, path: str):
+    """
+    Load the web pages listed in a ``.url`` file, one URL per line.
+
+    Pages are fetched concurrently by a ``WebFetcher``, with at most
+    ``max_per_host`` requests to the same host, and unchanged pages are read
+    from its conditional-GET cache. URLs of URL_MAP, e.g. YouTube videos, are
+    loaded by their loader under the same limits and cached once loaded. Pages
+    are yielded in the order of the file.
+    """
+
+    # Number of URLs loaded at a time.
+    max_workers = 8
+    # Number of URLs of the same host loaded at a time.
+    max_per_host = 2
+
+    def __init__(self, path: str, fileobj=None, fetcher=None):
         try:
             import requests
-            from bs4 import BeautifulSoup
         except ImportError as err:
             raise ImportError("""
-                Please install beautifulsoup4 and requests to use the WebLoader.
-                You can install them using:
-                `pip install beautifulsoup4 requests`
+                Please install requests to use the WebLoader.
+                You can install it using:
+                `pip install requests`
             """) from err
 
-        super().__init__(path)
+        super().__init__(path, fileobj)
+        # Fetcher to use, e.g. with another cache. Defaults to a new one per load.
+        self.fetcher = fetcher
 
     def _get_loader_for_url(self, url: str):
         """
@@ -395,50 +662,58 @@ class WebLoader(BaseLoader):
                 return loader_class
         return None
 
-    def load(self):
-        import requests
-        from bs4 import BeautifulSoup
+    @staticmethod
+    def _page_text(response) -> str:
+        """Extract the text of a fetched page, section by section for HTML."""
+        if "html" not in response.headers.get("Content-Type", "text/html"):
+            return response.text
+        return "\n\n".join(text for text, _ in html_sections(io.StringIO(response.text)))
 
-        with open(self.path) as f:
-            urls = f.readlines()
+    def _load_url(self, fetcher, url: str):
+        """
+        Load a URL.
 
-        content = ""
-        for url in urls:
-            url = url.strip()
+        Returns:
+            Optional[str]: The content, or None if it cannot be loaded.
+        """
+        import requests
 
-            # Check if the URL is valid and accessible
+        loader_class = self._get_loader_for_url(url)
+        if loader_class is None:
             try:
-                response = requests.get(url)
-                response.raise_for_status()
+                return fetcher.fetch(url, self._page_text)
             except requests.exceptions.RequestException as e:
                 print(f"Error accessing URL {url}: {e}")
-                continue
+                return None
 
-            # Get loader class for the URL
-            loader_class = self._get_loader_for_url(url)
-
-            if loader_class:
-                # Create loader instance and load content
-                loader = loader_class(url)
-                try:
-                    loaded_content = loader.load()
-                    content += loaded_content + "\n"
-                except Exception as e:
-                    print(f"Error loading content from {url}: {e}")
-                    continue
-            else:
-                print(f"No loader found for URL {url} using WebLoader")
-                # Use BeautifulSoup to scrape content from the web page
-                soup = BeautifulSoup(response.text, "html.parser")
-                content += soup.get_text(separator="\n", strip=True) + "\n"
+        try:
+            return fetcher.load(
+                url, lambda session: loader_class(url, session=session).load()
+            )
+        except Exception as e:
+            print(f"Error loading content from {url}: {e}")
+            return None
+
+    def lazy_load(self):
+        with self._open_text() as f:
+            urls = [line.strip() for line in f if line.strip()]
 
-        return content.strip()
+        fetcher = self.fetcher or WebFetcher(self.max_workers, self.max_per_host)
+        try:
+            for content in fetcher.map(lambda url: self._load_url(fetcher, url), urls):
+                if content:
+                    yield content
+        finally:
+            if fetcher is not self.fetcher:
+                fetcher.close()
 
 
 class YoutubeLoader(BaseLoader):
     """Add support for loading data from Youtube videos"""
 
-    def __init__(self, url: str):
+    separator = " "
+
+    def __init__(self, url: str, session=None):
         try:
             import youtube_transcript_api as yt
         except ImportError as err:
@@ -449,26 +724,27 @@ class YoutubeLoader(BaseLoader):
             """) from err
 
         super().__init__(url)
+        # requests.Session fetching the transcript, e.g. the pooled session of
+        # a WebFetcher.
+        self.session = session
 
     def _extract_video_id(self):
         import re
 
-        return re.search(r"v=([^&]+)", self.path).group(1)
-
-    def load(self):
-        import youtube_transcript_api as yt
-
-        video_id = self._extract_video_id()
-        transcript = yt.YouTubeTranscriptApi.get_transcript(video_id)
-        content = " ".join([line["text"] for line in transcript])
-        return content
+        return re.search(r"(?:v=|youtu\.be/)([^&?/]+)", self.path).group(1)
 
     def lazy_load(self):
         import youtube_transcript_api as yt
 
         video_id = self._extract_video_id()
-        transcript = yt.YouTubeTranscriptApi.get_transcript(video_id)
-        for line in transcript:
+        if hasattr(yt.YouTubeTranscriptApi, "fetch"):
+            api = yt.YouTubeTranscriptApi(http_client=self.session)
+            for snippet in api.fetch(video_id):
+                yield snippet.text
+            return
+
+        # youtube_transcript_api < 1.0 has no session support.
+        for line in yt.YouTubeTranscriptApi.get_transcript(video_id):
             yield line["text"]
 
 
@@ -493,11 +769,14 @@ LOADER_MAP = {
     ".xls": XLSXLoader,
     ".epub": EPUBLoader,
     ".zip": ZipLoader,
-    ".lzma": ZipLoader,
-    ".bz2": ZipLoader,
-    ".gz": ZipLoader,
-    ".tar": ZipLoader,
-    ".tgz": ZipLoader,
-    ".tar.gz": ZipLoader,
+    ".tar": TarLoader,
+    ".tgz": TarLoader,
+    ".tbz2": TarLoader,
+    ".txz": TarLoader,
+    # Compressed tarballs such as .tar.gz are untarred from the decompressed stream.
+    ".gz": CompressedLoader,
+    ".bz2": CompressedLoader,
+    ".lzma": CompressedLoader,
+    ".xz": CompressedLoader,
     ".url": WebLoader,
 }
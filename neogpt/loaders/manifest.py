@@ -0,0 +1,203 @@
+import hashlib
+import json
+import os
+from typing import NamedTuple
+
+# Version of the manifest layout. Manifests of another version are ignored,
+# which rebuilds the store from scratch.
+MANIFEST_VERSION = 1
+
+
+def file_hash(file_path: str) -> str:
+    """Hash the content of a file."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, "rb") as f:
+        while block := f.read(1 << 20):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class FileChanges(NamedTuple):
+    """
+    Files of a directory compared with the files recorded in a manifest.
+    """
+
+    added: list
+    modified: list
+    removed: list
+    unchanged: list
+
+
+class IngestionManifest:
+    """
+    A record of the files ingested into a vector store.
+
+    Every file is recorded with its size, modification time, content hash and
+    number of chunks. A file whose size and modification time did not change is
+    not read again, and a file that was only touched is recognized by its hash,
+    so rebuilding an unchanged directory only stats its files.
+
+    Chunks are not recorded by id: the chunks of a changed file are replaced
+    through their ``file_path`` metadata, since compacting a store renumbers
+    its rows.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        chunk_size: int = 1000,
+        overlap_ratio: float = 0.2,
+        splitter: str = "characters",
+        store: dict = None,
+    ) -> None:
+        """
+        Initialize an empty IngestionManifest.
+
+        Args:
+            path (str): Path to the manifest file.
+            chunk_size (int): Size of the chunks the files are split into.
+            overlap_ratio (float): Overlap ratio between consecutive chunks.
+            splitter (str): Unit of the chunk size, the ``name`` of the splitter.
+            store (dict, optional): Configuration of the store the chunks are
+                ingested into, such as its embedding model and index, see
+                ``NeoStore.build_config``.
+        """
+        self.path = path
+        self.chunk_size = chunk_size
+        self.overlap_ratio = overlap_ratio
+        self.splitter = splitter
+        self.store = store or {}
+        self.files = {}
+        # Size, modification time and hash of the changed files, recorded once
+        # their chunks are ingested.
+        self._pending = {}
+
+    @classmethod
+    def load(
+        cls,
+        path: str,
+        chunk_size: int = 1000,
+        overlap_ratio: float = 0.2,
+        splitter: str = "characters",
+        store: dict = None,
+    ):
+        """
+        Load a manifest, or start an empty one.
+
+        A manifest written for other chunking parameters is discarded, since
+        every file has to be split again, and so is one written for another
+        store configuration, since every chunk has to be embedded or indexed
+        again.
+
+        Args:
+            path (str): Path to the manifest file.
+            chunk_size (int): Size of the chunks the files are split into.
+            overlap_ratio (float): Overlap ratio between consecutive chunks.
+            splitter (str): Unit of the chunk size, the ``name`` of the splitter.
+            store (dict, optional): Configuration of the store the chunks are
+                ingested into.
+
+        Returns:
+            IngestionManifest: The manifest.
+        """
+        manifest = cls(path, chunk_size, overlap_ratio, splitter, store)
+        if not os.path.isfile(path):
+            return manifest
+
+        with open(path) as f:
+            data = json.load(f)
+
+        if (
+            data.get("version") == MANIFEST_VERSION
+            and data.get("chunk_size") == chunk_size
+            and data.get("overlap_ratio") == overlap_ratio
+            and data.get("splitter", "characters") == splitter
+            and data.get("store", {}) == manifest.store
+        ):
+            manifest.files = data["files"]
+        return manifest
+
+    def save(self) -> None:
+        """Write the manifest, replacing the previous one atomically."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(
+                {
+                    "version": MANIFEST_VERSION,
+                    "chunk_size": self.chunk_size,
+                    "overlap_ratio": self.overlap_ratio,
+                    "splitter": self.splitter,
+                    "store": self.store,
+                    "files": self.files,
+                },
+                f,
+            )
+        os.replace(tmp_path, self.path)
+
+    def scan(self, file_paths: list[str]) -> FileChanges:
+        """
+        Compare files with the recorded ones.
+
+        Removed files are dropped from the manifest right away. Changed files are
+        recorded by ``track`` once their chunks are ingested.
+
+        Args:
+            file_paths (List[str]): Files currently in the directory.
+
+        Returns:
+            FileChanges: The added, modified, removed and unchanged files.
+        """
+        added, modified, unchanged = [], [], []
+        self._pending = {}
+
+        for file_path in file_paths:
+            stat = os.stat(file_path)
+            state = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+            recorded = self.files.get(file_path)
+
+            if recorded is not None and all(
+                recorded[key] == value for key, value in state.items()
+            ):
+                unchanged.append(file_path)
+                continue
+
+            state["hash"] = file_hash(file_path)
+            if recorded is None:
+                added.append(file_path)
+            elif recorded["hash"] == state["hash"]:
+                # Touched but identical: only the modification time is updated.
+                recorded.update(state)
+                unchanged.append(file_path)
+                continue
+            else:
+                modified.append(file_path)
+            self._pending[file_path] = state
+
+        current = set(file_paths)
+        removed = [file_path for file_path in self.files if file_path not in current]
+        for file_path in removed:
+            del self.files[file_path]
+
+        return FileChanges(added, modified, removed, unchanged)
+
+    def track(self, docs):
+        """
+        Record the changed files of the last ``scan`` as their chunks are ingested.
+
+        Args:
+            docs (Iterable[Document]): Chunks of the changed files.
+
+        Yields:
+            Document: The chunks, unchanged.
+        """
+        num_chunks = dict.fromkeys(self._pending, 0)
+        for doc in docs:
+            file_path = doc.metadata.get("file_path")
+            if file_path in num_chunks:
+                num_chunks[file_path] += 1
+            yield doc
+
+        for file_path, state in self._pending.items():
+            self.files[file_path] = {**state, "chunks": num_chunks[file_path]}
+        self._pending = {}
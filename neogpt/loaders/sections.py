@@ -0,0 +1,231 @@
+"""
+Single-pass extraction of the heading-scoped sections of Markdown and HTML.
+
+A section runs from a heading to the next heading of any level. It is loaded
+with the path of the headings it is nested in, e.g. "Install > Linux", so its
+chunks keep the context of the document outline.
+"""
+
+import re
+from html.parser import HTMLParser
+
+HEADING_SEPARATOR = " > "
+
+ATX_HEADING = re.compile(r" {0,3}(#{1,6})(?:[ \t]+(.*?))?(?:[ \t]+#+)?[ \t]*$")
+SETEXT_UNDERLINE = re.compile(r" {0,3}(=+|-+)[ \t]*$")
+CODE_FENCE = re.compile(r" {0,3}(`{3,}|~{3,})")
+
+
+class SectionBuilder:
+    """
+    Collect the lines of the current section under a stack of headings.
+    """
+
+    def __init__(self) -> None:
+        self.headings = []
+        self.lines = []
+        # Number of lines of the heading starting the current section.
+        self._heading_lines = 0
+
+    def add(self, line: str) -> None:
+        self.lines.append(line)
+
+    def heading(self, level: int, title: str, lines: list[str]):
+        """
+        Start a section at a heading.
+
+        Args:
+            level (int): Level of the heading, from 1.
+            title (str): Title of the heading.
+            lines (List[str]): Lines of the heading, the first of the section.
+
+        Returns:
+            Optional[Tuple[str, dict]]: The section it ends, if it has content.
+        """
+        section = self.flush()
+        while self.headings and self.headings[-1][0] >= level:
+            self.headings.pop()
+        self.headings.append((level, title))
+        self.lines.extend(lines)
+        self._heading_lines = len(lines)
+        return section
+
+    def flush(self):
+        """
+        End the current section.
+
+        A section holding only its heading is dropped, its title is in the
+        heading path of the sections nested in it.
+
+        Returns:
+            Optional[Tuple[str, dict]]: Text and metadata of the section.
+        """
+        lines, self.lines = self.lines, []
+        heading_lines, self._heading_lines = self._heading_lines, 0
+        if not any(line.strip() for line in lines[heading_lines:]):
+            return None
+
+        metadata = {}
+        if self.headings:
+            metadata["section"] = HEADING_SEPARATOR.join(
+                title for _, title in self.headings
+            )
+        return "\n".join(lines).strip("\n"), metadata
+
+
+def markdown_sections(lines):
+    """
+    Split Markdown into sections at its ATX (``# Title``) and setext headings.
+
+    The Markdown source of every section is kept as is, including its heading
+    line. Lines in fenced code blocks are never taken for headings.
+
+    Args:
+        lines (Iterable[str]): Lines of the document.
+
+    Yields:
+        Tuple[str, dict]: Text and metadata of every section.
+    """
+    builder = SectionBuilder()
+    fence = None
+    # Whether the last line may be the title of a setext heading.
+    paragraph = False
+
+    for line in lines:
+        line = line.rstrip("\r\n")
+
+        if fence is not None:
+            builder.add(line)
+            if line.strip().startswith(fence) and not line.strip().strip(fence[0]):
+                fence = None
+            continue
+
+        if match := CODE_FENCE.match(line):
+            fence = match.group(1)
+            builder.add(line)
+            paragraph = False
+            continue
+
+        if match := ATX_HEADING.match(line):
+            title = (match.group(2) or "").strip()
+            if section := builder.heading(len(match.group(1)), title, [line]):
+                yield section
+            paragraph = False
+            continue
+
+        if paragraph and (match := SETEXT_UNDERLINE.match(line)):
+            title = builder.lines.pop()
+            level = 1 if match.group(1)[0] == "=" else 2
+            if section := builder.heading(level, title.strip(), [title, line]):
+                yield section
+            paragraph = False
+            continue
+
+        builder.add(line)
+        # Indented code is not a paragraph.
+        paragraph = bool(line.strip()) and not line.startswith(("    ", "\t"))
+
+    if section := builder.flush():
+        yield section
+
+
+class HTMLSectionParser(HTMLParser):
+    """
+    Split HTML into sections at its ``<h1>`` to ``<h6>`` headings.
+
+    The text is extracted as the document is fed, without building a tree.
+    Block elements start a new line, and scripts, styles and the like are
+    skipped. Completed sections are collected in ``sections``.
+    """
+
+    HEADINGS = {"h1": 1, "h2": 2, "h3": 3, "h4": 4, "h5": 5, "h6": 6}
+    SKIPPED = {"script", "style", "noscript", "template", "svg"}
+    BLOCKS = {
+        "address", "article", "aside", "blockquote", "br", "dd", "details",
+        "div", "dl", "dt", "figcaption", "figure", "footer", "form", "header",
+        "hr", "li", "main", "nav", "ol", "p", "pre", "section", "summary",
+        "table", "td", "th", "title", "tr", "ul",
+    }
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.sections = []
+        self._builder = SectionBuilder()
+        self._text = []
+        self._skip = 0
+        self._pre = 0
+        # Level and text of the heading being read.
+        self._heading = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIPPED:
+            self._skip += 1
+        elif tag in self.HEADINGS and self._heading is None:
+            self._end_line()
+            self._heading = (self.HEADINGS[tag], [])
+        elif tag in self.BLOCKS:
+            self._end_line()
+            if tag == "pre":
+                self._pre += 1
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIPPED:
+            self._skip = max(self._skip - 1, 0)
+        elif tag in self.HEADINGS and self._heading is not None:
+            level, parts = self._heading
+            self._heading = None
+            title = " ".join("".join(parts).split())
+            if title:
+                if section := self._builder.heading(level, title, [title]):
+                    self.sections.append(section)
+        elif tag in self.BLOCKS:
+            self._end_line()
+            if tag == "pre":
+                self._pre = max(self._pre - 1, 0)
+
+    def handle_data(self, data):
+        if self._skip:
+            return
+        if self._heading is not None:
+            self._heading[1].append(data)
+        elif self._pre:
+            lines = data.split("\n")
+            self._text.append(lines[0])
+            for line in lines[1:]:
+                self._end_line()
+                self._text.append(line)
+        else:
+            self._text.append(data)
+
+    def _end_line(self) -> None:
+        text = "".join(self._text)
+        self._text = []
+        line = text.rstrip() if self._pre else " ".join(text.split())
+        if line.strip():
+            self._builder.add(line)
+
+    def close(self):
+        super().close()
+        self._end_line()
+        if section := self._builder.flush():
+            self.sections.append(section)
+
+
+def html_sections(f, block_size: int = 1 << 16):
+    """
+    Split HTML read from a text file into sections, see ``HTMLSectionParser``.
+
+    Args:
+        f (TextIO): The HTML document.
+        block_size (int): Number of characters parsed at a time.
+
+    Yields:
+        Tuple[str, dict]: Text and metadata of every section.
+    """
+    parser = HTMLSectionParser()
+    while block := f.read(block_size):
+        parser.feed(block)
+        yield from parser.sections
+        parser.sections.clear()
+    parser.close()
+    yield from parser.sections
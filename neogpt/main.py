@@ -1,6 +1,4 @@
 import typer
-from core import NeoGPT
-from utils.conversation_navigator import conversation_navigator
 
 app = typer.Typer()
 
@@ -55,14 +53,37 @@ def main(
         "-ssd",
         help="Show the source document for the response.",
     ),
+    warm_up: bool = typer.Option(
+        False,
+        "--warm-up",
+        "-w",
+        help="Load the vector database in the background while you type.",
+    ),
+    chunking: str = typer.Option(
+        "characters",
+        "--chunking",
+        "-ch",
+        help="Unit of the chunk size when building: characters, tokens of the embedding model, or approximate-tokens.",
+    ),
+    pdf_workers: int = typer.Option(
+        0,
+        "--pdf-workers",
+        "-pw",
+        help="Number of worker processes extracting the pages of a large PDF when building.",
+    ),
 ):
-    neogpt = NeoGPT()
+    # Imported here so that --help does not load the NeoGPT modules.
+    from core import NeoGPT
+    from utils.conversation_navigator import conversation_navigator
+
+    # Building replaces the vector database, so it is not warmed up concurrently.
+    neogpt = NeoGPT(warm_up=warm_up and not build)
 
     if verbose:
         neogpt.verbose = True
 
     if build:
-        neogpt.build()
+        neogpt.build(chunking=chunking, pdf_workers=pdf_workers)
 
     if api_key:
         neogpt.llm.api_key = api_key
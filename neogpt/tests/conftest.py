@@ -0,0 +1,38 @@
+import hashlib
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# The modules import each other from the neogpt directory, e.g. `from loaders.base import BaseLoader`.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeModel:
+    """
+    A sentence-transformers 2.x-like embedding model without model card data.
+
+    Every text is embedded as a random vector seeded by its hash, so equal texts
+    get equal embeddings across processes. ``encoded`` counts the encoded texts.
+    """
+
+    def __init__(self, dim: int = 8) -> None:
+        self.dim = dim
+        self.encoded = 0
+
+    def encode(self, texts, **kwargs):
+        self.encoded += len(texts)
+        return np.stack(
+            [
+                np.random.default_rng(
+                    int.from_bytes(hashlib.blake2b(text.encode()).digest()[:8], "little")
+                ).random(self.dim)
+                for text in texts
+            ]
+        ).astype(np.float32)
+
+
+@pytest.fixture
+def fake_model():
+    return FakeModel()
@@ -0,0 +1,74 @@
+import os
+
+import numpy as np
+from vectorstore.bm25 import DELTA_POSTINGS_FILE
+from vectorstore.metadata import MetadataIndex
+from vectorstore.neostore import Document, NeoSearchMode, NeoStore
+
+WORDS = ["alpha", "beta", "gamma", "delta", "epsilon"]
+
+
+def make_docs(start, stop, words=WORDS):
+    rng = np.random.default_rng(start)
+    return [
+        Document(
+            " ".join(rng.choice(words, size=3 + i % 7)), {"file_path": f"/data/{i % 13}.txt"}
+        )
+        for i in range(start, stop)
+    ]
+
+
+def ranking(store, query):
+    return [
+        (doc.content, round(doc.metadata["score"], 4))
+        for doc in store.search(query, 10, mode=NeoSearchMode.SPARSE)
+    ]
+
+
+def test_added_documents_go_to_the_bm25_delta_log(tmp_path, fake_model):
+    path = str(tmp_path / "store")
+    base, added = make_docs(0, 200), make_docs(200, 230, WORDS + ["zeta"])
+    options = {"embedding_cache": False, "compaction_threshold": 0.5}
+    store = NeoStore(fake_model, **options)
+    store.build_store(base, persist=True, embeddings_path=path)
+    postings_path = os.path.join(path, "bm25_doc_ids.npy")
+    before = os.stat(postings_path)
+
+    store = NeoStore.load_embeddings(path, fake_model, **options)
+    store.add_documents(added[:10])
+    store.add_documents(added[10:])
+
+    # The main posting lists are neither re-sorted nor rewritten.
+    assert os.stat(postings_path).st_mtime_ns == before.st_mtime_ns
+    assert os.path.isfile(os.path.join(path, DELTA_POSTINGS_FILE))
+
+    expected = NeoStore(fake_model, **options)
+    expected.build_store(base + added)
+    for query in ["zeta", "alpha zeta", "beta gamma"]:
+        assert ranking(store, query) == ranking(expected, query)
+        assert ranking(NeoStore.load_embeddings(path, fake_model), query) == ranking(
+            expected, query
+        )
+
+    store.compact()
+    assert not os.path.exists(os.path.join(path, DELTA_POSTINGS_FILE))
+    assert ranking(NeoStore.load_embeddings(path, fake_model), "alpha zeta") == ranking(
+        expected, "alpha zeta"
+    )
+
+
+def test_metadata_save_appends_new_values(tmp_path):
+    index = MetadataIndex()
+    index.add({"file_path": f"/data/{i}.txt"} for i in range(3))
+    index.save(str(tmp_path))
+    values_path = tmp_path / "metadata" / "0.jsonl"
+    saved = values_path.read_text()
+
+    index.add({"file_path": f"/data/{i}.txt"} for i in range(2, 5))
+    index.save(str(tmp_path), start=3)
+
+    assert values_path.read_text().startswith(saved)
+    loaded = MetadataIndex.load(str(tmp_path))
+    assert loaded.values == index.values
+    assert loaded.rows({"file_path": "/data/4.txt"}).tolist() == [5]
+    assert loaded.rows({"file_path": "/data/2.txt"}).tolist() == [2, 3]
@@ -0,0 +1,62 @@
+import io
+import tarfile
+
+from loaders.file import TarLoader, _is_hidden
+
+
+def make_tar(path, members):
+    with tarfile.open(path, "w") as tar:
+        for name, content in members.items():
+            data = content.encode()
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+
+
+def test_is_hidden():
+    assert _is_hidden(".git/config")
+    assert _is_hidden("__MACOSX/a.txt")
+    assert _is_hidden("docs/.DS_Store")
+    assert not _is_hidden("./a.txt")
+    assert not _is_hidden("./sub/b.txt")
+    assert not _is_hidden("../a.txt")
+
+
+def test_tar_with_dot_prefixed_members(tmp_path):
+    # As made by `tar -C dir .`.
+    path = str(tmp_path / "data.tar")
+    make_tar(path, {"./a.txt": "first file", "./sub/b.txt": "second file", "./.hidden.txt": "x"})
+
+    assert list(TarLoader(path).lazy_load()) == ["first file", "second file"]
+
+
+def test_members_are_separate_segments(tmp_path):
+    inner = tmp_path / "inner.tar"
+    make_tar(str(inner), {"c.txt": "nested file"})
+    path = str(tmp_path / "data.tar")
+    with tarfile.open(path, "w") as tar:
+        for name, data in (("a.txt", b"first file"), ("b.txt", b"second file")):
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+        tar.add(str(inner), arcname="inner.tar")
+
+    assert list(TarLoader(path).load_segments()) == [
+        ("first file", {"member": "a.txt"}),
+        ("second file", {"member": "b.txt"}),
+        ("nested file", {"member": "inner.tar/c.txt"}),
+    ]
+
+
+def test_directory_loader_chunks_members_apart(tmp_path):
+    from loaders.dirloader import DirectoryLoader
+
+    path = str(tmp_path / "data.tar")
+    make_tar(path, {"a.txt": "first file", "b.txt": "second file"})
+
+    docs = DirectoryLoader(str(tmp_path)).load_data()
+    assert [(doc.content, doc.metadata["member"]) for doc in docs] == [
+        ("first file", "a.txt"),
+        ("second file", "b.txt"),
+    ]
+    assert all(doc.metadata["file_path"] == path for doc in docs)
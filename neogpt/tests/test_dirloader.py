@@ -0,0 +1,24 @@
+from loaders.base import BaseLoader
+from loaders.dirloader import DirectoryLoader
+from loaders.file import LOADER_MAP
+
+
+class BrokenLoader(BaseLoader):
+    """Yields a segment the splitter cannot split, after a valid one."""
+
+    merge_segments = False
+
+    def load_segments(self):
+        yield "valid text", {}
+        yield None, {}
+
+
+def test_file_failing_in_process_is_skipped(tmp_path, monkeypatch):
+    monkeypatch.setitem(LOADER_MAP, ".broken", BrokenLoader)
+    (tmp_path / "a.txt").write_text("first file")
+    (tmp_path / "b.broken").write_text("")
+    (tmp_path / "c.txt").write_text("last file")
+
+    docs = DirectoryLoader(str(tmp_path), num_workers=0).load_data()
+
+    assert [doc.content for doc in docs] == ["first file", "valid text", "last file"]
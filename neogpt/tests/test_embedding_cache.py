@@ -0,0 +1,25 @@
+import pytest
+from vectorstore import neostore
+from vectorstore.cache import EmbeddingCache
+from vectorstore.neostore import EMBEDDING_MODEL_NAME, Document, NeoStore
+
+
+@pytest.fixture
+def default_model(monkeypatch, fake_model):
+    monkeypatch.setattr(neostore, "load_embedding_model", lambda: fake_model)
+    return fake_model
+
+
+def test_default_model_is_cached_under_its_name(tmp_path, default_model):
+    docs = [Document(f"document {i}", {"file_path": f"/data/{i % 7}.txt"}) for i in range(1000)]
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"))
+
+    store = NeoStore(embedding_cache=cache, bm25=False)
+    store.build_store_streaming(iter(docs), embeddings_path=str(tmp_path / "store"), block_size=100)
+    assert default_model.encoded == 1000
+    assert store.embedding_model_name == EMBEDDING_MODEL_NAME
+
+    default_model.encoded = 0
+    store = NeoStore(embedding_cache=cache, bm25=False)
+    store.build_store_streaming(iter(docs), embeddings_path=str(tmp_path / "store"), block_size=100)
+    assert default_model.encoded == 0
@@ -0,0 +1,23 @@
+import numpy as np
+from vectorstore.encoder import ParallelEncoder
+from vectorstore.neostore import Document, NeoStore
+
+
+def test_batches_are_yielded_in_order(fake_model):
+    batches = [[f"text {i}-{j}" for j in range(i % 3 + 1)] for i in range(12)]
+    with ParallelEncoder(fake_model, num_workers=2, max_pending=3) as encoder:
+        embeddings = list(encoder.encode(iter(batches)))
+
+    assert len(embeddings) == len(batches)
+    for batch, batch_embeddings in zip(batches, embeddings):
+        np.testing.assert_array_equal(batch_embeddings, fake_model.encode(batch))
+
+
+def test_worker_build_matches_in_process_build(fake_model):
+    docs = [Document(f"doc{i}", {"file_path": f"/data/{i % 3}.txt"}) for i in range(100)]
+    in_process = NeoStore(fake_model, embedding_cache=False)
+    expected = in_process.build_store(docs, batch_size=16)
+
+    store = NeoStore(fake_model, encode_workers=2, embedding_cache=False)
+    np.testing.assert_array_equal(store.build_store(docs, batch_size=16), expected)
+    assert store.search("doc5", 3) == in_process.search("doc5", 3)
@@ -0,0 +1,130 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("requests")
+from loaders.fetcher import ResponseCache, WebFetcher  # noqa: E402
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append(self.path)
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        try:
+            if self.path == "/page":
+                if self.headers.get("If-None-Match") == '"v1"':
+                    self.reply(304)
+                else:
+                    self.reply(200, "page v1", {"ETag": '"v1"'})
+            elif self.path == "/dated":
+                if self.headers.get("If-Modified-Since") == "Mon, 01 Jan 2024 00:00:00 GMT":
+                    self.reply(304)
+                else:
+                    self.reply(
+                        200, "dated", {"Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"}
+                    )
+            elif self.path == "/flaky":
+                if server.requests.count("/flaky") == 1:
+                    self.reply(503)
+                else:
+                    self.reply(200, "recovered", {"ETag": '"f"'})
+            elif self.path == "/not-modified":
+                # A misbehaving server answering 304 to unconditional requests.
+                if self.headers.get("Cache-Control") == "no-cache":
+                    self.reply(200, "fresh", {"ETag": '"n"'})
+                else:
+                    self.reply(304)
+            elif self.path.startswith("/slow/"):
+                time.sleep(0.1)
+                self.reply(200, self.path)
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def reply(self, status, body="", headers=None):
+        data = body.encode()
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if status != 304:
+            self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        if status != 304:
+            self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.lock = threading.Lock()
+    server.requests = []
+    server.active = server.max_active = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def url(server, path):
+    return f"http://127.0.0.1:{server.server_port}{path}"
+
+
+def text(response):
+    return response.text
+
+
+@pytest.mark.parametrize("path", ["/page", "/dated"])
+def test_unchanged_page_is_revalidated(server, tmp_path, path):
+    cache = ResponseCache(str(tmp_path))
+    with WebFetcher(cache=cache) as fetcher:
+        first = fetcher.fetch(url(server, path), text)
+    parsed = []
+    with WebFetcher(cache=cache) as fetcher:
+        assert fetcher.fetch(url(server, path), parsed.append) == first
+    # The 304 response reuses the cached text without parsing a body.
+    assert parsed == []
+    assert server.requests == [path, path]
+
+
+def test_server_errors_are_retried(server, tmp_path):
+    with WebFetcher(backoff_factor=0, cache=ResponseCache(str(tmp_path))) as fetcher:
+        assert fetcher.fetch(url(server, "/flaky"), text) == "recovered"
+    assert server.requests == ["/flaky", "/flaky"]
+
+
+def test_not_modified_without_cache_entry_is_requested_again(server, tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    with WebFetcher(cache=cache) as fetcher:
+        assert fetcher.fetch(url(server, "/not-modified"), text) == "fresh"
+    assert cache.get(url(server, "/not-modified"))["text"] == "fresh"
+
+
+def test_requests_per_host_are_limited(server, tmp_path):
+    urls = [url(server, f"/slow/{i}") for i in range(8)]
+    with WebFetcher(max_workers=8, max_per_host=2, cache=False) as fetcher:
+        pages = list(fetcher.map(lambda page_url: fetcher.fetch(page_url, text), urls))
+    assert pages == [f"/slow/{i}" for i in range(8)]
+    assert server.max_active == 2
+
+
+def test_loaded_content_is_cached(tmp_path):
+    calls = []
+
+    def load(session):
+        calls.append(session)
+        return "transcript"
+
+    cache = ResponseCache(str(tmp_path))
+    for _ in range(2):
+        with WebFetcher(cache=cache) as fetcher:
+            assert fetcher.load("https://www.youtube.com/watch?v=abc", load) == "transcript"
+    assert len(calls) == 1
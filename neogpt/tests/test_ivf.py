@@ -0,0 +1,46 @@
+import numpy as np
+from vectorstore.ivf import IVFIndex
+from vectorstore.neostore import Document, NeoIndex, NeoStore
+
+
+def make_docs(start=0, stop=400):
+    return [Document(f"doc{i}", {"file_path": f"/data/{i % 9}.txt"}) for i in range(start, stop)]
+
+
+def contents(results):
+    return [doc.content for doc in results]
+
+
+def test_every_vector_is_listed_once(fake_model):
+    vectors = fake_model.encode(contents(make_docs()))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ivf = IVFIndex.train(vectors, nlist=16)
+
+    assert ivf.nlist == 16
+    assert sorted(ivf.ids.tolist()) == list(range(len(vectors)))
+    for c in range(ivf.nlist):
+        assert (ivf.assignments[ivf.ids[ivf.offsets[c] : ivf.offsets[c + 1]]] == c).all()
+
+
+def test_probing_every_list_matches_flat_search(fake_model):
+    flat = NeoStore(fake_model, embedding_cache=False)
+    flat.build_store(make_docs())
+    ivf = NeoStore(fake_model, index_type=NeoIndex.IVF, nlist=16, embedding_cache=False)
+    ivf.build_store(make_docs())
+
+    for query in ["alpha", "beta", "gamma"]:
+        assert contents(ivf.search(query, 10, nprobe=16)) == contents(flat.search(query, 10))
+        assert len(ivf.search(query, 10, nprobe=1)) == 10
+
+
+def test_added_documents_are_listed(tmp_path, fake_model):
+    store = NeoStore(fake_model, index_type=NeoIndex.IVF, nlist=16, nprobe=1, embedding_cache=False)
+    store.build_store(make_docs())
+    store.save_embeddings(str(tmp_path / "store"))
+
+    loaded = NeoStore.load_embeddings(str(tmp_path / "store"), fake_model, nprobe=1, embedding_cache=False)
+    loaded.add_documents(make_docs(400, 420))
+
+    # A document is listed under its nearest centroid, which is probed first for itself.
+    for i in range(400, 420):
+        assert loaded.search(f"doc{i}", 1)[0].content == f"doc{i}"
@@ -0,0 +1,25 @@
+import json
+
+from loaders.dirloader import DirectoryLoader
+from loaders.file import JSONLoader
+
+
+def test_object_is_loaded_one_key_per_line(tmp_path):
+    path = tmp_path / "config.json"
+    path.write_text(json.dumps({"name": "neogpt", "tags": ["rag", "local"], "size": 3}))
+
+    assert JSONLoader(str(path)).load() == (
+        '{"name": "neogpt"}\n{"tags": ["rag", "local"]}\n{"size": 3}'
+    )
+
+
+def test_json_files_are_chunked(tmp_path):
+    records = [{"id": i, "text": f"record {i} " * 20} for i in range(100)]
+    (tmp_path / "records.json").write_text(json.dumps(records))
+
+    docs = DirectoryLoader(str(tmp_path / "records.json")).load_data()
+
+    assert len(docs) > 1
+    assert all(len(doc.content) <= 1000 for doc in docs)
+    text = "\n".join(doc.content for doc in docs)
+    assert all(json.dumps(record) in text for record in records)
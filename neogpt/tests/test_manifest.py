@@ -0,0 +1,35 @@
+import pytest
+from loaders.manifest import IngestionManifest
+from vectorstore.neostore import NeoIndex, NeoQuantization, NeoStore
+
+
+def ingest(tmp_path, store):
+    data = tmp_path / "data"
+    data.mkdir(exist_ok=True)
+    (data / "a.txt").write_text("alpha")
+    manifest = IngestionManifest.load(str(tmp_path / "manifest.json"), store=store.build_config)
+    manifest.scan([str(data / "a.txt")])
+    list(manifest.track([]))
+    manifest.save()
+    return manifest
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        {"embedding_model_name": "other-model"},
+        {"index_type": NeoIndex.IVF},
+        {"quantization": NeoQuantization.INT8},
+        {"bm25": False},
+    ],
+)
+def test_manifest_of_another_store_config_is_discarded(tmp_path, fake_model, options):
+    built = NeoStore(fake_model, embedding_model_name="model", embedding_cache=False)
+    ingest(tmp_path, built)
+    path = str(tmp_path / "manifest.json")
+
+    assert IngestionManifest.load(path, store=built.build_config).files
+    configured = NeoStore(
+        fake_model, **{"embedding_model_name": "model", "embedding_cache": False, **options}
+    )
+    assert IngestionManifest.load(path, store=configured.build_config).files == {}
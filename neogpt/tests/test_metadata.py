@@ -0,0 +1,51 @@
+import json
+import os
+
+import numpy as np
+from vectorstore.metadata import MetadataIndex
+
+
+def chunk_metadata(i):
+    return {"file_path": f"/data/{i // 100}.txt", "start_index": i * 800, "end_index": i * 800 + 1000}
+
+
+def test_numeric_keys_are_raw_columns(tmp_path):
+    index = MetadataIndex()
+    index.add(chunk_metadata(i) for i in range(1000))
+    index.add([{"file_path": "/data/x.md", "section": "Intro"}])
+
+    assert index.numeric == {"start_index", "end_index"}
+    assert set(index.values) == {"file_path", "section"}
+    assert index.rows({"start_index": 1600}).tolist() == [2]
+    assert index.rows({"end_index": {"$in": [1000, 1800]}, "file_path": "/data/0.txt"}).tolist() == [0, 1]
+    assert index.rows({"start_index": 1}).tolist() == []
+
+    index.save(str(tmp_path))
+    with open(os.path.join(tmp_path, "metadata", "columns.json")) as f:
+        keys = json.load(f)["keys"]
+    # Only dictionary-encoded columns have a value file.
+    assert {
+        key for column_id, key in enumerate(keys)
+        if os.path.isfile(os.path.join(tmp_path, "metadata", f"{column_id}.jsonl"))
+    } == {"file_path", "section"}
+
+    loaded = MetadataIndex.load(str(tmp_path))
+    assert loaded.numeric == index.numeric
+    assert loaded.rows({"start_index": 1600}).tolist() == [2]
+    assert np.isnan(loaded.columns["start_index"][-1])
+
+
+def test_numeric_column_is_encoded_when_mixed(tmp_path):
+    index = MetadataIndex()
+    index.add([{"page": 1}, {"page": 2}])
+    index.save(str(tmp_path))
+
+    index.add([{"page": "cover"}, {}])
+    assert "page" not in index.numeric
+    assert index.rows({"page": 2}).tolist() == [1]
+    assert index.rows({"page": "cover"}).tolist() == [2]
+
+    index.save(str(tmp_path), start=2)
+    loaded = MetadataIndex.load(str(tmp_path))
+    assert loaded.rows({"page": [1, "cover"]}).tolist() == [0, 2]
+    assert loaded.columns["page"].tolist() == [0, 1, 2, -1]
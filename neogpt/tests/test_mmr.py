@@ -0,0 +1,43 @@
+from vectorstore.neostore import Document, NeoStore
+
+
+def make_store(model):
+    # Every text but "alpha" has a copy, which only adds redundant results.
+    docs = [Document("alpha", {"file_path": "/data/0.txt"})]
+    docs += [
+        Document(f"doc{i}", {"file_path": f"/data/{copy}.txt"})
+        for i in range(30)
+        for copy in (1, 2)
+    ]
+    store = NeoStore(model, embedding_cache=False)
+    store.build_store(docs)
+    return store
+
+
+def contents(results):
+    return [doc.content for doc in results]
+
+
+def test_mmr_skips_duplicates(fake_model):
+    store = make_store(fake_model)
+
+    plain = contents(store.search("doc3", 4))
+    assert plain[:2] == ["doc3", "doc3"]
+
+    diverse = contents(store.search("doc3", 4, mmr_lambda=0.3, fetch_k=20))
+    assert diverse[0] == "doc3"
+    assert len(set(diverse)) == 4
+
+
+def test_relevance_only_mmr_matches_search(fake_model):
+    store = make_store(fake_model)
+    assert contents(store.search("doc3", 5, mmr_lambda=1.0)) == contents(store.search("doc3", 5))
+
+
+def test_batched_mmr_matches_search(fake_model):
+    store = make_store(fake_model)
+    queries = ["doc1", "doc2", "alpha"]
+    batch = store.search_batch(queries, 3, mmr_lambda=0.3)
+    assert [contents(results) for results in batch] == [
+        contents(store.search(query, 3, mmr_lambda=0.3)) for query in queries
+    ]
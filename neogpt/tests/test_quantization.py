@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+from vectorstore.neostore import Document, NeoQuantization, NeoStore
+from vectorstore.quantization import ProductQuantizer, ScalarQuantizer
+
+
+def make_docs():
+    return [Document(f"doc{i}", {"file_path": f"/data/{i % 5}.txt"}) for i in range(300)]
+
+
+@pytest.mark.parametrize("quantizer", [ScalarQuantizer, ProductQuantizer])
+def test_codes_approximate_the_dot_products(quantizer):
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((500, 16)).astype(np.float32)
+    trained = quantizer.train(vectors)
+
+    assert trained.codes.dtype == np.uint8
+    query = rng.standard_normal(16).astype(np.float32)
+    exact = vectors @ query
+    approximate = trained.dot(query)
+    assert np.corrcoef(exact, approximate)[0, 1] > 0.9
+
+
+@pytest.mark.parametrize("quantization", [NeoQuantization.INT8, NeoQuantization.PQ])
+def test_reranked_results_have_exact_scores(tmp_path, fake_model, quantization):
+    flat = NeoStore(fake_model, embedding_cache=False)
+    flat.build_store(make_docs())
+    store = NeoStore(fake_model, quantization=quantization, embedding_cache=False)
+    store.build_store(make_docs())
+    store.save_embeddings(str(tmp_path / "store"))
+
+    # Re-scoring every row returns the exact ranking.
+    loaded = NeoStore.load_embeddings(
+        str(tmp_path / "store"), fake_model, rerank_factor=60, embedding_cache=False
+    )
+    assert loaded.quantization == quantization
+    for query in ["alpha", "beta", "gamma"]:
+        results, expected = loaded.search(query, 5), flat.search(query, 5)
+        assert [doc.content for doc in results] == [doc.content for doc in expected]
+        assert [doc.metadata["score"] for doc in results] == pytest.approx(
+            [doc.metadata["score"] for doc in expected], rel=1e-5
+        )
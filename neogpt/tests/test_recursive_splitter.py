@@ -0,0 +1,40 @@
+from loaders.dirloader import CharacterTextSplitter
+
+
+def make_text():
+    return "\n\n".join(
+        "\n".join(f"paragraph {p} line {i} " + "word " * (p % 4) for i in range(p % 5 + 1))
+        for p in range(60)
+    )
+
+
+def test_chunks_cover_the_text_within_their_size():
+    text = make_text()
+    splitter = CharacterTextSplitter(200, 0.2)
+    chunks = splitter.split_text(text)
+
+    covered = set()
+    for chunk, start, end in chunks:
+        assert len(chunk) <= 200
+        assert text[start:end] == chunk
+        covered.update(range(start, end))
+    assert all(i in covered for i, char in enumerate(text) if not char.isspace())
+    # Consecutive chunks overlap by at most overlap_size characters.
+    for (_, _, end), (_, next_start, _) in zip(chunks, chunks[1:]):
+        assert end - next_start <= splitter.overlap_size
+
+
+def test_paragraphs_that_fit_are_not_cut():
+    paragraphs = [f"paragraph {p} " + "word " * (p % 9) for p in range(40)]
+    chunks = CharacterTextSplitter(120, 0.0).split_text_into_chunks("\n\n".join(paragraphs))
+
+    assert [paragraph.strip() for chunk in chunks for paragraph in chunk.split("\n\n")] == [
+        paragraph.strip() for paragraph in paragraphs
+    ]
+
+
+def test_long_words_are_split_into_windows():
+    chunks = CharacterTextSplitter(100, 0.0).split_text("x" * 1050)
+    assert [(start, end) for _, start, end in chunks] == [
+        (start, min(start + 100, 1050)) for start in range(0, 1050, 100)
+    ]
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+from vectorstore.neostore import Document, NeoMetric, NeoStore
+
+
+def make_docs():
+    return [Document(f"doc{i}", {"file_path": f"/data/{i % 7}.txt"}) for i in range(200)]
+
+
+def exact_top_k(model, docs, query, k, metric):
+    vectors = model.encode([doc.content for doc in docs])
+    query_vector = model.encode([query])[0]
+    if metric == NeoMetric.COSINE:
+        keys = -(vectors @ query_vector) / np.linalg.norm(vectors, axis=1)
+    else:
+        keys = np.linalg.norm(vectors - query_vector, axis=1)
+    return [docs[i].content for i in np.argsort(keys)[:k]]
+
+
+@pytest.mark.parametrize("metric", [NeoMetric.COSINE, NeoMetric.EUCLIDEAN])
+def test_search_matches_exact_scores(fake_model, metric):
+    docs = make_docs()
+    store = NeoStore(fake_model, similarity_metric=metric, embedding_cache=False)
+    store.build_store(docs)
+
+    for query in ["alpha", "beta", "gamma"]:
+        results = store.search(query, 5)
+        assert [doc.content for doc in results] == exact_top_k(
+            fake_model, docs, query, 5, metric
+        )
+
+
+@pytest.mark.parametrize("metric", [NeoMetric.COSINE, NeoMetric.EUCLIDEAN])
+def test_search_batch_matches_search(fake_model, metric):
+    store = NeoStore(fake_model, similarity_metric=metric, embedding_cache=False)
+    store.build_store(make_docs())
+
+    queries = [f"query {i}" for i in range(10)]
+    batch = store.search_batch(queries, k=4, batch_size=3)
+    for results, query in zip(batch, queries):
+        expected = store.search(query, 4)
+        # A matrix product may round differently from a matrix-vector product.
+        assert [doc.content for doc in results] == [doc.content for doc in expected]
+        assert [doc.metadata["score"] for doc in results] == pytest.approx(
+            [doc.metadata["score"] for doc in expected], rel=1e-5
+        )
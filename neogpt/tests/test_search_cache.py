@@ -0,0 +1,36 @@
+import numpy as np
+from vectorstore.neostore import Document, NeoIndex, NeoQuantization, NeoSearchMode, NeoStore
+
+
+def ranking(docs):
+    return [(doc.content, round(doc.metadata["score"], 5)) for doc in docs]
+
+
+def test_changed_defaults_are_not_served_from_cache(fake_model):
+    rng = np.random.default_rng(0)
+    docs = [
+        Document(f"doc{i} " + " ".join(rng.choice(["alpha", "beta", "gamma"], size=5 + i)), {})
+        for i in range(500)
+    ]
+    store = NeoStore(
+        fake_model,
+        index_type=NeoIndex.IVF,
+        nprobe=1,
+        quantization=NeoQuantization.INT8,
+        rerank_factor=1,
+        embedding_cache=False,
+    )
+    store.build_store(docs)
+
+    for name, value in [
+        ("nprobe", 64),
+        ("rerank_factor", 100),
+        ("search_mode", NeoSearchMode.HYBRID),
+        ("hybrid_weight", 0.2),
+        ("search_mode", NeoSearchMode.SPARSE),
+    ]:
+        store.search("beta gamma", 5)
+        setattr(store, name, value)
+        after = ranking(store.search("beta gamma", 5))
+        store._results.clear()
+        assert after == ranking(store.search("beta gamma", 5)), name
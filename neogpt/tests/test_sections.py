@@ -0,0 +1,68 @@
+import io
+
+from loaders.dirloader import DirectoryLoader
+from loaders.sections import html_sections, markdown_sections
+
+MARKDOWN = """# Guide
+Intro text.
+
+## Install
+```sh
+# not a heading
+pip install neogpt
+```
+
+### Linux
+Use apt.
+
+Usage
+-----
+Run it.
+"""
+
+HTML = """<html><head><title>Guide</title><style>h1 { color: red }</style></head>
+<body><h1>Guide</h1><p>Intro <b>text</b>.</p>
+<h2>Install</h2><pre>pip install
+neogpt</pre><script>var h2 = "<h2>";</script>
+<h3>Linux</h3><ul><li>Use apt.</li></ul>
+<h2>Usage</h2><p>Run it.</p></body></html>"""
+
+
+def test_markdown_sections_keep_their_heading_path():
+    sections = list(markdown_sections(io.StringIO(MARKDOWN)))
+
+    assert [metadata["section"] for _, metadata in sections] == [
+        "Guide",
+        "Guide > Install",
+        "Guide > Install > Linux",
+        "Guide > Usage",
+    ]
+    # The fenced comment is code, and the source of a section is kept as is.
+    assert sections[1][0] == "## Install\n```sh\n# not a heading\npip install neogpt\n```"
+    assert sections[3][0] == "Usage\n-----\nRun it."
+
+
+def test_html_sections_skip_scripts_and_styles():
+    # Tags split across blocks are parsed like whole ones.
+    sections = list(html_sections(io.StringIO(HTML), block_size=16))
+
+    assert sections == [
+        # The text before the first heading has no section.
+        ("Guide", {}),
+        ("Guide\nIntro text.", {"section": "Guide"}),
+        ("Install\npip install\nneogpt", {"section": "Guide > Install"}),
+        ("Linux\nUse apt.", {"section": "Guide > Install > Linux"}),
+        ("Usage\nRun it.", {"section": "Guide > Usage"}),
+    ]
+
+
+def test_chunks_of_a_markdown_file_have_their_section(tmp_path):
+    (tmp_path / "guide.md").write_text(MARKDOWN)
+    docs = DirectoryLoader(str(tmp_path), num_workers=0).load_data()
+
+    assert [doc.metadata["section"] for doc in docs] == [
+        "Guide",
+        "Guide > Install",
+        "Guide > Install > Linux",
+        "Guide > Usage",
+    ]
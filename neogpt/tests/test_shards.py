@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+from vectorstore.neostore import Document, NeoSearchMode, NeoStore
+from vectorstore.shards import ShardedNeoStore
+
+
+def make_docs():
+    rng = np.random.default_rng(0)
+    docs = []
+    for i in range(400):
+        # Shards hold different topics, so their own BM25 statistics differ, and
+        # distinct lengths keep BM25 scores free of ties.
+        topic = ["apple", "banana", "cherry", "durian"][i // 100]
+        words = rng.choice(["alpha", "beta", "gamma", "delta", topic, "apple"], size=5 + i)
+        docs.append(Document(f"doc{i} " + " ".join(words), {"file_path": f"/data/{i}.txt"}))
+    return docs
+
+
+@pytest.fixture
+def stores(fake_model):
+    docs = make_docs()
+    store = NeoStore(fake_model, embedding_cache=False)
+    store.build_store(docs)
+    sharded = ShardedNeoStore(fake_model, num_shards=4, num_workers=0, embedding_cache=False)
+    sharded.build_store(docs)
+    return store, sharded
+
+
+def ranking(docs):
+    return [(doc.content, round(doc.metadata["score"], 5)) for doc in docs]
+
+
+@pytest.mark.parametrize("query", ["apple", "banana gamma", "cherry apple delta"])
+def test_sparse_matches_single_store(stores, query):
+    store, sharded = stores
+    expected = store.search(query, k=10, mode=NeoSearchMode.SPARSE)
+    assert ranking(sharded.search(query, k=10, mode=NeoSearchMode.SPARSE)) == ranking(expected)
+
+
+@pytest.mark.parametrize("query", ["apple", "banana gamma", "cherry apple delta"])
+def test_hybrid_matches_single_store(stores, query):
+    store, sharded = stores
+    expected = store.search(query, k=10, mode=NeoSearchMode.HYBRID, hybrid_weight=0.7)
+    results = sharded.search(query, k=10, mode=NeoSearchMode.HYBRID, hybrid_weight=0.7)
+    assert sorted(ranking(results), key=lambda item: (-item[1], item[0])) == sorted(
+        ranking(expected), key=lambda item: (-item[1], item[0])
+    )
+
+
+@pytest.mark.parametrize("mode", [NeoSearchMode.DENSE, NeoSearchMode.SPARSE, NeoSearchMode.HYBRID])
+def test_mmr_matches_single_store(stores, mode):
+    store, sharded = stores
+    options = {"k": 5, "mode": mode, "mmr_lambda": 0.3, "fetch_k": 40}
+    expected = store.search("banana gamma", **options)
+    results = sharded.search("banana gamma", **options)
+    assert [doc.content for doc in results] == [doc.content for doc in expected]
+    assert results != sharded.search("banana gamma", k=5, mode=mode)
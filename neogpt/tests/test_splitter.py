@@ -0,0 +1,37 @@
+from loaders.dirloader import SEGMENT_SEPARATOR, CharacterTextSplitter, DirectoryLoader
+
+
+def make_pages():
+    return [
+        "\n\n".join(f"page {page} paragraph {i} " * 2 for i in range(11))
+        for page in range(1, 6)
+    ]
+
+
+def test_segments_split_like_the_joined_text():
+    splitter = CharacterTextSplitter(300, 0.3)
+    pages = make_pages()
+    assert list(splitter.split_segments(iter(pages))) == splitter.split_text(
+        SEGMENT_SEPARATOR.join(pages)
+    )
+
+
+def test_overlap_is_carried_across_pages():
+    pages = make_pages()
+    segments = ((text, {"page": page}) for page, text in enumerate(pages, 1))
+    docs = list(
+        DirectoryLoader._split_merged_segments(
+            segments, CharacterTextSplitter(300, 0.3), "manual.pdf"
+        )
+    )
+
+    joined = SEGMENT_SEPARATOR.join(pages)
+    for doc in docs:
+        assert joined[doc.metadata["start_index"] : doc.metadata["end_index"]] == doc.content
+    # Every page boundary is inside a chunk, not only between two chunks.
+    spanned = {
+        page
+        for doc in docs
+        for page in range(doc.metadata["page_start"], doc.metadata["page_end"])
+    }
+    assert spanned == {1, 2, 3, 4}
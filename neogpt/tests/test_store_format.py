@@ -0,0 +1,57 @@
+import json
+import os
+
+import numpy as np
+import pytest
+from vectorstore.neostore import Document, NeoStore
+
+
+def make_docs():
+    return [
+        Document(f"doc{i} " + "word " * (i % 5), {"file_path": f"/data/{i % 4}.txt", "page": i})
+        for i in range(50)
+    ]
+
+
+def test_saved_store_is_memory_mapped_without_pickles(tmp_path, fake_model):
+    store = NeoStore(fake_model, embedding_cache=False)
+    store.build_store(make_docs())
+    store.save_embeddings(str(tmp_path / "store"))
+
+    for name in os.listdir(tmp_path / "store"):
+        if name.endswith(".npy"):
+            np.load(tmp_path / "store" / name, allow_pickle=False)
+
+    loaded = NeoStore.load_embeddings(str(tmp_path / "store"), fake_model, embedding_cache=False)
+    assert isinstance(loaded._NeoStore__vectorstore, np.memmap)
+    assert list(loaded.docs) == make_docs()
+    assert loaded.search("doc3 word", 4) == store.search("doc3 word", 4)
+
+
+def test_legacy_npz_store_is_migrated(tmp_path, fake_model):
+    docs = make_docs()
+    embeddings = fake_model.encode([doc.content for doc in docs])
+    records = np.empty(len(docs), dtype=object)
+    records[:] = [(doc.content, doc.metadata) for doc in docs]
+    np.savez(tmp_path / "neostore.npz", embeddings=embeddings, docs=records)
+
+    legacy = NeoStore.load_embeddings(f"{tmp_path}/", fake_model, embedding_cache=False)
+    assert [doc.content for doc in legacy.docs] == [doc.content for doc in docs]
+
+    legacy.save_embeddings(f"{tmp_path}/")
+    migrated = NeoStore.load_embeddings(f"{tmp_path}/", fake_model, embedding_cache=False)
+    assert migrated.search("doc7", 3) == legacy.search("doc7", 3)
+
+
+def test_newer_format_version_is_rejected(tmp_path, fake_model):
+    store = NeoStore(fake_model, embedding_cache=False)
+    store.build_store(make_docs())
+    store.save_embeddings(str(tmp_path / "store"))
+
+    manifest_path = tmp_path / "store" / "manifest.json"
+    manifest = json.loads(manifest_path.read_text())
+    manifest["version"] += 1
+    manifest_path.write_text(json.dumps(manifest))
+
+    with pytest.raises(ValueError, match="Unsupported NeoStore format version"):
+        NeoStore.load_embeddings(str(tmp_path / "store"), fake_model)
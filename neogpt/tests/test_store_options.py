@@ -0,0 +1,50 @@
+from vectorstore.neostore import Document, NeoIndex, NeoSearchMode, NeoStore
+from vectorstore.shards import ShardedNeoStore
+
+
+def make_docs():
+    return [Document(f"doc{i} " + "word " * (i % 13), {"file_path": f"/data/{i}.txt"}) for i in range(300)]
+
+
+def test_loaded_store_keeps_its_options(tmp_path, fake_model):
+    store = NeoStore(fake_model, index_type=NeoIndex.IVF, embedding_cache=False)
+    store.build_store(make_docs())
+    store.save_embeddings(str(tmp_path / "store"))
+
+    loaded = NeoStore.load_embeddings(
+        str(tmp_path / "store"),
+        fake_model,
+        nprobe=3,
+        search_mode=NeoSearchMode.HYBRID,
+        embedding_cache=False,
+        encode_workers=2,
+        compaction_threshold=0.5,
+        query_cache_size=7,
+    )
+    assert loaded.index_type == NeoIndex.IVF
+    assert (loaded.nprobe, loaded.search_mode) == (3, NeoSearchMode.HYBRID)
+    assert loaded.embedding_cache is None
+    assert (loaded.encode_workers, loaded.compaction_threshold) == (2, 0.5)
+    assert loaded._results.maxsize == 7
+
+
+def test_loaded_shards_keep_their_options(tmp_path, fake_model):
+    sharded = ShardedNeoStore(
+        fake_model, num_shards=2, num_workers=0, index_type=NeoIndex.IVF, embedding_cache=False
+    )
+    sharded.build_store(make_docs(), persist=True, embeddings_path=f"{tmp_path}/")
+
+    loaded = ShardedNeoStore.load_embeddings(
+        f"{tmp_path}/",
+        fake_model,
+        num_workers=0,
+        search_mode=NeoSearchMode.SPARSE,
+        nprobe=5,
+        rerank_factor=2,
+        embedding_cache=False,
+    )
+    assert (loaded.num_workers, loaded.search_mode) == (0, NeoSearchMode.SPARSE)
+    shards = loaded._open_shards()
+    assert len(shards) == 2
+    assert all((shard.nprobe, shard.rerank_factor) == (5, 2) for shard in shards)
+    assert loaded.search("doc7 word", 3)
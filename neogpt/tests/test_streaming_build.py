@@ -0,0 +1,99 @@
+import numpy as np
+from vectorstore.bm25 import BM25Index, BM25Writer
+from vectorstore.metadata import MetadataIndex
+from vectorstore.neostore import Document, NeoSearchMode, NeoStore
+
+WORDS = ["alpha", "beta", "gamma", "delta", "epsilon", "zeta", "eta", "theta"]
+
+
+def make_docs(num_docs):
+    rng = np.random.default_rng(0)
+    docs = []
+    for i in range(num_docs):
+        metadata = {"file_path": f"/data/{i // 10}.txt", "page": i}
+        if i >= 150:
+            # A key first seen, and a numeric key turned categorical, after spills.
+            metadata.update(section=f"s{i % 3}", page=f"p{i}")
+        docs.append(Document(" ".join(rng.choice(WORDS, size=2 + i % 9)), metadata))
+    return docs
+
+
+def assert_same_index(index, expected):
+    assert index.vocabulary == expected.vocabulary
+    for name in ("offsets", "doc_ids", "term_freqs", "doc_lengths"):
+        np.testing.assert_array_equal(getattr(index, name), getattr(expected, name))
+
+
+def test_writer_merges_spilled_runs(tmp_path):
+    docs = make_docs(300)
+    writer = BM25Writer(str(tmp_path), run_size=50)
+    for start in range(0, len(docs), 7):
+        writer.add(docs[start : start + 7])
+
+    assert_same_index(writer.close(), BM25Index.from_documents(docs))
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "bm25_doc_ids.npy",
+        "bm25_doc_lengths.npy",
+        "bm25_offsets.npy",
+        "bm25_term_freqs.npy",
+        "bm25_vocabulary.json",
+    ]
+
+
+def test_take_writes_the_same_index(tmp_path):
+    docs = make_docs(300)
+    index = BM25Index.from_documents(docs[:200])
+    index.add(docs[200:])
+    rows = np.flatnonzero(np.arange(300) % 4 != 1)
+
+    written = index.take(rows, str(tmp_path))
+    expected = BM25Index.from_documents(docs[:200])
+    expected.add(docs[200:])
+    assert_same_index(written, expected.take(rows))
+
+
+def test_spilled_metadata_matches_the_in_memory_index(tmp_path):
+    docs = make_docs(300)
+    index = MetadataIndex()
+    for start in range(0, len(docs), 40):
+        index.add(doc.metadata for doc in docs[start : start + 40])
+        index.spill(str(tmp_path))
+
+    loaded = MetadataIndex.load(str(tmp_path))
+    expected = MetadataIndex.from_documents(docs)
+    assert loaded.numeric == expected.numeric
+    for key, column in expected.columns.items():
+        np.testing.assert_array_equal(loaded.columns[key], column)
+    for where in [{"section": "s1"}, {"page": 3}, {"page": "p200"}, {"file_path": "/data/3.txt"}]:
+        assert loaded.rows(where).tolist() == expected.rows(where).tolist()
+
+
+def test_streaming_build_and_block_compaction(tmp_path, fake_model):
+    docs = make_docs(300)
+    options = {"embedding_cache": False, "compaction_threshold": 1.0}
+    store = NeoStore(fake_model, **options)
+    store.build_store_streaming(iter(docs), embeddings_path=str(tmp_path / "store"), block_size=32)
+    expected = NeoStore(fake_model, **options)
+    expected.build_store(docs)
+
+    def ranking(store, **kwargs):
+        return [
+            (doc.content, doc.metadata["page"], round(doc.metadata["score"], 4))
+            for doc in store.search("beta theta", 10, **kwargs)
+        ]
+
+    for mode in NeoSearchMode:
+        assert ranking(store, mode=mode) == ranking(expected, mode=mode)
+    assert ranking(store, where={"section": "s2"}) == ranking(expected, where={"section": "s2"})
+
+    for deleted in (store, expected):
+        deleted.delete_where(file_path={"$in": [f"/data/{i}.txt" for i in range(0, 30, 3)]})
+        assert len(deleted.docs) == 300
+        deleted.compact(block_size=16)
+    assert len(store.docs) == 200
+    for mode in NeoSearchMode:
+        assert ranking(store, mode=mode) == ranking(expected, mode=mode)
+    reloaded = NeoStore.load_embeddings(str(tmp_path / "store"), fake_model)
+    assert ranking(reloaded, mode=NeoSearchMode.HYBRID) == ranking(
+        expected, mode=NeoSearchMode.HYBRID
+    )
@@ -0,0 +1,36 @@
+import pytest
+
+from loaders.dirloader import CharacterTextSplitter, DirectoryLoader
+from loaders.file import CSVLoader, TSVLoader
+
+
+@pytest.mark.parametrize(
+    ("loader_class", "name", "delimiter"), [(CSVLoader, "t.csv", ","), (TSVLoader, "t.tsv", "\t")]
+)
+def test_load_joins_row_batches(tmp_path, loader_class, name, delimiter):
+    path = tmp_path / name
+    path.write_text("\n".join(delimiter.join(row) for row in (["a", "b"], ["1", "2"], ["3", "4"], ["5", "6"])))
+
+    loader = loader_class(str(path), rows_per_batch=2)
+    assert loader.load() == "a | b\n1 | 2\n3 | 4\n\na | b\n5 | 6"
+    assert [metadata for _, metadata in loader.load_segments()] == [
+        {"row_start": 1, "row_end": 2},
+        {"row_start": 3, "row_end": 3},
+    ]
+
+
+def test_every_chunk_of_a_wide_table_keeps_the_header(tmp_path):
+    header = ["name", "description", "price"]
+    rows = [[f"item {i}", "x" * 80, str(i)] for i in range(100)]
+    (tmp_path / "wide.csv").write_text(
+        "\n".join(",".join(row) for row in [header, *rows])
+    )
+
+    loader = DirectoryLoader(str(tmp_path), splitter=CharacterTextSplitter(200, 0.1))
+    chunks = [content for content, _ in loader.lazy_load_chunks()]
+
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 200 for chunk in chunks)
+    assert all(chunk.startswith("name | description | price\n") for chunk in chunks)
+    rows_seen = [line for chunk in chunks for line in chunk.splitlines()[1:]]
+    assert rows_seen == [" | ".join(row) for row in rows]
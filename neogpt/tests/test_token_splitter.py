@@ -0,0 +1,55 @@
+import re
+
+from loaders.dirloader import TokenTextSplitter
+
+
+class WordTokenizer:
+    """A fast-tokenizer-like tokenizer with one token per word or punctuation mark."""
+
+    model_max_length = 512
+
+    def __call__(self, text, return_offsets_mapping=False, **kwargs):
+        return {"offset_mapping": [m.span() for m in re.finditer(r"\w+|[^\w\s]", text)]}
+
+    def num_special_tokens_to_add(self):
+        return 2
+
+    def count(self, text):
+        return len(self(text)["offset_mapping"])
+
+
+class Embedder:
+    tokenizer = WordTokenizer()
+    max_seq_length = 40
+
+
+def make_text():
+    return "\n\n".join(
+        " ".join(f"word{p}-{i}, token." for i in range(p % 7 + 1)) for p in range(50)
+    )
+
+
+def test_splitter_is_sized_to_the_model():
+    splitter = TokenTextSplitter.from_embedder(Embedder())
+    assert (splitter.chunk_size, splitter.name) == (38, "tokens")
+
+    approximate = TokenTextSplitter.from_embedder(Embedder(), approximate=True)
+    assert (approximate.tokenizer, approximate.name) == (None, "approximate-tokens")
+    assert approximate.max_chunk_chars == 38 * 4
+
+
+def test_chunks_fit_the_token_budget():
+    text = make_text()
+    splitter = TokenTextSplitter.from_embedder(Embedder())
+    chunks = splitter.split_text(text)
+
+    assert len(chunks) > 1
+    for chunk, start, end in chunks:
+        assert text[start:end] == chunk
+        assert Embedder.tokenizer.count(chunk) <= splitter.chunk_size
+
+
+def test_approximate_chunks_fit_the_estimated_budget():
+    splitter = TokenTextSplitter(chunk_size=30, chars_per_token=4.0)
+    for chunk in splitter.split_text_into_chunks(make_text()):
+        assert len(chunk) <= splitter.max_chunk_chars
@@ -0,0 +1,340 @@
+"""
+Benchmark suite for NeoStore on synthetic corpora.
+
+Runs on a CPU-only machine without downloading any model: documents and queries
+are embedded by looking up synthetic clustered vectors. Run from the neogpt
+directory, e.g.
+
+    python -m vectorstore.benchmark --num-docs 100000 --dim 384 --output bench.json
+"""
+
+import gc
+import itertools
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+
+import numpy as np
+import psutil
+import typer
+from vectorstore.cache import content_hash
+from vectorstore.neostore import (
+    Document,
+    NeoIndex,
+    NeoMetric,
+    NeoQuantization,
+    NeoSearchMode,
+    NeoStore,
+)
+
+# Store configurations benchmarked for every metric.
+CONFIGS = {
+    "flat": {},
+    "ivf": {"index_type": NeoIndex.IVF},
+    "int8": {"quantization": NeoQuantization.INT8},
+    "pq": {"quantization": NeoQuantization.PQ},
+    "ivf-int8": {"index_type": NeoIndex.IVF, "quantization": NeoQuantization.INT8},
+    "sparse": {"search_mode": NeoSearchMode.SPARSE},
+    "hybrid": {"search_mode": NeoSearchMode.HYBRID},
+}
+
+# Search parameters swept on the loaded store of a configuration, to report the
+# recall-latency trade-off of approximate search. Every combination is measured.
+SWEEPS = {
+    "ivf": {"nprobe": [1, 2, 4, 8, 16, 32, 64, 128]},
+    "int8": {"rerank_factor": [1, 2, 4, 8]},
+    "pq": {"rerank_factor": [4, 8, 16, 32]},
+    "ivf-int8": {"nprobe": [4, 16, 64], "rerank_factor": [1, 4]},
+}
+
+
+class SyntheticEmbedder:
+    """
+    Embed synthetic texts by looking up their precomputed vectors.
+
+    Unknown texts get a deterministic random vector seeded by their content.
+    """
+
+    def __init__(self, vectors: dict, dim: int) -> None:
+        self.vectors = vectors
+        self.dim = dim
+
+    def encode(self, texts, **kwargs) -> np.ndarray:
+        embeddings = np.empty((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            vector = self.vectors.get(text)
+            if vector is None:
+                rng = np.random.default_rng(
+                    int.from_bytes(content_hash(text)[:8], "little")
+                )
+                vector = rng.standard_normal(self.dim, dtype=np.float32)
+            embeddings[i] = vector
+        return embeddings
+
+
+def make_corpus(
+    num_docs: int,
+    dim: int,
+    num_queries: int,
+    num_clusters: int = 64,
+    vocabulary_size: int = 5000,
+    seed: int = 0,
+):
+    """
+    Generate clustered document vectors, keyword texts and noisy queries.
+
+    Every document belongs to a cluster and its text mixes cluster-specific and
+    random terms, so both dense and keyword search find related documents.
+
+    Returns:
+        Tuple[List[Document], np.ndarray, List[str], np.ndarray]: Documents,
+        their vectors, query texts and query vectors.
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((num_clusters, dim), dtype=np.float32)
+    labels = rng.integers(num_clusters, size=num_docs)
+    doc_vectors = 0.5 * centers[labels] + rng.standard_normal(
+        (num_docs, dim), dtype=np.float32
+    )
+
+    docs = []
+    for idx, label in enumerate(labels):
+        terms = rng.integers(vocabulary_size, size=24)
+        text = f"doc{idx} topic{label} " + " ".join(f"term{t}" for t in terms)
+        docs.append(Document(text, {"file_path": f"/synthetic/{label}.txt"}))
+
+    sources = rng.integers(num_docs, size=num_queries)
+    query_vectors = doc_vectors[sources] + 0.8 * rng.standard_normal(
+        (num_queries, dim), dtype=np.float32
+    )
+    queries = [
+        f"query{i} topic{labels[source]} "
+        + " ".join(docs[source].content.split()[2:6])
+        for i, source in enumerate(sources)
+    ]
+    return docs, doc_vectors, queries, query_vectors
+
+
+def exact_neighbors(
+    doc_vectors: np.ndarray, query_vectors: np.ndarray, k: int, metric: NeoMetric
+) -> np.ndarray:
+    """Brute-force top-k document ids of every query."""
+    if metric == NeoMetric.COSINE:
+        docs = doc_vectors / np.linalg.norm(doc_vectors, axis=1, keepdims=True)
+        queries = query_vectors / np.linalg.norm(query_vectors, axis=1, keepdims=True)
+        keys = -(queries @ docs.T)
+    else:
+        keys = (
+            (doc_vectors * doc_vectors).sum(axis=1)
+            - 2 * query_vectors @ doc_vectors.T
+        )
+    return np.argsort(keys, axis=1)[:, :k]
+
+
+def percentiles(latencies: list[float]) -> dict:
+    p50, p95, p99 = np.percentile(np.array(latencies) * 1000, [50, 95, 99])
+    return {"p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99)}
+
+
+def directory_size(path: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(path)
+        for name in names
+    )
+
+
+def run_config(
+    name: str,
+    options: dict,
+    metric: NeoMetric,
+    docs: list[Document],
+    embedder: SyntheticEmbedder,
+    queries: list[str],
+    ground_truth: np.ndarray,
+    k: int,
+    workdir: str,
+    sweep: bool = True,
+) -> list[dict]:
+    """
+    Build, save, load and query one store configuration.
+
+    Returns one result per combination of the swept search parameters of the
+    configuration, or a single result with its defaults.
+    """
+    store_kwargs = {
+        "similarity_metric": metric,
+        "embedding_cache": False,
+        "query_cache_size": 0,
+        **options,
+    }
+
+    # The build is timed without tracemalloc, which slows allocations down, and
+    # repeated under it to measure its peak memory.
+    start = time.perf_counter()
+    store = NeoStore(embedder, **store_kwargs)
+    store.build_store(docs, batch_size=1024)
+    build_time = time.perf_counter() - start
+    del store
+
+    tracemalloc.start()
+    store = NeoStore(embedder, **store_kwargs)
+    store.build_store(docs, batch_size=1024)
+    _, build_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    path = os.path.join(workdir, f"{name}-{metric.value}")
+    store.save_embeddings(path)
+    del store
+    gc.collect()
+
+    # Resident memory of the loaded store, including the pages of memory-mapped
+    # files read by the first query.
+    process = psutil.Process()
+    rss_before = process.memory_info().rss
+    start = time.perf_counter()
+    store = NeoStore.load_embeddings(
+        path,
+        embedder,
+        similarity_metric=metric,
+        search_mode=options.get("search_mode", NeoSearchMode.DENSE),
+    )
+    load_time = time.perf_counter() - start
+
+    build_stats = {
+        "config": name,
+        "metric": metric.value,
+        "build_time_s": build_time,
+        "build_peak_memory_bytes": build_peak,
+        "store_size_bytes": directory_size(path),
+        "load_time_s": load_time,
+    }
+
+    grid = SWEEPS.get(name, {}) if sweep else {}
+    results, resident_bytes = [], None
+    for values in itertools.product(*grid.values()):
+        params = dict(zip(grid, values))
+        # Both are read by every search, so the loaded store is reused.
+        for param, value in params.items():
+            setattr(store, param, value)
+
+        # Queries are unique, so the query caches never hit.
+        latencies, hits = [], 0
+        for query, truth in zip(queries, ground_truth):
+            start = time.perf_counter()
+            found_docs = store.search(query, k)
+            latencies.append(time.perf_counter() - start)
+            # Document texts start with "doc<id> ".
+            found = {int(doc.content.split(" ", 1)[0][3:]) for doc in found_docs}
+            hits += len(found.intersection(truth.tolist()))
+            if resident_bytes is None:
+                resident_bytes = process.memory_info().rss - rss_before
+
+        results.append(
+            {
+                **build_stats,
+                "nprobe": store.nprobe,
+                "rerank_factor": store.rerank_factor,
+                "store_resident_bytes": resident_bytes,
+                "latency": percentiles(latencies),
+                "queries_per_second": len(latencies) / sum(latencies),
+                f"recall@{k}": hits / (len(queries) * k),
+            }
+        )
+    return results
+
+
+app = typer.Typer()
+
+
+@app.command()
+def main(
+    num_docs: int = typer.Option(20000, "--num-docs", "-n", help="Number of documents."),
+    dim: int = typer.Option(384, "--dim", "-d", help="Embedding dimension."),
+    num_queries: int = typer.Option(200, "--num-queries", "-q", help="Number of queries."),
+    k: int = typer.Option(10, "--k", "-k", help="Number of results per query."),
+    configs: str = typer.Option(
+        ",".join(CONFIGS), "--configs", help="Comma-separated store configurations."
+    ),
+    metrics: str = typer.Option(
+        "cosine,euclidean", "--metrics", help="Comma-separated similarity metrics."
+    ),
+    seed: int = typer.Option(0, "--seed", help="Seed of the synthetic corpus."),
+    sweep: bool = typer.Option(
+        True, "--sweep/--no-sweep", help="Sweep nprobe and rerank_factor."
+    ),
+    output: str = typer.Option(
+        "", "--output", "-o", help="JSON file to write. Defaults to stdout."
+    ),
+):
+    """
+    Benchmark NeoStore configurations on a synthetic corpus.
+
+    Recall@k is measured against exact dense search with the same metric, also
+    for the sparse and hybrid modes. Approximate configurations are measured at
+    every nprobe and rerank_factor of their sweep.
+    """
+    docs, doc_vectors, queries, query_vectors = make_corpus(
+        num_docs, dim, num_queries, seed=seed
+    )
+    embedder = SyntheticEmbedder(
+        {
+            **{doc.content: vector for doc, vector in zip(docs, doc_vectors)},
+            **dict(zip(queries, query_vectors)),
+        },
+        dim,
+    )
+
+    results = []
+    workdir = tempfile.mkdtemp(prefix="neostore-benchmark-")
+    try:
+        # Keep progress bars and warnings out of the JSON report on stdout.
+        with redirect_stdout(sys.stderr):
+            for metric in map(NeoMetric, metrics.split(",")):
+                ground_truth = exact_neighbors(doc_vectors, query_vectors, k, metric)
+                for name in configs.split(","):
+                    results.extend(
+                        run_config(
+                            name,
+                            CONFIGS[name],
+                            metric,
+                            docs,
+                            embedder,
+                            queries,
+                            ground_truth,
+                            k,
+                            workdir,
+                            sweep,
+                        )
+                    )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "num_docs": num_docs,
+        "dim": dim,
+        "num_queries": num_queries,
+        "k": k,
+        "seed": seed,
+        "numpy": np.__version__,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+
+    if output:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=4)
+    else:
+        typer.echo(json.dumps(report, indent=4))
+
+
+if __name__ == "__main__":
+    app()
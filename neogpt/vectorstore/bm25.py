@@ -0,0 +1,680 @@
+import json
+import os
+import re
+import shutil
+from typing import NamedTuple
+
+import numpy as np
+from vectorstore.npyfile import append_npy
+
+# Words, numbers and identifiers such as error codes or snake_case names.
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# Append-only log of the delta segment: its terms, one per line, its postings
+# as (term id, doc id, frequency) rows and its document lengths.
+DELTA_VOCABULARY_FILE = "bm25_delta_vocabulary.txt"
+DELTA_POSTINGS_FILE = "bm25_delta_postings.npy"
+DELTA_LENGTHS_FILE = "bm25_delta_doc_lengths.npy"
+
+# Files of the main posting lists, written into a work directory and moved into
+# the store directory once complete.
+INDEX_FILES = (
+    "bm25_vocabulary.json",
+    "bm25_offsets.npy",
+    "bm25_doc_ids.npy",
+    "bm25_term_freqs.npy",
+    "bm25_doc_lengths.npy",
+)
+INDEX_WORK_DIR = "bm25.tmp"
+
+
+def tokenize(text: str) -> list[str]:
+    """Split text into lowercase word tokens."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class CorpusStats(NamedTuple):
+    """
+    BM25 statistics of a corpus for the terms of a query.
+
+    Indexes over parts of a corpus, e.g. the shards of a store, score with the
+    statistics of the whole corpus so that their scores are comparable.
+    """
+
+    num_docs: int
+    total_length: float
+    doc_freqs: dict
+
+    @classmethod
+    def merge(cls, stats):
+        """Sum the statistics of disjoint parts of a corpus."""
+        doc_freqs = {}
+        for part in stats:
+            for term, doc_freq in part.doc_freqs.items():
+                doc_freqs[term] = doc_freqs.get(term, 0) + doc_freq
+        return cls(
+            sum(part.num_docs for part in stats),
+            sum(part.total_length for part in stats),
+            doc_freqs,
+        )
+
+
+class BM25Index:
+    """
+    An Okapi BM25 inverted index over the NeoStore documents.
+
+    Postings are kept in CSR form: the documents containing term t, and the
+    term's frequency in each of them, are ``doc_ids[offsets[t]:offsets[t + 1]]``
+    and ``term_freqs[offsets[t]:offsets[t + 1]]``. A query only reads the
+    posting lists of its own terms.
+
+    Documents added to a built index go to a small delta index, scored together
+    with the main one, so that adding them does not re-sort every posting. A
+    saved delta is an append-only log next to the main index files. ``merge``
+    folds the delta into the main posting lists.
+    """
+
+    def __init__(
+        self,
+        vocabulary: list[str],
+        offsets: np.ndarray,
+        doc_ids: np.ndarray,
+        term_freqs: np.ndarray,
+        doc_lengths: np.ndarray,
+        k1: float = 1.5,
+        b: float = 0.75,
+    ) -> None:
+        """
+        Initialize the index from its posting lists.
+
+        Args:
+            vocabulary (List[str]): Terms, indexed by term id.
+            offsets (np.ndarray): Start of every posting list, shape (num_terms + 1,).
+            doc_ids (np.ndarray): Document ids of all postings.
+            term_freqs (np.ndarray): Term frequencies of all postings.
+            doc_lengths (np.ndarray): Number of tokens of every document.
+            k1 (float): Term frequency saturation.
+            b (float): Document length normalization.
+        """
+        self.vocabulary = vocabulary
+        self.term_ids = {term: term_id for term_id, term in enumerate(vocabulary)}
+        self.k1 = k1
+        self.b = b
+        # Index of the documents added after the main posting lists were built.
+        self.delta = None
+        self._set_postings(offsets, doc_ids, term_freqs, doc_lengths)
+
+    def _set_postings(self, offsets, doc_ids, term_freqs, doc_lengths):
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.doc_ids = np.asarray(doc_ids, dtype=np.int64)
+        self.term_freqs = np.asarray(term_freqs, dtype=np.float32)
+        self.doc_lengths = np.asarray(doc_lengths, dtype=np.float32)
+
+        num_docs = len(self.doc_lengths)
+        doc_freqs = np.diff(self.offsets)
+        self.idf = np.log1p((num_docs - doc_freqs + 0.5) / (doc_freqs + 0.5)).astype(
+            np.float32
+        )
+        average_length = self.doc_lengths.mean() if num_docs else 0.0
+        self.length_norms = self.k1 * (
+            1 - self.b + self.b * self.doc_lengths / max(average_length, 1e-9)
+        )
+
+    @classmethod
+    def from_documents(cls, docs, **kwargs):
+        """
+        Build the index from the content of documents.
+
+        Args:
+            docs (Iterable[Document]): Documents in store order.
+            **kwargs: BM25 parameters ``k1`` and ``b``.
+
+        Returns:
+            BM25Index: The index.
+        """
+        index = cls([], [0], [], [], [], **kwargs)
+        index._extend(docs)
+        return index
+
+    @property
+    def num_docs(self) -> int:
+        """Number of indexed documents, including those of the delta."""
+        num_docs = len(self.doc_lengths)
+        if self.delta is not None:
+            num_docs += len(self.delta.doc_lengths)
+        return num_docs
+
+    def _term_id(self, term: str) -> int:
+        """The id of a term, added to the vocabulary if it is new."""
+        term_id = self.term_ids.setdefault(term, len(self.vocabulary))
+        if term_id == len(self.vocabulary):
+            self.vocabulary.append(term)
+        return term_id
+
+    def _postings(self):
+        """Expand the posting lists into (term id, doc id, frequency) columns."""
+        term_ids = np.repeat(np.arange(len(self.offsets) - 1), np.diff(self.offsets))
+        return term_ids, self.doc_ids, self.term_freqs
+
+    def _rebuild(self, term_ids, doc_ids, term_freqs, doc_lengths):
+        order = np.lexsort((doc_ids, term_ids))
+        counts = np.bincount(term_ids, minlength=len(self.vocabulary))
+        self._set_postings(
+            np.concatenate(([0], np.cumsum(counts))),
+            doc_ids[order],
+            term_freqs[order],
+            doc_lengths,
+        )
+
+    def add(self, docs) -> None:
+        """
+        Index new documents, appended after the existing ones.
+
+        The documents are indexed into the delta, so adding them takes time in
+        the size of the delta rather than of the whole index.
+
+        Args:
+            docs (Iterable[Document]): Documents to add, in store order.
+        """
+        if self.delta is None:
+            self.delta = BM25Index([], [0], [], [], [], self.k1, self.b)
+        self.delta._extend(docs)
+
+    def merge(self) -> None:
+        """Fold the delta into the main posting lists."""
+        if self.delta is None:
+            return
+
+        delta, self.delta = self.delta, None
+        term_map = np.array(
+            [self._term_id(term) for term in delta.vocabulary], dtype=np.int64
+        )
+        delta_term_ids, delta_doc_ids, delta_term_freqs = delta._postings()
+        term_ids, doc_ids, term_freqs = self._postings()
+        self._rebuild(
+            np.concatenate((term_ids, term_map[delta_term_ids])),
+            np.concatenate((doc_ids, delta_doc_ids + len(self.doc_lengths))),
+            np.concatenate((term_freqs, delta_term_freqs)),
+            np.concatenate((self.doc_lengths, delta.doc_lengths)),
+        )
+
+    def _extend(self, docs) -> None:
+        """Index new documents into the main posting lists, re-sorting them."""
+        new_term_ids, new_doc_ids, new_term_freqs, new_lengths = self._tokenize(
+            docs, len(self.doc_lengths)
+        )
+        term_ids, doc_ids, term_freqs = self._postings()
+        self._rebuild(
+            np.concatenate((term_ids, new_term_ids)),
+            np.concatenate((doc_ids, new_doc_ids)),
+            np.concatenate((term_freqs, new_term_freqs)),
+            np.concatenate((self.doc_lengths, new_lengths)),
+        )
+
+    def _tokenize(self, docs, doc_id: int):
+        """
+        Tokenize documents into postings, adding their new terms to the vocabulary.
+
+        Args:
+            docs (Iterable[Document]): Documents to tokenize.
+            doc_id (int): Id of the first document.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]: Term ids, doc
+            ids and term frequencies of the postings, and the document lengths.
+        """
+        # Postings are moved from lists into compact arrays every flush_size
+        # postings, so indexing a large corpus does not hold millions of ints.
+        flush_size = 1 << 20
+        parts, new_term_ids, new_doc_ids, new_term_freqs, new_lengths = [], [], [], [], []
+
+        for doc in docs:
+            tokens = tokenize(doc.content)
+            frequencies = {}
+            for token in tokens:
+                frequencies[token] = frequencies.get(token, 0) + 1
+
+            for term, frequency in frequencies.items():
+                new_term_ids.append(self._term_id(term))
+                new_doc_ids.append(doc_id)
+                new_term_freqs.append(frequency)
+
+            new_lengths.append(len(tokens))
+            doc_id += 1
+
+            if len(new_term_ids) >= flush_size:
+                parts.append(self._to_columns(new_term_ids, new_doc_ids, new_term_freqs))
+                new_term_ids, new_doc_ids, new_term_freqs = [], [], []
+        parts.append(self._to_columns(new_term_ids, new_doc_ids, new_term_freqs))
+
+        term_ids, doc_ids, term_freqs = (np.concatenate(column) for column in zip(*parts))
+        return term_ids, doc_ids, term_freqs, np.array(new_lengths, np.float32)
+
+    @staticmethod
+    def _to_columns(term_ids, doc_ids, term_freqs):
+        return (
+            np.array(term_ids, np.int64),
+            np.array(doc_ids, np.int64),
+            np.array(term_freqs, np.float32),
+        )
+
+    def take(self, rows: np.ndarray, path: str = None):
+        """
+        Get the index restricted to the given rows, e.g. to compact a store.
+
+        Args:
+            rows (np.ndarray): Sorted row ids to keep.
+            path (str, optional): Store directory to write the restricted index
+                into with bounded memory, a block of postings at a time. The
+                written index is returned memory-mapped.
+
+        Returns:
+            BM25Index: The restricted index, with rows renumbered from 0 and the
+            delta merged.
+        """
+        if path is not None:
+            return self._write_take(rows, path)
+
+        self.merge()
+        new_ids = np.full(len(self.doc_lengths), -1, dtype=np.int64)
+        new_ids[rows] = np.arange(len(rows))
+
+        term_ids, doc_ids, term_freqs = self._postings()
+        keep = new_ids[doc_ids] >= 0
+
+        index = BM25Index(list(self.vocabulary), [0], [], [], [], self.k1, self.b)
+        index._rebuild(
+            term_ids[keep], new_ids[doc_ids[keep]], term_freqs[keep], self.doc_lengths[rows]
+        )
+        return index
+
+    def _write_take(self, rows: np.ndarray, path: str):
+        """Write the index restricted to the given rows, see ``take``."""
+        writer = BM25Writer(path, self.vocabulary, self.k1, self.b)
+        new_ids = np.full(self.num_docs, -1, dtype=np.int64)
+        new_ids[rows] = np.arange(len(rows))
+
+        # Posting lists are read in term order, so the kept postings of every
+        # term are passed to the writer in doc order.
+        for start in range(0, len(self.doc_ids), writer.run_size):
+            stop = min(start + writer.run_size, len(self.doc_ids))
+            doc_ids = new_ids[self.doc_ids[start:stop]]
+            keep = doc_ids >= 0
+            term_ids = np.searchsorted(self.offsets, np.arange(start, stop), side="right") - 1
+            writer.add_postings(
+                term_ids[keep], doc_ids[keep], self.term_freqs[start:stop][keep]
+            )
+
+        doc_lengths = self.doc_lengths
+        if self.delta is not None:
+            term_map = np.array(
+                [writer.term_id(term) for term in self.delta.vocabulary], dtype=np.int64
+            )
+            term_ids, doc_ids, term_freqs = self.delta._postings()
+            doc_ids = new_ids[doc_ids + len(self.doc_lengths)]
+            keep = doc_ids >= 0
+            writer.add_postings(term_map[term_ids[keep]], doc_ids[keep], term_freqs[keep])
+            doc_lengths = np.concatenate((doc_lengths, self.delta.doc_lengths))
+        writer.add_lengths(doc_lengths[rows])
+        return writer.close()
+
+    def stats(self, query: str) -> CorpusStats:
+        """The statistics of the indexed documents for the terms of a query."""
+        terms = dict.fromkeys(tokenize(query))
+        stats = CorpusStats(
+            len(self.doc_lengths),
+            float(self.doc_lengths.sum()),
+            {
+                term: int(self.offsets[term_id + 1] - self.offsets[term_id])
+                for term in terms
+                if (term_id := self.term_ids.get(term)) is not None
+            },
+        )
+        if self.delta is not None:
+            stats = CorpusStats.merge([stats, self.delta.stats(query)])
+        return stats
+
+    def score(self, query: str, stats: CorpusStats = None):
+        """
+        Score the documents containing at least one query term.
+
+        Args:
+            query (str): Query string.
+            stats (CorpusStats, optional): Statistics of the whole corpus the
+                documents are part of. Defaults to those of the index.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Sorted ids of the matching documents
+            and their BM25 scores.
+        """
+        if self.delta is not None:
+            # Both indexes score with the statistics of all the documents.
+            stats = stats or self.stats(query)
+            ids, scores = self._score(query, stats)
+            delta_ids, delta_scores = self.delta.score(query, stats)
+            return (
+                np.concatenate((ids, delta_ids + len(self.doc_lengths))),
+                np.concatenate((scores, delta_scores)),
+            )
+        return self._score(query, stats)
+
+    def _score(self, query: str, stats: CorpusStats = None):
+        """Score the documents of the main posting lists, see ``score``."""
+        terms = [term for term in dict.fromkeys(tokenize(query)) if term in self.term_ids]
+        if not terms:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        if stats is not None:
+            average_length = max(stats.total_length / max(stats.num_docs, 1), 1e-9)
+
+        doc_ids, contributions = [], []
+        for term in terms:
+            term_id = self.term_ids[term]
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            ids = self.doc_ids[start:end]
+            freqs = self.term_freqs[start:end]
+            if stats is None:
+                idf, length_norms = self.idf[term_id], self.length_norms[ids]
+            else:
+                doc_freq = stats.doc_freqs.get(term, end - start)
+                idf = np.log1p((stats.num_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+                length_norms = self.k1 * (
+                    1 - self.b + self.b * self.doc_lengths[ids] / average_length
+                )
+            doc_ids.append(ids)
+            contributions.append(idf * freqs * (self.k1 + 1) / (freqs + length_norms))
+
+        ids, inverse = np.unique(np.concatenate(doc_ids), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(contributions))
+        return ids, scores.astype(np.float32)
+
+    def save(self, path: str, start: int = None) -> None:
+        """
+        Save the index into a store directory.
+
+        Files are replaced rather than rewritten in place, so that readers
+        memory-mapping the previous ones keep a valid view of them.
+
+        Args:
+            path (str): Path to the store directory.
+            start (int, optional): Only append the documents from ``start``
+                onwards, all in the delta, to the delta log written by a
+                previous save. By default the delta is merged and the whole
+                index is written.
+        """
+        if (
+            start is not None
+            and self.delta is not None
+            and os.path.isfile(os.path.join(path, "bm25_vocabulary.json"))
+        ):
+            self._append_delta(path, start - len(self.doc_lengths))
+            return
+
+        self.merge()
+        work_path = _make_work_dir(path)
+        _write_vocabulary(work_path, self.vocabulary, self.k1, self.b)
+        np.save(os.path.join(work_path, "bm25_offsets.npy"), self.offsets)
+        np.save(os.path.join(work_path, "bm25_doc_ids.npy"), self.doc_ids)
+        np.save(os.path.join(work_path, "bm25_term_freqs.npy"), self.term_freqs)
+        np.save(os.path.join(work_path, "bm25_doc_lengths.npy"), self.doc_lengths)
+        _install_index(work_path, path)
+
+    def _append_delta(self, path: str, start: int) -> None:
+        """Append the delta documents from ``start`` onwards to the delta log."""
+        delta = self.delta
+        postings_path = os.path.join(path, DELTA_POSTINGS_FILE)
+        lengths_path = os.path.join(path, DELTA_LENGTHS_FILE)
+        if not os.path.isfile(postings_path):
+            np.save(postings_path, np.empty((0, 3), dtype=np.int64))
+            np.save(lengths_path, np.empty(0, dtype=np.float32))
+
+        # Terms get ids in order of first occurrence, so the terms first seen
+        # from ``start`` onwards are the last ones of the vocabulary.
+        first_docs = delta.doc_ids[delta.offsets[:-1]]
+        num_saved_terms = int(np.count_nonzero(first_docs < start))
+        with open(os.path.join(path, DELTA_VOCABULARY_FILE), "a") as f:
+            f.writelines(f"{term}\n" for term in delta.vocabulary[num_saved_terms:])
+
+        term_ids, doc_ids, term_freqs = delta._postings()
+        new = doc_ids >= start
+        append_npy(
+            postings_path,
+            np.column_stack((term_ids[new], doc_ids[new], term_freqs[new])),
+        )
+        append_npy(lengths_path, delta.doc_lengths[start:])
+
+    @classmethod
+    def load(cls, path: str, mmap_mode: str = None):
+        """
+        Load the index saved in a store directory, if any.
+
+        Args:
+            path (str): Path to the store directory.
+            mmap_mode (str, optional): Memory-map mode of the posting lists, or
+                None to read them into memory.
+
+        Returns:
+            BM25Index: The loaded index, or None if the store has none.
+        """
+        vocabulary_path = os.path.join(path, "bm25_vocabulary.json")
+        if not os.path.isfile(vocabulary_path):
+            return None
+
+        with open(vocabulary_path) as f:
+            header = json.load(f)
+
+        index = cls(
+            header["vocabulary"],
+            np.load(os.path.join(path, "bm25_offsets.npy")),
+            np.load(os.path.join(path, "bm25_doc_ids.npy"), mmap_mode=mmap_mode),
+            np.load(os.path.join(path, "bm25_term_freqs.npy"), mmap_mode=mmap_mode),
+            np.load(os.path.join(path, "bm25_doc_lengths.npy")),
+            header["k1"],
+            header["b"],
+        )
+
+        postings_path = os.path.join(path, DELTA_POSTINGS_FILE)
+        if os.path.isfile(postings_path):
+            with open(os.path.join(path, DELTA_VOCABULARY_FILE)) as f:
+                vocabulary = f.read().splitlines()
+            postings = np.load(postings_path)
+            index.delta = cls(vocabulary, [0], [], [], [], index.k1, index.b)
+            index.delta._rebuild(
+                postings[:, 0],
+                postings[:, 1],
+                postings[:, 2].astype(np.float32),
+                np.load(os.path.join(path, DELTA_LENGTHS_FILE)),
+            )
+        return index
+
+
+def _make_work_dir(path: str) -> str:
+    work_path = os.path.join(path, INDEX_WORK_DIR)
+    shutil.rmtree(work_path, ignore_errors=True)
+    os.makedirs(work_path)
+    return work_path
+
+
+def _write_vocabulary(path: str, vocabulary: list[str], k1: float, b: float) -> None:
+    with open(os.path.join(path, "bm25_vocabulary.json"), "w") as f:
+        json.dump({"k1": k1, "b": b, "vocabulary": vocabulary}, f, ensure_ascii=False)
+
+
+def _install_index(work_path: str, path: str) -> None:
+    """
+    Move the index files written in a work directory into the store directory.
+
+    Files are replaced rather than rewritten in place, so that readers
+    memory-mapping the previous ones keep a valid view of them. The delta log of
+    the previous index is removed.
+    """
+    for name in INDEX_FILES:
+        os.replace(os.path.join(work_path, name), os.path.join(path, name))
+    for name in (DELTA_VOCABULARY_FILE, DELTA_POSTINGS_FILE, DELTA_LENGTHS_FILE):
+        if os.path.isfile(os.path.join(path, name)):
+            os.remove(os.path.join(path, name))
+    shutil.rmtree(work_path, ignore_errors=True)
+
+
+class BM25Writer:
+    """
+    Writes the BM25 index of a stream of documents into a store directory with
+    bounded memory.
+
+    Postings are buffered and spilled to runs sorted by term, of at most
+    ``run_size`` postings, in a work directory. ``close`` merges the runs into
+    the posting lists a block at a time and moves the index files into the
+    store directory. Only the vocabulary is held in memory.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        vocabulary: list[str] = None,
+        k1: float = 1.5,
+        b: float = 0.75,
+        run_size: int = 1 << 22,
+    ) -> None:
+        """
+        Start writing an index.
+
+        Args:
+            path (str): Path to the store directory.
+            vocabulary (List[str], optional): Terms of the term ids of the
+                postings added with ``add_postings``.
+            k1 (float): Term frequency saturation.
+            b (float): Document length normalization.
+            run_size (int): Number of postings buffered in memory.
+        """
+        self.path = path
+        self.run_size = run_size
+        self.num_docs = 0
+        # Holds the vocabulary and term ids of the written index.
+        self._index = BM25Index(list(vocabulary or []), [0], [], [], [], k1, b)
+        self._work_path = _make_work_dir(path)
+        self._lengths_path = os.path.join(self._work_path, "bm25_doc_lengths.npy")
+        np.save(self._lengths_path, np.empty(0, dtype=np.float32))
+        self._buffer = []
+        self._num_buffered = 0
+        self._num_runs = 0
+
+    def term_id(self, term: str) -> int:
+        """The id of a term, added to the vocabulary if it is new."""
+        return self._index._term_id(term)
+
+    def add(self, docs) -> None:
+        """
+        Index documents, appended after the ones added before.
+
+        Args:
+            docs (Iterable[Document]): Documents to add, in store order.
+        """
+        term_ids, doc_ids, term_freqs, doc_lengths = self._index._tokenize(
+            docs, self.num_docs
+        )
+        self.add_postings(term_ids, doc_ids, term_freqs)
+        self.add_lengths(doc_lengths)
+
+    def add_postings(
+        self, term_ids: np.ndarray, doc_ids: np.ndarray, term_freqs: np.ndarray
+    ) -> None:
+        """
+        Add postings. The doc ids of every term must follow the ones it was
+        added with before.
+
+        Args:
+            term_ids (np.ndarray): Term ids of the postings.
+            doc_ids (np.ndarray): Document ids of the postings.
+            term_freqs (np.ndarray): Term frequencies of the postings.
+        """
+        self._buffer.append((term_ids, doc_ids, term_freqs))
+        self._num_buffered += len(term_ids)
+        if self._num_buffered >= self.run_size:
+            self._spill()
+
+    def add_lengths(self, doc_lengths: np.ndarray) -> None:
+        """
+        Add the lengths of the next documents.
+
+        Args:
+            doc_lengths (np.ndarray): Number of tokens of every document.
+        """
+        append_npy(self._lengths_path, doc_lengths)
+        self.num_docs += len(doc_lengths)
+
+    def _run_path(self, run: int, name: str) -> str:
+        return os.path.join(self._work_path, f"run{run}_{name}.npy")
+
+    def _spill(self) -> None:
+        """Write the buffered postings, sorted by term, to a new run."""
+        term_ids, doc_ids, term_freqs = (
+            np.concatenate(column) for column in zip(*self._buffer)
+        )
+        order = np.lexsort((doc_ids, term_ids))
+        np.save(self._run_path(self._num_runs, "counts"), np.bincount(term_ids))
+        np.save(self._run_path(self._num_runs, "doc_ids"), doc_ids[order])
+        np.save(self._run_path(self._num_runs, "term_freqs"), term_freqs[order])
+        self._num_runs += 1
+        self._buffer = []
+        self._num_buffered = 0
+
+    def close(self) -> BM25Index:
+        """
+        Merge the runs into the index files of the store directory.
+
+        Returns:
+            BM25Index: The written index, memory-mapped.
+        """
+        if self._buffer:
+            self._spill()
+
+        num_terms = len(self._index.vocabulary)
+        counts = np.zeros(num_terms, dtype=np.int64)
+        for run in range(self._num_runs):
+            run_counts = np.load(self._run_path(run, "counts"))
+            counts[: len(run_counts)] += run_counts
+        offsets = np.concatenate(([0], np.cumsum(counts)))
+
+        doc_ids = np.lib.format.open_memmap(
+            os.path.join(self._work_path, "bm25_doc_ids.npy"),
+            mode="w+",
+            dtype=np.int64,
+            shape=(int(offsets[-1]),),
+        )
+        term_freqs = np.lib.format.open_memmap(
+            os.path.join(self._work_path, "bm25_term_freqs.npy"),
+            mode="w+",
+            dtype=np.float32,
+            shape=(int(offsets[-1]),),
+        )
+        # The postings of every term were added in doc order, so the ones of a
+        # run go after the ones of the previous runs.
+        ends = offsets[:-1].copy()
+        for run in range(self._num_runs):
+            run_counts = np.load(self._run_path(run, "counts"))
+            run_doc_ids = np.load(self._run_path(run, "doc_ids"), mmap_mode="r")
+            run_term_freqs = np.load(self._run_path(run, "term_freqs"), mmap_mode="r")
+            run_offsets = np.concatenate(([0], np.cumsum(run_counts)))
+            shifts = ends[: len(run_counts)] - run_offsets[:-1]
+
+            for start in range(0, len(run_doc_ids), self.run_size):
+                stop = min(start + self.run_size, len(run_doc_ids))
+                positions = np.arange(start, stop)
+                targets = (
+                    shifts[np.searchsorted(run_offsets, positions, side="right") - 1]
+                    + positions
+                )
+                doc_ids[targets] = run_doc_ids[start:stop]
+                term_freqs[targets] = run_term_freqs[start:stop]
+            ends[: len(run_counts)] += run_counts
+            del run_doc_ids, run_term_freqs
+        doc_ids.flush()
+        term_freqs.flush()
+        del doc_ids, term_freqs
+
+        np.save(os.path.join(self._work_path, "bm25_offsets.npy"), offsets)
+        _write_vocabulary(
+            self._work_path, self._index.vocabulary, self._index.k1, self._index.b
+        )
+        _install_index(self._work_path, self.path)
+        return BM25Index.load(self.path, mmap_mode="r")
@@ -0,0 +1,240 @@
+import hashlib
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+
+import numpy as np
+from settings import Settings
+
+# Embedding cache shared by the stores built under Settings.VECTOR_STORE_DIR.
+EMBEDDING_CACHE_PATH = os.path.join(Settings.VECTOR_STORE_DIR, "embedding_cache.sqlite3")
+
+# SQLite limits the number of parameters of a statement.
+_MAX_PARAMS = 500
+
+
+def content_hash(content: str) -> bytes:
+    """Hash the content of a document chunk."""
+    return hashlib.blake2b(content.encode(), digest_size=16).digest()
+
+
+class EmbeddingCache:
+    """
+    A persistent cache of document embeddings keyed by (model name, content hash).
+
+    Rebuilding a store only encodes the chunks whose content was never embedded
+    by the same model. Entries are kept in a SQLite database and the least
+    recently used ones are evicted once the cached vectors exceed ``max_size``
+    bytes.
+    """
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, max_size: int = 1 << 30):
+        """
+        Initialize the EmbeddingCache.
+
+        Args:
+            path (str): Path to the SQLite database, created on first use.
+            max_size (int): Maximum size of the cached vectors in bytes.
+        """
+        self.path = path
+        self.max_size = max_size
+        self._connection = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._connection = sqlite3.connect(self.path, timeout=30)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    model TEXT NOT NULL,
+                    hash BLOB NOT NULL,
+                    vector BLOB NOT NULL,
+                    last_used REAL NOT NULL,
+                    PRIMARY KEY (model, hash)
+                )
+                """
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)"
+            )
+        return self._connection
+
+    def get(self, model: str, hashes: list[bytes]) -> dict:
+        """
+        Look up cached embeddings and mark them as recently used.
+
+        Args:
+            model (str): Name of the embedding model.
+            hashes (List[bytes]): Content hashes, see ``content_hash``.
+
+        Returns:
+            Dict[bytes, np.ndarray]: float32 embeddings of the cached hashes.
+        """
+        found = {}
+        hashes = list(dict.fromkeys(hashes))
+
+        for start in range(0, len(hashes), _MAX_PARAMS):
+            chunk = hashes[start : start + _MAX_PARAMS]
+            rows = self.connection.execute(
+                "SELECT hash, vector FROM embeddings WHERE model = ? "
+                f"AND hash IN ({','.join('?' * len(chunk))})",
+                (model, *chunk),
+            )
+            for key, vector in rows:
+                found[key] = np.frombuffer(vector, dtype=np.float32)
+
+        if found:
+            now = time.time()
+            with self.connection:
+                self.connection.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND hash = ?",
+                    [(now, model, key) for key in found],
+                )
+        return found
+
+    def put(self, model: str, hashes: list[bytes], embeddings: np.ndarray) -> None:
+        """
+        Add embeddings to the cache. Call ``evict`` once done adding.
+
+        Args:
+            model (str): Name of the embedding model.
+            hashes (List[bytes]): Content hashes of the embedded chunks.
+            embeddings (np.ndarray): Embeddings of shape (len(hashes), dim).
+        """
+        now = time.time()
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)",
+                [
+                    (model, key, embedding.tobytes(), now)
+                    for key, embedding in zip(hashes, embeddings)
+                ],
+            )
+
+    def evict(self) -> int:
+        """
+        Evict the least recently used entries until the cache fits ``max_size``.
+
+        Returns:
+            int: Number of evicted entries.
+        """
+        (size,) = self.connection.execute(
+            "SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+        ).fetchone()
+        if size <= self.max_size:
+            return 0
+
+        evicted = []
+        rows = self.connection.execute(
+            "SELECT model, hash, LENGTH(vector) FROM embeddings ORDER BY last_used"
+        )
+        for model, key, length in rows:
+            if size <= self.max_size:
+                break
+            evicted.append((model, key))
+            size -= length
+        rows.close()
+
+        with self.connection:
+            self.connection.executemany(
+                "DELETE FROM embeddings WHERE model = ? AND hash = ?", evicted
+            )
+        return len(evicted)
+
+    def clear(self) -> None:
+        """Remove every cached embedding."""
+        with self.connection:
+            self.connection.execute("DELETE FROM embeddings")
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+class LRUCache:
+    """An in-process least recently used cache that counts its hits and misses."""
+
+    def __init__(self, maxsize: int = 1024) -> None:
+        """
+        Initialize the LRUCache.
+
+        Args:
+            maxsize (int): Maximum number of entries. 0 disables the cache.
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        """Get the value of a key, marking it as recently used."""
+        if key in self._entries:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+        self.misses += 1
+        return default
+
+    def put(self, key, value) -> None:
+        """Add a value, evicting the least recently used entry when full."""
+        if self.maxsize <= 0:
+            return
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove every entry. Hit statistics are kept."""
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        """Get the hit statistics of the cache."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+        }
+
+
+def embed_queries(queries: list[str], cache: LRUCache, encode) -> np.ndarray:
+    """
+    Embed queries, reusing the cached embeddings of repeated queries.
+
+    Args:
+        queries (List[str]): Query strings.
+        cache (LRUCache): Cache of query embeddings, keyed by query.
+        encode (Callable): Encodes a list of the queries missing from the cache.
+
+    Returns:
+        np.ndarray: float32 query embeddings of shape (num_queries, dim).
+    """
+    embeddings = [cache.get(query) for query in queries]
+    misses = list(
+        dict.fromkeys(
+            query for query, embedding in zip(queries, embeddings) if embedding is None
+        )
+    )
+
+    if misses:
+        encoded = dict(zip(misses, np.asarray(encode(misses), dtype=np.float32)))
+        for query, embedding in encoded.items():
+            cache.put(query, embedding)
+        embeddings = [
+            encoded[query] if embedding is None else embedding
+            for query, embedding in zip(queries, embeddings)
+        ]
+
+    return np.asarray(embeddings, dtype=np.float32)
@@ -0,0 +1,109 @@
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Embedding model of the current worker process.
+_worker_embedder = None
+
+
+def _init_worker(embedder, num_threads: int) -> None:
+    """Load the embedding model of a worker process."""
+    global _worker_embedder
+
+    try:
+        import torch
+
+        # Split the cores between the workers instead of oversubscribing them.
+        torch.set_num_threads(num_threads)
+    except ImportError:
+        pass
+
+    if embedder is None:
+        from vectorstore.neostore import load_embedding_model
+
+        embedder = load_embedding_model()
+    _worker_embedder = embedder
+
+
+def _encode_batch(texts: list[str]) -> np.ndarray:
+    return np.asarray(_worker_embedder.encode(texts), dtype=np.float32)
+
+
+class ParallelEncoder:
+    """
+    Encode batches of texts with a pool of embedding model processes.
+
+    Every worker process holds its own copy of the embedding model. Batches are
+    submitted while earlier ones are encoded, with at most ``max_pending``
+    batches in flight, and their embeddings are yielded in submission order.
+    Preparing batches, encoding them and collecting the results overlap.
+
+    Used as a context manager, the worker processes are started once and reused
+    by every ``encode`` call, e.g. for every block of a streamed build.
+    """
+
+    def __init__(self, embedder=None, num_workers: int = None, max_pending: int = None):
+        """
+        Initialize the ParallelEncoder.
+
+        Args:
+            embedder (SentenceTransformer, optional): Model copied to every worker.
+                Defaults to the NeoStore model, loaded by the workers themselves.
+            num_workers (int, optional): Number of worker processes. Defaults to
+                the number of CPUs.
+            max_pending (int, optional): Maximum number of batches in flight.
+                Defaults to twice the number of workers.
+        """
+        self.embedder = embedder
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.max_pending = max_pending or 2 * self.num_workers
+        self._pool = None
+
+    def __enter__(self):
+        if self._pool is None:
+            num_threads = max(1, (os.cpu_count() or 1) // self.num_workers)
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.num_workers,
+                # Forking a process that has loaded torch is unsafe.
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.embedder, num_threads),
+            )
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Stop the worker processes."""
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    def encode(self, batches):
+        """
+        Encode batches of texts in parallel.
+
+        Args:
+            batches (Iterable[List[str]]): Batches of texts, consumed lazily.
+
+        Yields:
+            np.ndarray: float32 embeddings of every batch, in input order.
+        """
+        if self._pool is None:
+            # Without an open context, the workers only live for this call.
+            with self:
+                yield from self.encode(batches)
+            return
+
+        pending = deque()
+        for texts in batches:
+            if len(pending) >= self.max_pending:
+                yield pending.popleft().result()
+            pending.append(self._pool.submit(_encode_batch, texts))
+
+        while pending:
+            yield pending.popleft().result()
@@ -0,0 +1,179 @@
+import os
+
+import numpy as np
+
+
+class IVFIndex:
+    """
+    An inverted-file (IVF) coarse quantizer for approximate search in NeoStore.
+
+    The unit-normalized store vectors are clustered with spherical k-means and
+    every vector is listed under its nearest centroid. A query only scans the
+    vectors listed under its ``nprobe`` nearest centroids, trading recall for
+    latency.
+    """
+
+    def __init__(self, centroids: np.ndarray, assignments: np.ndarray) -> None:
+        """
+        Initialize the index from trained centroids and vector assignments.
+
+        Args:
+            centroids (np.ndarray): Unit-normalized centroids of shape (nlist, dim).
+            assignments (np.ndarray): Centroid id of every store vector, shape (num_docs,).
+        """
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.assignments = np.asarray(assignments, dtype=np.int32)
+        self._build_lists()
+
+    @property
+    def nlist(self) -> int:
+        return self.centroids.shape[0]
+
+    def _build_lists(self):
+        # Posting lists in CSR form: the ids of list c are ids[offsets[c]:offsets[c + 1]].
+        self.ids = np.argsort(self.assignments, kind="stable").astype(np.int64)
+        counts = np.bincount(self.assignments, minlength=self.nlist)
+        self.offsets = np.concatenate(([0], np.cumsum(counts)))
+
+    @staticmethod
+    def default_nlist(num_docs: int) -> int:
+        """Number of clusters used when none is given, about 4 * sqrt(num_docs)."""
+        return max(1, min(num_docs, int(4 * np.sqrt(num_docs))))
+
+    @classmethod
+    def train(
+        cls,
+        vectors: np.ndarray,
+        nlist: int = None,
+        n_iter: int = 20,
+        max_points_per_centroid: int = 256,
+        batch_size: int = 65536,
+        seed: int = 0,
+    ):
+        """
+        Train the centroids with spherical k-means and assign every vector.
+
+        Training runs on a random sample of at most ``max_points_per_centroid``
+        vectors per centroid, so its cost does not grow with the store size.
+
+        Args:
+            vectors (np.ndarray): Unit-normalized vectors of shape (num_docs, dim).
+            nlist (int, optional): Number of clusters. Defaults to ``default_nlist``.
+            n_iter (int): Number of k-means iterations.
+            max_points_per_centroid (int): Training sample size per centroid.
+            batch_size (int): Number of vectors assigned per matrix product.
+            seed (int): Seed for sampling and initialization.
+
+        Returns:
+            IVFIndex: The trained index.
+        """
+        num_docs = vectors.shape[0]
+        nlist = cls.default_nlist(num_docs) if nlist is None else min(nlist, num_docs)
+        if nlist < 1:
+            raise ValueError("Cannot train an IVF index on an empty store.")
+
+        rng = np.random.default_rng(seed)
+        sample_size = min(num_docs, nlist * max_points_per_centroid)
+        sample_ids = np.sort(rng.choice(num_docs, sample_size, replace=False))
+        sample = np.asarray(vectors[sample_ids], dtype=np.float32)
+
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+
+        for _ in range(n_iter):
+            labels = cls._nearest(sample, centroids, batch_size)
+            counts = np.bincount(labels, minlength=nlist)
+
+            sums = np.zeros_like(centroids)
+            order = np.argsort(labels, kind="stable")
+            non_empty = np.flatnonzero(counts)
+            starts = np.concatenate(([0], np.cumsum(counts)))[non_empty]
+            sums[non_empty] = np.add.reduceat(sample[order], starts, axis=0)
+
+            # Re-seed empty clusters with random sample points.
+            empty = np.flatnonzero(counts == 0)
+            sums[empty] = sample[rng.choice(sample_size, len(empty))]
+
+            centroids = cls._normalize(sums)
+
+        return cls(centroids, cls._nearest(vectors, centroids, batch_size))
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms > 0, norms, 1.0)
+
+    @staticmethod
+    def _nearest(vectors: np.ndarray, centroids: np.ndarray, batch_size: int):
+        labels = np.empty(vectors.shape[0], dtype=np.int32)
+        for start in range(0, vectors.shape[0], batch_size):
+            block = np.asarray(vectors[start : start + batch_size], dtype=np.float32)
+            labels[start : start + batch_size] = np.argmax(block @ centroids.T, axis=1)
+        return labels
+
+    def assign(self, vectors: np.ndarray, batch_size: int = 65536) -> np.ndarray:
+        """
+        Get the nearest centroid of every vector.
+
+        Args:
+            vectors (np.ndarray): Unit-normalized vectors of shape (num_vectors, dim).
+            batch_size (int): Number of vectors assigned per matrix product.
+
+        Returns:
+            np.ndarray: Centroid ids of shape (num_vectors,).
+        """
+        return self._nearest(vectors, self.centroids, batch_size)
+
+    def probe(self, query: np.ndarray, nprobe: int, min_candidates: int = 1):
+        """
+        Get the ids of the vectors listed under the nearest centroids of a query.
+
+        More than ``nprobe`` lists are scanned when needed to reach
+        ``min_candidates`` vectors.
+
+        Args:
+            query (np.ndarray): Query vector of shape (dim,).
+            nprobe (int): Number of nearest lists to scan.
+            min_candidates (int): Minimum number of candidate ids to return.
+
+        Returns:
+            np.ndarray: Sorted candidate ids.
+        """
+        order = np.argsort(-(self.centroids @ query))
+        sizes = np.cumsum(np.diff(self.offsets)[order])
+        enough = int(np.searchsorted(sizes, min(min_candidates, sizes[-1])))
+        lists = order[: max(nprobe, enough + 1)]
+
+        candidates = np.concatenate(
+            [self.ids[self.offsets[c] : self.offsets[c + 1]] for c in lists]
+        )
+        return np.sort(candidates)
+
+    def save(self, path: str) -> None:
+        """
+        Save the index into a store directory.
+
+        Args:
+            path (str): Path to the store directory.
+        """
+        np.save(os.path.join(path, "ivf_centroids.npy"), self.centroids)
+        np.save(os.path.join(path, "ivf_assignments.npy"), self.assignments)
+
+    @classmethod
+    def load(cls, path: str):
+        """
+        Load the index saved in a store directory, if any.
+
+        Args:
+            path (str): Path to the store directory.
+
+        Returns:
+            IVFIndex: The loaded index, or None if the store has no IVF index.
+        """
+        centroids_path = os.path.join(path, "ivf_centroids.npy")
+        if not os.path.isfile(centroids_path):
+            return None
+
+        return cls(
+            np.load(centroids_path),
+            np.load(os.path.join(path, "ivf_assignments.npy")),
+        )
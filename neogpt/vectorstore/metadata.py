@@ -0,0 +1,392 @@
+import json
+import os
+
+import numpy as np
+from vectorstore.npyfile import append_npy
+
+# Placeholder of a key missing from the metadata of a document.
+_MISSING = object()
+
+
+class MetadataIndex:
+    """
+    Columnar metadata of the NeoStore documents with inverted indexes.
+
+    Every metadata key is a column of dictionary-encoded int32 codes, -1 when a
+    document does not have the key. Posting lists mapping every value to its
+    rows are built per column on first use, so a filter resolves to row ids
+    without decoding any document.
+
+    Keys whose values are all numbers, e.g. ``start_index`` or ``page_start``,
+    are nearly unique per document, so they are kept as raw float64 columns
+    instead, NaN when a document does not have the key, and filtered by scanning
+    the column. A numeric column is dictionary-encoded once another value is
+    added to it.
+
+    Filters are dictionaries of metadata key to condition, all of which must
+    hold:
+
+        {"file_path": "/data/a.txt"}              # equality
+        {"file_path": ["/data/a.txt", "/b.md"]}   # any of the values
+        {"file_path": {"$in": ["/data/a.txt"]}}   # any of the values
+        {"file_path": {"$prefix": "/data/docs/"}} # string prefix, e.g. a folder
+    """
+
+    def __init__(self) -> None:
+        self.num_rows = 0
+        self.columns = {}
+        self.values = {}
+        # Keys stored as raw numeric columns.
+        self.numeric = set()
+        self._codes = {}
+        self._postings = {}
+        # Numeric columns dictionary-encoded since the last save.
+        self._converted = set()
+        # Number of values of every key written to its value file.
+        self._saved_values = {}
+        # Number of leading rows moved to the column files of _spill_path.
+        self._spilled = 0
+        self._spill_path = None
+
+    @staticmethod
+    def _value_key(value):
+        if value is None or isinstance(value, (str, int, float, bool)):
+            return value
+        return json.dumps(value, sort_keys=True, default=str)
+
+    @staticmethod
+    def _is_number(value) -> bool:
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+    def _encode(self, key: str, values: list) -> np.ndarray:
+        """Dictionary-encode values of a key, _MISSING as -1."""
+        codes = self._codes.setdefault(key, {})
+        key_values = self.values.setdefault(key, [])
+        encoded = np.empty(len(values), dtype=np.int32)
+        for idx, value in enumerate(values):
+            if value is _MISSING:
+                encoded[idx] = -1
+                continue
+            value = self._value_key(value)
+            if value not in codes:
+                codes[value] = len(key_values)
+                key_values.append(value)
+            encoded[idx] = codes[value]
+        return encoded
+
+    def _to_categorical(self, key: str) -> None:
+        """Dictionary-encode a numeric column."""
+        self.numeric.discard(key)
+        if self._spilled and os.path.isfile(self._column_path(self._spill_path, key)):
+            # The spilled rows are encoded in their column file.
+            column_path = self._column_path(self._spill_path, key)
+            np.save(column_path, self._encode_numbers(key, np.load(column_path)))
+        else:
+            self._converted.add(key)
+        self.columns[key] = self._encode_numbers(key, self.columns[key])
+
+    def _encode_numbers(self, key: str, column: np.ndarray) -> np.ndarray:
+        """Dictionary-encode the values of a numeric column, NaN as -1."""
+        present = ~np.isnan(column)
+        codes = np.full(len(column), -1, dtype=np.int32)
+        codes[present] = self._encode(
+            key,
+            [int(value) if value.is_integer() else value for value in column[present].tolist()],
+        )
+        return codes
+
+    def _column_path(self, path: str, key: str) -> str:
+        return os.path.join(path, "metadata", f"{list(self.columns).index(key)}.npy")
+
+    @classmethod
+    def from_documents(cls, docs):
+        """
+        Build the index from the metadata of documents.
+
+        Args:
+            docs (Iterable[Document]): Documents in store order.
+
+        Returns:
+            MetadataIndex: The index.
+        """
+        index = cls()
+        index.add(doc.metadata for doc in docs)
+        return index
+
+    def add(self, metadatas) -> None:
+        """
+        Append the metadata of new rows.
+
+        Args:
+            metadatas (Iterable[dict]): Metadata of the new rows, in store order.
+        """
+        new_values = {key: [] for key in self.columns}
+        num_new = 0
+
+        for metadata in metadatas:
+            for key, value in metadata.items():
+                if key not in new_values:
+                    new_values[key] = [_MISSING] * num_new
+                new_values[key].append(value)
+
+            num_new += 1
+            for values in new_values.values():
+                if len(values) < num_new:
+                    values.append(_MISSING)
+
+        for key, values in new_values.items():
+            numeric = all(
+                value is _MISSING or self._is_number(value) for value in values
+            )
+            if key not in self.columns:
+                if numeric:
+                    self.numeric.add(key)
+                    column = np.full(self.num_rows - self._spilled, np.nan)
+                else:
+                    column = np.full(self.num_rows - self._spilled, -1, dtype=np.int32)
+            elif key in self.numeric and not numeric:
+                self._to_categorical(key)
+                column = self.columns[key]
+            else:
+                column = self.columns[key]
+
+            if key in self.numeric:
+                new_column = np.array(
+                    [np.nan if value is _MISSING else value for value in values],
+                    dtype=np.float64,
+                )
+            else:
+                new_column = self._encode(key, values)
+            self.columns[key] = np.concatenate((column, new_column))
+
+        self.num_rows += num_new
+        self._postings = {}
+
+    def spill(self, path: str) -> None:
+        """
+        Append the rows added since the last spill to the files of a store
+        directory and drop their columns from memory.
+
+        Only the value dictionaries are kept in memory, so a stream of documents
+        is indexed with bounded memory. A spilled index can only be added to and
+        spilled again; load the saved index to filter rows.
+
+        Args:
+            path (str): Path to the store directory.
+        """
+        self.save(path, start=self._spilled)
+        self._spill_path = path
+        self._spilled = self.num_rows
+        self.columns = {key: column[:0] for key, column in self.columns.items()}
+        self._postings = {}
+
+    def take(self, rows: np.ndarray):
+        """
+        Get the index restricted to the given rows, e.g. to compact a store.
+
+        Args:
+            rows (np.ndarray): Row ids to keep, in their new order.
+
+        Returns:
+            MetadataIndex: The restricted index.
+        """
+        index = MetadataIndex()
+        index.num_rows = len(rows)
+        index.columns = {key: column[rows] for key, column in self.columns.items()}
+        index.values = {key: list(values) for key, values in self.values.items()}
+        index.numeric = set(self.numeric)
+        index._codes = {key: dict(codes) for key, codes in self._codes.items()}
+        return index
+
+    def _posting_lists(self, key: str):
+        if key not in self._postings:
+            # Shift codes by one so that documents without the key (-1) get list 0.
+            shifted = self.columns[key] + 1
+            counts = np.bincount(shifted, minlength=len(self.values[key]) + 1)
+            self._postings[key] = (
+                np.argsort(shifted, kind="stable"),
+                np.concatenate(([0], np.cumsum(counts))),
+            )
+        return self._postings[key]
+
+    @staticmethod
+    def _condition_values(condition):
+        """The values of an equality or ``$in`` condition, None for ``$prefix``."""
+        if isinstance(condition, dict):
+            if "$prefix" in condition:
+                return None
+            if "$in" in condition:
+                condition = condition["$in"]
+            else:
+                raise ValueError(f"Unsupported metadata filter: {condition}")
+
+        if not isinstance(condition, (list, tuple, set)):
+            condition = [condition]
+        return condition
+
+    def _numeric_rows(self, key: str, condition) -> np.ndarray:
+        values = self._condition_values(condition)
+        values = [value for value in values or () if self._is_number(value)]
+        return np.flatnonzero(np.isin(self.columns[key], values))
+
+    def _matching_codes(self, key: str, condition) -> list[int]:
+        codes = self._codes[key]
+        values = self._condition_values(condition)
+
+        if values is None:
+            prefix = condition["$prefix"]
+            return [
+                code
+                for code, value in enumerate(self.values[key])
+                if isinstance(value, str) and value.startswith(prefix)
+            ]
+
+        return [
+            codes[value]
+            for value in map(self._value_key, values)
+            if value in codes
+        ]
+
+    def rows(self, where: dict) -> np.ndarray:
+        """
+        Get the rows matching a filter.
+
+        Args:
+            where (dict): Metadata filter, see the class docstring.
+
+        Returns:
+            np.ndarray: Sorted row ids.
+        """
+        result = None
+
+        for key, condition in where.items():
+            if key not in self.columns:
+                return np.empty(0, dtype=np.int64)
+
+            if key in self.numeric:
+                rows = self._numeric_rows(key, condition)
+            else:
+                ids, offsets = self._posting_lists(key)
+                rows = np.sort(
+                    np.concatenate(
+                        [
+                            ids[offsets[code + 1] : offsets[code + 2]]
+                            for code in self._matching_codes(key, condition)
+                        ]
+                        or [np.empty(0, dtype=np.int64)]
+                    )
+                )
+            result = (
+                rows
+                if result is None
+                else np.intersect1d(result, rows, assume_unique=True)
+            )
+
+        if result is None:
+            return np.arange(self.num_rows)
+        return result.astype(np.int64)
+
+    def save(self, path: str, start: int = None) -> None:
+        """
+        Save the index into a store directory.
+
+        Every column is saved to ``metadata/<column id>.npy`` and the values of
+        a dictionary-encoded column, one JSON value per line, to
+        ``metadata/<column id>.jsonl``.
+
+        Args:
+            path (str): Path to the store directory.
+            start (int, optional): Only append the rows from ``start`` onwards,
+                and the values they added, to the files written by a previous
+                save.
+        """
+        metadata_path = os.path.join(path, "metadata")
+        os.makedirs(metadata_path, exist_ok=True)
+
+        keys = list(self.columns)
+        for column_id, key in enumerate(keys):
+            column_path = os.path.join(metadata_path, f"{column_id}.npy")
+            append = (
+                start is not None
+                and key not in self._converted
+                and os.path.isfile(column_path)
+            )
+            column = self.columns[key]
+            if append:
+                append_npy(column_path, column[start - self._spilled :])
+            elif self._spilled:
+                # A key first seen after the last spill is missing from the spilled rows.
+                padded = np.lib.format.open_memmap(
+                    column_path, mode="w+", dtype=column.dtype, shape=(self.num_rows,)
+                )
+                padded[: self._spilled] = np.nan if key in self.numeric else -1
+                padded[self._spilled :] = column
+                padded.flush()
+                del padded
+            else:
+                np.save(column_path, column)
+
+            if key in self.numeric:
+                continue
+            values_path = os.path.join(metadata_path, f"{column_id}.jsonl")
+            num_saved = (
+                self._saved_values.get(key, 0)
+                if append and os.path.isfile(values_path)
+                else 0
+            )
+            with open(values_path, "a" if num_saved else "w") as f:
+                f.writelines(
+                    json.dumps(value, ensure_ascii=False) + "\n"
+                    for value in self.values[key][num_saved:]
+                )
+            self._saved_values[key] = len(self.values[key])
+        self._converted = set()
+
+        with open(os.path.join(metadata_path, "columns.json"), "w") as f:
+            json.dump(
+                {
+                    "num_rows": self.num_rows,
+                    "keys": keys,
+                    "numeric": sorted(self.numeric),
+                },
+                f,
+                ensure_ascii=False,
+            )
+
+    @classmethod
+    def load(cls, path: str):
+        """
+        Load the index saved in a store directory, if any.
+
+        Args:
+            path (str): Path to the store directory.
+
+        Returns:
+            MetadataIndex: The loaded index, or None if the store has none.
+        """
+        metadata_path = os.path.join(path, "metadata")
+        columns_path = os.path.join(metadata_path, "columns.json")
+        if not os.path.isfile(columns_path):
+            return None
+
+        with open(columns_path) as f:
+            columns = json.load(f)
+
+        index = cls()
+        index.num_rows = columns["num_rows"]
+        index.numeric = set(columns.get("numeric", ()))
+        for column_id, key in enumerate(columns["keys"]):
+            index.columns[key] = np.load(os.path.join(metadata_path, f"{column_id}.npy"))
+            if key in index.numeric:
+                continue
+            if "values" in columns:
+                # Stores saved before value files existed.
+                index.values[key] = columns["values"][key]
+            else:
+                with open(os.path.join(metadata_path, f"{column_id}.jsonl")) as f:
+                    index.values[key] = [json.loads(line) for line in f]
+                index._saved_values[key] = len(index.values[key])
+            index._codes[key] = {
+                value: code for code, value in enumerate(index.values[key])
+            }
+        return index
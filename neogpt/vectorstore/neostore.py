@@ -1,10 +1,26 @@
+import json
+import mmap
+import os
+import shutil
+from contextlib import nullcontext
 from enum import Enum
-from typing import List, NamedTuple
+from itertools import islice
+from typing import TYPE_CHECKING, List, NamedTuple
 
 import numpy as np
 from rich.progress import Progress
-from sentence_transformers import SentenceTransformer
 from settings import Settings
+from vectorstore.bm25 import BM25Index, BM25Writer
+from vectorstore.cache import EmbeddingCache, LRUCache, content_hash, embed_queries
+from vectorstore.encoder import ParallelEncoder
+from vectorstore.ivf import IVFIndex
+from vectorstore.metadata import MetadataIndex
+from vectorstore.npyfile import append_npy
+from vectorstore.quantization import QUANTIZER_MAP, ProductQuantizer, ScalarQuantizer
+
+if TYPE_CHECKING:
+    # Importing sentence_transformers loads torch, which takes seconds.
+    from sentence_transformers import SentenceTransformer
 
 
 class Document(NamedTuple):
@@ -16,6 +32,101 @@ class Document(NamedTuple):
     metadata: dict
 
 
+# Name of the store directory created inside a parent directory such as
+# Settings.VECTOR_STORE_DIR, and the version of its on-disk layout.
+STORE_NAME = "neostore"
+STORE_FORMAT_VERSION = 1
+
+# Default SentenceTransformer model used by NeoStore.
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+
+# Rank offset of reciprocal rank fusion, which damps the weight of the very
+# first ranks of either ranking.
+RRF_K = 60
+
+
+class DocStore:
+    """
+    Read-only, offset-indexed view over the documents of a persisted NeoStore.
+
+    Documents are stored one JSON object per line in ``docs.jsonl`` and the byte
+    offset of every line is kept in ``docs_offsets.npy``. Only the documents that
+    are accessed are decoded, so loading a store does not materialize its text.
+    """
+
+    def __init__(self, path: str):
+        """
+        Open the document sidecar of a store directory.
+
+        Args:
+            path (str): Path to the store directory.
+        """
+        self.offsets = np.load(os.path.join(path, "docs_offsets.npy"))
+
+        with open(os.path.join(path, "docs.jsonl"), "rb") as f:
+            self._data = (
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                if os.fstat(f.fileno()).st_size
+                else b""
+            )
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, idx: int) -> Document:
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError(f"Document index {idx} is out of range.")
+
+        record = json.loads(self._data[self.offsets[idx] : self.offsets[idx + 1]])
+        return Document(content=record["content"], metadata=record["metadata"])
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self[idx]
+
+    @staticmethod
+    def _write_records(f, docs) -> list[int]:
+        offsets = []
+        for doc in docs:
+            record = {"content": doc.content, "metadata": doc.metadata}
+            f.write(json.dumps(record, ensure_ascii=False, default=str).encode())
+            f.write(b"\n")
+            offsets.append(f.tell())
+        return offsets
+
+    @staticmethod
+    def write(path: str, docs) -> None:
+        """
+        Write documents to the sidecar files of a store directory.
+
+        Args:
+            path (str): Path to the store directory.
+            docs (Iterable[Document]): Documents to write, in store order.
+        """
+        with open(os.path.join(path, "docs.jsonl"), "wb") as f:
+            offsets = [0, *DocStore._write_records(f, docs)]
+
+        np.save(os.path.join(path, "docs_offsets.npy"), np.array(offsets, np.int64))
+
+    @staticmethod
+    def append(path: str, docs) -> None:
+        """
+        Append documents to the sidecar files of a store directory.
+
+        Args:
+            path (str): Path to the store directory.
+            docs (Iterable[Document]): Documents to append, in store order.
+        """
+        with open(os.path.join(path, "docs.jsonl"), "ab") as f:
+            offsets = DocStore._write_records(f, docs)
+
+        append_npy(
+            os.path.join(path, "docs_offsets.npy"), np.array(offsets, np.int64)
+        )
+
+
 class NeoMetric(Enum):
     """An enumeration of similarity metrics supported by NeoStore."""
 
@@ -23,27 +134,227 @@ class NeoMetric(Enum):
     EUCLIDEAN = "euclidean"
 
 
+class NeoIndex(Enum):
+    """An enumeration of search indexes supported by NeoStore."""
+
+    # Exact brute-force scan over every vector.
+    FLAT = "flat"
+    # Approximate scan over the nprobe nearest inverted-file clusters.
+    IVF = "ivf"
+
+
+class NeoQuantization(Enum):
+    """An enumeration of compressed vector encodings supported by NeoStore."""
+
+    # Scan the full-precision float32 vectors.
+    NONE = "none"
+    # Scan int8 scalar-quantized codes, then rerank against float32 vectors.
+    INT8 = "int8"
+    # Scan product-quantized codes, then rerank against float32 vectors.
+    PQ = "pq"
+
+
+class NeoSearchMode(Enum):
+    """An enumeration of retrieval modes supported by NeoStore."""
+
+    # Rank by embedding similarity.
+    DENSE = "dense"
+    # Rank by BM25 keyword relevance.
+    SPARSE = "sparse"
+    # Fuse the dense and sparse rankings with reciprocal rank fusion.
+    HYBRID = "hybrid"
+
+
+def load_embedding_model() -> "SentenceTransformer":
+    """Load the default SentenceTransformer model used by NeoStore."""
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(
+        model_name_or_path=EMBEDDING_MODEL_NAME,
+        trust_remote_code=True,
+    )
+
+
+def resolve_model_name(model: "SentenceTransformer"):
+    """
+    Name of a SentenceTransformer model, used to key the embedding cache.
+
+    Args:
+        model (SentenceTransformer, optional): The model, None for the default
+            model of ``load_embedding_model``.
+
+    Returns:
+        Optional[str]: The base model of its model card (sentence-transformers
+        3+), else the name or path of its transformer, or None if neither is
+        known.
+    """
+    if model is None:
+        return EMBEDDING_MODEL_NAME
+
+    model_card = getattr(model, "model_card_data", None)
+    if name := getattr(model_card, "base_model", None):
+        return name
+
+    # sentence-transformers 2.x records the model only in its Transformer module.
+    first_module = next(iter(getattr(model, "_modules", {}).values()), None)
+    config = getattr(getattr(first_module, "auto_model", None), "config", None)
+    return getattr(config, "_name_or_path", None) or None
+
+
 class NeoStore:
     """A custom vector store implementation for NeoGPT using numpy."""
 
     def __init__(
         self,
-        embedding_model: SentenceTransformer = None,
+        embedding_model: "SentenceTransformer" = None,
         similarity_metric=NeoMetric.COSINE,
+        index_type=NeoIndex.FLAT,
+        nlist: int = None,
+        nprobe: int = 8,
+        compaction_threshold: float = 0.25,
+        quantization=NeoQuantization.NONE,
+        rerank_factor: int = None,
+        pq_subvectors: int = None,
+        bm25: bool = True,
+        search_mode=NeoSearchMode.DENSE,
+        hybrid_weight: float = 0.5,
+        embedding_cache=True,
+        embedding_model_name: str = None,
+        query_cache_size: int = 1024,
+        encode_workers: int = 0,
     ) -> None:
+        """
+        Initialize the NeoStore.
+
+        Args:
+            embedding_model (SentenceTransformer, optional): Model used to embed documents and queries.
+            similarity_metric (NeoMetric): Similarity metric to use.
+            index_type (NeoIndex): Exact flat search or approximate IVF search.
+            nlist (int, optional): Number of IVF clusters built by ``build_store``.
+                Defaults to about 4 * sqrt(num_docs).
+            nprobe (int): Number of IVF clusters scanned per query. Higher values
+                improve recall at the cost of latency.
+            compaction_threshold (float): Fraction of deleted rows above which
+                deletes trigger a compaction of the store.
+            quantization (NeoQuantization): Compressed encoding scanned in the first
+                search pass. Load the store memory-mapped to keep the float32
+                vectors on disk.
+            rerank_factor (int, optional): With quantization, ``rerank_factor * k``
+                candidates from the first pass are re-scored exactly. Defaults to
+                4 for int8 and 16 for the coarser PQ codes.
+            pq_subvectors (int, optional): Number of PQ sub-vectors (bytes per
+                vector). Must divide the dimension. Defaults to dim / 4.
+            bm25 (bool): Whether ``build_store`` builds a BM25 keyword index next
+                to the embeddings.
+            search_mode (NeoSearchMode): Default retrieval mode of ``search``.
+            hybrid_weight (float): Weight of the dense ranking in hybrid search,
+                between 0 (keywords only) and 1 (embeddings only).
+            embedding_cache (EmbeddingCache | bool): Cache of document embeddings
+                reused across builds. True uses the cache under
+                Settings.VECTOR_STORE_DIR, False disables it.
+            embedding_model_name (str, optional): Name of the embedding model the
+                cache is keyed by. Defaults to the name of the SentenceTransformer
+                model, resolved once, or EMBEDDING_MODEL_NAME for the default
+                model. Documents are not cached when it cannot be determined.
+            query_cache_size (int): Number of query embeddings and of search
+                results kept in the in-process LRU caches. 0 disables them.
+            encode_workers (int): Number of worker processes, each holding a copy
+                of the embedding model, that encode documents in parallel. 0
+                encodes in-process.
+        """
         self.similarity_metric = similarity_metric
+        self.index_type = index_type
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.compaction_threshold = compaction_threshold
+        self.quantization = quantization
+        self.rerank_factor = rerank_factor or (
+            16 if quantization == NeoQuantization.PQ else 4
+        )
+        self.pq_subvectors = pq_subvectors
+        self.bm25 = bm25
+        self.search_mode = NeoSearchMode(search_mode)
+        self.hybrid_weight = hybrid_weight
+        self.embedding_cache = (
+            EmbeddingCache() if embedding_cache is True else embedding_cache or None
+        )
+        self.embedding_model_name = (
+            embedding_model_name
+            if embedding_model_name is not None
+            else resolve_model_name(embedding_model)
+        )
+        self._query_embeddings = LRUCache(query_cache_size)
+        self._results = LRUCache(query_cache_size)
+        self.encode_workers = encode_workers
+        # Incremented whenever the searchable content changes.
+        self.generation = 0
         self.__vectorstore = None
+        self._ivf = None
+        self._quantizer = None
+        self._bm25 = None
+        self._metadata = MetadataIndex()
+        # Boolean mask of deleted rows, or None when nothing is deleted.
+        self._deleted = None
+        # Store directory that incremental changes are persisted to.
+        self.path = None
+        self._mmap_mode = None
         self._similarity_function = None
-        self.embeddings_model = embedding_model
-
-        if self.embeddings_model is None:
-            self.embeddings_model = SentenceTransformer(
-                model_name_or_path="all-MiniLM-L6-v2",
-                trust_remote_code=True,
-            )
+        self._embeddings_model = embedding_model
 
         self._get_similarity_metric()
 
+    @property
+    def embeddings_model(self) -> "SentenceTransformer":
+        """
+        The model used to embed documents and queries.
+
+        The default model is only loaded on first use, so stores that only score
+        precomputed vectors, such as shard workers, never load it.
+        """
+        if self._embeddings_model is None:
+            self._embeddings_model = load_embedding_model()
+        return self._embeddings_model
+
+    @embeddings_model.setter
+    def embeddings_model(self, embedding_model: "SentenceTransformer"):
+        self._embeddings_model = embedding_model
+        self.embedding_model_name = resolve_model_name(embedding_model)
+        self._query_embeddings.clear()
+        self._bump_generation()
+
+    @property
+    def build_config(self) -> dict:
+        """
+        The options the files of a built store depend on, e.g. to tell whether
+        the store has to be rebuilt for the current options.
+        """
+        return {
+            "embedding_model": self.embedding_model_name,
+            "index": NeoIndex(self.index_type).value,
+            "nlist": self.nlist,
+            "quantization": NeoQuantization(self.quantization).value,
+            "pq_subvectors": self.pq_subvectors,
+            "bm25": self.bm25,
+        }
+
+    @property
+    def cache_stats(self) -> dict:
+        """Hit statistics of the query embedding and search result caches."""
+        return {
+            "query_embeddings": self._query_embeddings.stats(),
+            "results": self._results.stats(),
+        }
+
+    def _bump_generation(self):
+        """Mark the store content as changed, invalidating cached search results."""
+        self.generation += 1
+        self._results.clear()
+
+    @property
+    def is_loaded(self) -> bool:
+        """Whether the store holds embeddings that can be searched."""
+        return self.__vectorstore is not None
+
     def _get_similarity_metric(self):
         if self.similarity_metric == NeoMetric.COSINE:
             self._similarity_function = self._cosine_similarity
@@ -52,61 +363,476 @@ class NeoStore:
         else:
             raise ValueError("Invalid similarity metric specified.")
 
-    def _cosine_similarity(self, query: np.ndarray):
-        assert query.ndim == 1
-        assert query.shape[0] == self.__vectorstore.shape[1]
+    def _set_vectors(self, embeddings: np.ndarray):
+        """
+        Cache the scoring structures for a matrix of embeddings.
+
+        The store keeps a contiguous float32 copy of the embeddings normalized to
+        unit length, along with the original row norms and squared norms. Both
+        metrics are computed from these with a single matrix product per query,
+        so nothing is recomputed over the whole store at search time.
+
+        Args:
+            embeddings (np.ndarray): Embedding matrix of shape (num_docs, dim).
+        """
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1).astype(np.float32)
+        safe_norms = np.where(norms > 0, norms, 1.0).astype(np.float32)
+
+        self._set_normalized(
+            np.ascontiguousarray(vectors / safe_norms[:, None]), norms
+        )
+
+    def _set_normalized(self, vectors: np.ndarray, norms: np.ndarray):
+        """
+        Use an already unit-normalized matrix, e.g. a memory-mapped one, as the store.
+
+        Args:
+            vectors (np.ndarray): Unit-normalized float32 matrix of shape (num_docs, dim).
+            norms (np.ndarray): Original row norms of shape (num_docs,).
+        """
+        self.__vectorstore = vectors
+        self._norms = np.asarray(norms, dtype=np.float32)
+        self._sq_norms = self._norms * self._norms
+        self._bump_generation()
+
+    @staticmethod
+    def _normalize_query(query: np.ndarray) -> np.ndarray:
+        query = np.asarray(query, dtype=np.float32)
+        query_norms = np.linalg.norm(query, axis=-1, keepdims=True)
+        return query / np.where(query_norms > 0, query_norms, 1.0)
 
-        n1 = np.linalg.norm(self.__vectorstore, axis=1)
-        n2 = np.linalg.norm(query)
+    def _cosine_similarity(self, query: np.ndarray, rows: np.ndarray = None):
+        assert query.ndim in (1, 2)
+        assert query.shape[-1] == self.__vectorstore.shape[1]
 
-        return np.dot(self.__vectorstore, query) / (n1 * n2)
+        vectors = self.__vectorstore if rows is None else self.__vectorstore[rows]
 
-    def _euclidean_similarity(self, query: np.ndarray):
-        assert query.ndim == 1
+        return self._normalize_query(query) @ vectors.T
+
+    def _euclidean_similarity(self, query: np.ndarray, rows: np.ndarray = None):
+        assert query.ndim in (1, 2)
         assert (
-            query.shape[0] == self.__vectorstore.shape[1]
-        ), f"Mismatch shapes.\n\nQuery shape: {query.shape[0]} Store shape: {self.__vectorstore.shape[1]}"
-        distance = np.sqrt(((self.__vectorstore - query) ** 2).sum(axis=1))
-        return distance
+            query.shape[-1] == self.__vectorstore.shape[1]
+        ), f"Mismatch shapes.\n\nQuery shape: {query.shape[-1]} Store shape: {self.__vectorstore.shape[1]}"
 
-    def _get_top_k(self, query: np.ndarray, k: int):
-        reverse_arr = self.similarity_metric == NeoMetric.COSINE
+        if rows is None:
+            vectors, norms, sq_norms = self.__vectorstore, self._norms, self._sq_norms
+        else:
+            vectors, norms = self.__vectorstore[rows], self._norms[rows]
+            sq_norms = self._sq_norms[rows]
 
-        arr = self._similarity_function(query)
+        # ||x - q||^2 = ||x||^2 + ||q||^2 - 2 * ||x|| * (x_hat . q)
+        query = np.asarray(query, dtype=np.float32)
+        dots = query @ vectors.T
+        query_sq_norms = np.einsum("...d,...d->...", query, query)[..., None]
+        distance = sq_norms + query_sq_norms - 2 * norms * dots
 
-        sorted_indices = np.argsort(arr)
-        top_k_indices = (
-            sorted_indices[:k] if not reverse_arr else sorted_indices[::-1][:k]
-        )
+        return np.sqrt(np.maximum(distance, 0, out=distance), out=distance)
+
+    def _approximate_similarity(self, query: np.ndarray, rows: np.ndarray = None):
+        """
+        Score a query against the quantized codes instead of the float32 vectors.
+
+        Args:
+            query (np.ndarray): Query embedding of shape (dim,).
+            rows (np.ndarray, optional): Row ids to score, or None for all rows.
+
+        Returns:
+            np.ndarray: Approximate scores of shape (num_rows,).
+        """
+        if self.similarity_metric == NeoMetric.COSINE:
+            return self._quantizer.dot(self._normalize_query(query), rows)
+
+        query = np.asarray(query, dtype=np.float32)
+        norms = self._norms if rows is None else self._norms[rows]
+        distance = norms * norms + query @ query - 2 * norms * self._quantizer.dot(query, rows)
+
+        return np.sqrt(np.maximum(distance, 0, out=distance), out=distance)
+
+    def _select_top_k(self, scores: np.ndarray, k: int):
+        """
+        Select the indices of the k best scores along the last axis.
+
+        Uses ``np.argpartition`` so only the k winners are sorted instead of the
+        whole score array.
+
+        Args:
+            scores (np.ndarray): Scores of shape (num_docs,) or (num_queries, num_docs).
+            k (int): Number of indices to select.
+
+        Returns:
+            np.ndarray: Indices of the top-k scores, best first.
+        """
+        # Cosine is a similarity (higher is better), euclidean a distance.
+        keys = -scores if self.similarity_metric == NeoMetric.COSINE else scores
+
+        num_docs = keys.shape[-1]
+        k = min(k, num_docs)
+        if k == 0:
+            return np.empty(keys.shape[:-1] + (0,), dtype=np.intp)
+
+        if k < num_docs:
+            candidates = np.argpartition(keys, k - 1, axis=-1)[..., :k]
+        else:
+            candidates = np.broadcast_to(np.arange(num_docs), keys.shape)
 
-        top_k_scores = arr[top_k_indices]
+        order = np.argsort(np.take_along_axis(keys, candidates, axis=-1), axis=-1)
+        return np.take_along_axis(candidates, order, axis=-1)
 
+    def _to_documents(self, indices: np.ndarray, scores: np.ndarray):
+        """
+        Attach scores to the documents at the given indices.
+
+        Args:
+            indices (np.ndarray): Document indices, best first.
+            scores (np.ndarray): Scores aligned with ``indices``.
+
+        Returns:
+            List[Document]: Documents with the score added to a copy of their metadata.
+        """
         top_k_docs = []
 
-        for j, idx in enumerate(top_k_indices):
+        for idx, score in zip(indices.tolist(), scores.tolist()):
             if idx < len(self.docs):
-                # Get the existing document
                 doc = self.docs[idx]
 
-                # Add score to the existing metadata
-                doc_metadata = (
-                    doc.metadata.copy()
-                )  # Make a copy to avoid modifying the original
-                doc_metadata["score"] = top_k_scores[j]
+                # Make a copy to avoid modifying the original metadata
+                doc_metadata = doc.metadata.copy()
+                doc_metadata["score"] = score
 
-                # Append the updated Document instance to top_k_docs
                 top_k_docs.append(Document(content=doc.content, metadata=doc_metadata))
             else:
                 # Handle the case where idx is out of range of self.docs
                 print(f"Warning: Index {idx} is out of range of self.docs")
 
+        return top_k_docs
+
+    def _candidate_rows(
+        self, query: np.ndarray, k: int, nprobe: int = None, rows: np.ndarray = None
+    ):
+        """
+        Get the rows to score for a query, or None to score the whole store.
+
+        Args:
+            query (np.ndarray): Query embedding of shape (dim,).
+            k (int): Number of documents the search must return.
+            nprobe (int, optional): Number of IVF clusters to scan.
+            rows (np.ndarray, optional): Rows allowed by a metadata filter.
+
+        Returns:
+            np.ndarray: Sorted row ids, or None for an exact scan.
+        """
+        if self.index_type != NeoIndex.IVF or self._ivf is None:
+            return rows
+
+        candidates = self._ivf.probe(
+            self._normalize_query(query),
+            self.nprobe if nprobe is None else nprobe,
+            min_candidates=k,
+        )
+        if rows is None:
+            return candidates
+
+        # Scan every filtered row when the probed clusters hold too few of them.
+        candidates = np.intersect1d(candidates, rows, assume_unique=True)
+        return candidates if len(candidates) >= k else rows
+
+    def _filter_rows(self, where: dict = None):
+        """
+        Resolve a metadata filter to the rows it allows.
+
+        Args:
+            where (dict, optional): Metadata filter, see ``MetadataIndex``.
+
+        Returns:
+            np.ndarray: Sorted row ids, or None when there is no filter.
+        """
+        if not where:
+            return None
+        return self._metadata.rows(where)
+
+    @property
+    def num_live_docs(self) -> int:
+        """Number of documents in the store that are not deleted."""
+        if self.__vectorstore is None:
+            return 0
+        num_deleted = 0 if self._deleted is None else int(self._deleted.sum())
+        return self.__vectorstore.shape[0] - num_deleted
+
+    def _exclude_deleted(self, scores: np.ndarray, rows: np.ndarray = None):
+        """
+        Give deleted rows the worst possible score so they are never selected.
+
+        Args:
+            scores (np.ndarray): Scores of shape (num_rows,) or (num_queries, num_rows).
+            rows (np.ndarray, optional): Row ids the scores belong to, or None for all rows.
+
+        Returns:
+            np.ndarray: Boolean mask of the deleted rows among the scored ones, or None.
+        """
+        if self._deleted is None:
+            return None
+
+        deleted = self._deleted if rows is None else self._deleted[rows]
+        worst = -np.inf if self.similarity_metric == NeoMetric.COSINE else np.inf
+        scores[..., deleted] = worst
+        return deleted
+
+    def _shortlist_rows(self, query: np.ndarray, k: int, rows: np.ndarray = None):
+        """
+        Narrow the rows to rerank exactly using the quantized codes.
+
+        Args:
+            query (np.ndarray): Query embedding of shape (dim,).
+            k (int): Number of documents the search must return.
+            rows (np.ndarray, optional): Candidate row ids, or None for all rows.
+
+        Returns:
+            np.ndarray: Sorted row ids of the ``rerank_factor * k`` best candidates,
+            or ``rows`` unchanged when the store is not quantized.
+        """
+        if self._quantizer is None:
+            return rows
+
+        arr = self._approximate_similarity(query, rows)
+        deleted = self._exclude_deleted(arr, rows)
+        positions = self._select_top_k(arr, k * self.rerank_factor)
+        if deleted is not None:
+            positions = positions[~deleted[positions]]
+
+        return np.sort(positions if rows is None else rows[positions])
+
+    def _dense_top_k(
+        self, query: np.ndarray, k: int, nprobe: int = None, rows: np.ndarray = None
+    ):
+        """
+        Rank the rows by embedding similarity to a query.
+
+        Args:
+            query (np.ndarray): Query embedding of shape (dim,).
+            k (int): Number of rows to return.
+            nprobe (int, optional): Number of IVF clusters to scan.
+            rows (np.ndarray, optional): Rows allowed by a metadata filter.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Indices of the top-k rows, best first,
+            and their similarity scores.
+        """
+        filtered = rows is not None
+        rows = self._candidate_rows(query, k, nprobe, rows)
+        rows = self._shortlist_rows(query, k, rows)
+        arr = self._similarity_function(query, rows)
+        deleted = self._exclude_deleted(arr, rows)
+        top_k_positions = self._select_top_k(arr, k)
+        if deleted is not None:
+            top_k_positions = top_k_positions[~deleted[top_k_positions]]
+        top_k_scores = arr[top_k_positions]
+        top_k_indices = top_k_positions if rows is None else rows[top_k_positions]
+
+        if rows is None and not filtered:
+            assert len(top_k_indices) == min(k, self.num_live_docs)
+        assert top_k_scores.ndim == 1
+
+        return top_k_indices, top_k_scores
+
+    def _sparse_index(self) -> BM25Index:
+        """The BM25 index, built on first use for stores saved without one."""
+        if self._bm25 is None:
+            self._bm25 = BM25Index.from_documents(self.docs)
+        return self._bm25
+
+    def _sparse_top_k(
+        self, query: str, k: int, rows: np.ndarray = None, bm25_stats=None
+    ):
+        """
+        Rank the rows by BM25 relevance to a query.
+
+        Only the posting lists of the query terms are read, so rows that share no
+        term with the query are never scored and never returned.
+
+        Args:
+            query (str): Query string.
+            k (int): Number of rows to return.
+            rows (np.ndarray, optional): Rows allowed by a metadata filter.
+            bm25_stats (CorpusStats, optional): Statistics of the whole corpus the
+                store is a shard of.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Indices of the top-k rows, best first,
+            and their BM25 scores.
+        """
+        indices, scores = self._sparse_index().score(query, bm25_stats)
+
+        keep = np.ones(len(indices), dtype=bool)
+        if rows is not None:
+            keep &= np.isin(indices, rows, assume_unique=True)
+        if self._deleted is not None:
+            keep &= ~self._deleted[indices]
+        indices, scores = indices[keep], scores[keep]
+
+        k = min(k, len(indices))
+        positions = (
+            np.argpartition(-scores, k - 1)[:k] if 0 < k < len(indices) else np.arange(k)
+        )
+        positions = positions[np.argsort(-scores[positions], kind="stable")]
+        return indices[positions], scores[positions]
+
+    def _hybrid_top_k(
+        self,
+        query: np.ndarray,
+        query_text: str,
+        k: int,
+        nprobe: int = None,
+        rows: np.ndarray = None,
+        hybrid_weight: float = None,
+    ):
+        """
+        Fuse the dense and sparse rankings with reciprocal rank fusion.
+
+        A row ranked r in a ranking gains ``weight / (RRF_K + r)`` from it, where
+        the dense ranking has weight ``hybrid_weight`` and the sparse one the rest.
+
+        Args:
+            query (np.ndarray): Query embedding of shape (dim,).
+            query_text (str): Query string.
+            k (int): Number of rows to return.
+            nprobe (int, optional): Number of IVF clusters to scan.
+            rows (np.ndarray, optional): Rows allowed by a metadata filter.
+            hybrid_weight (float, optional): Weight of the dense ranking.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Indices of the top-k rows, best first,
+            and their fused scores.
+        """
+        weight = self.hybrid_weight if hybrid_weight is None else hybrid_weight
+        # Fuse deeper rankings than k so that rows ranked fairly well by both
+        # sides are not cut off by either of them.
+        fetch_k = max(4 * k, 50)
+
+        dense_indices, _ = self._dense_top_k(query, fetch_k, nprobe, rows)
+        sparse_indices, _ = self._sparse_top_k(query_text, fetch_k, rows)
+
+        indices, inverse = np.unique(
+            np.concatenate((dense_indices, sparse_indices)), return_inverse=True
+        )
+        contributions = np.concatenate(
+            (
+                weight / (RRF_K + 1 + np.arange(len(dense_indices))),
+                (1 - weight) / (RRF_K + 1 + np.arange(len(sparse_indices))),
+            )
+        )
+        scores = np.bincount(inverse, weights=contributions).astype(np.float32)
+
+        order = np.argsort(-scores, kind="stable")[:k]
+        return indices[order], scores[order]
+
+    def _vectors(self, indices: np.ndarray) -> np.ndarray:
+        """The unit-normalized float32 embeddings of rows."""
+        return np.asarray(self.__vectorstore[indices], dtype=np.float32)
+
+    @staticmethod
+    def _select_mmr(
+        query: np.ndarray, vectors: np.ndarray, k: int, mmr_lambda: float
+    ) -> np.ndarray:
+        """
+        Select k diverse candidates with maximal marginal relevance (MMR).
+
+        Candidates are picked greedily, each maximizing
+        ``mmr_lambda * sim(query, c) - (1 - mmr_lambda) * max(sim(c, selected))``
+        with cosine similarities. All pairwise similarities between the
+        candidates are computed with one matrix product.
+
+        Args:
+            query (np.ndarray): Query embedding of shape (dim,).
+            vectors (np.ndarray): Unit-normalized embeddings of the candidates,
+                best first, of shape (num_candidates, dim).
+            k (int): Number of candidates to select.
+            mmr_lambda (float): Trade-off between relevance (1) and diversity (0).
+
+        Returns:
+            np.ndarray: Positions of the selected candidates in ``vectors``, in
+            selection order.
+        """
+        k = min(k, len(vectors))
+        selected = np.empty(k, dtype=np.intp)
+        if k == 0:
+            return selected
+
+        relevance = vectors @ NeoStore._normalize_query(query)
+        pairwise = vectors @ vectors.T
+
+        # The first pick is the most relevant candidate.
+        selected[0] = np.argmax(relevance)
+        redundancy = pairwise[selected[0]].copy()
+        available = np.ones(len(vectors), dtype=bool)
+        available[selected[0]] = False
+
+        for i in range(1, k):
+            scores = mmr_lambda * relevance - (1 - mmr_lambda) * redundancy
+            scores[~available] = -np.inf
+            selected[i] = np.argmax(scores)
+            available[selected[i]] = False
+            np.maximum(redundancy, pairwise[selected[i]], out=redundancy)
+
+        return selected
+
+    def _rank(
+        self,
+        query: np.ndarray,
+        k: int,
+        nprobe: int = None,
+        rows: np.ndarray = None,
+        query_text: str = None,
+        mode=None,
+        hybrid_weight: float = None,
+        bm25_stats=None,
+    ):
+        """
+        Rank the rows by dense, sparse or hybrid relevance to a query.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Indices of the top-k rows, best first,
+            and their scores.
+        """
+        mode = self.search_mode if mode is None else NeoSearchMode(mode)
+        if mode == NeoSearchMode.SPARSE:
+            return self._sparse_top_k(query_text, k, rows, bm25_stats)
+        if mode == NeoSearchMode.HYBRID:
+            return self._hybrid_top_k(query, query_text, k, nprobe, rows, hybrid_weight)
+        return self._dense_top_k(query, k, nprobe, rows)
+
+    def _get_top_k(
+        self,
+        query: np.ndarray,
+        k: int,
+        nprobe: int = None,
+        rows: np.ndarray = None,
+        query_text: str = None,
+        mode=None,
+        hybrid_weight: float = None,
+        mmr_lambda: float = None,
+        fetch_k: int = None,
+        bm25_stats=None,
+    ):
+        # With MMR, the top fetch_k candidates are diversified down to k.
+        num_candidates = k if mmr_lambda is None else max(k, fetch_k or 4 * k)
+        top_k_indices, top_k_scores = self._rank(
+            query, num_candidates, nprobe, rows, query_text, mode, hybrid_weight, bm25_stats
+        )
+
+        if mmr_lambda is not None:
+            selected = self._select_mmr(
+                query, self._vectors(top_k_indices), k, mmr_lambda
+            )
+            top_k_indices, top_k_scores = top_k_indices[selected], top_k_scores[selected]
+
+        top_k_docs = self._to_documents(top_k_indices, top_k_scores)
+
         # Ensure we return exactly k documents if possible
         if len(top_k_docs) < k:
             print(f"Warning: Only {len(top_k_docs)} documents found, less than k={k}")
 
-        assert len(top_k_docs) == min(k, len(self.docs))
-        assert top_k_scores.ndim == 1
-
         return top_k_docs
 
     def build_store(
@@ -128,74 +854,460 @@ class NeoStore:
         Returns:
             np.ndarray: Array of embeddings.
         """
-        embeddings = []
         self.docs = docs
+        self._metadata = MetadataIndex.from_documents(docs)
+        self._deleted = None
+        self.path = None
 
-        num_docs = len(docs)
-        num_batches = (num_docs + batch_size - 1) // batch_size
+        embeddings = self._encode(docs, batch_size, "Building Vector Store...")
+        self._set_vectors(embeddings)
+        self._train_indexes()
+        self._bm25 = BM25Index.from_documents(docs) if self.bm25 else None
 
-        with Progress(
+        if persist:
+            self.save_embeddings(embeddings_path)
+
+        return embeddings
+
+    def build_store_streaming(
+        self,
+        docs,
+        batch_size: int = 32,
+        embeddings_path: str = Settings.VECTOR_STORE_DIR,
+        block_size: int = 4096,
+    ) -> None:
+        """
+        Build and persist the store from a stream of documents with bounded memory.
+
+        Documents are consumed ``block_size`` at a time. Every block is embedded
+        and its vectors, documents and metadata columns are appended to the files
+        of the new store directory, and its BM25 postings are spilled to sorted
+        runs merged once all documents are written. Neither the documents, the
+        embeddings nor the postings of the whole corpus are held in memory. The
+        IVF index and the quantizer are then trained on the memory-mapped
+        vectors. The built store is opened memory-mapped.
+
+        Args:
+            docs (Iterable[Document]): Documents in store order, e.g. from
+                ``DirectoryLoader.lazy_load_chunks``.
+            batch_size (int): Batch size for processing documents.
+            embeddings_path (str): Path of the store directory, or of its parent
+                directory when it ends with a path separator.
+            block_size (int): Number of documents embedded and written at once.
+        """
+        path = self._resolve_store_path(embeddings_path)
+        tmp_path = f"{path}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        vectors_path = os.path.join(tmp_path, "vectors.npy")
+        norms_path = os.path.join(tmp_path, "norms.npy")
+        offsets_path = os.path.join(tmp_path, "docs_offsets.npy")
+        np.save(offsets_path, np.zeros(1, dtype=np.int64))
+
+        self._metadata = MetadataIndex()
+        self._deleted = None
+        self.path = None
+        num_docs = 0
+        docs = iter(docs)
+        bm25 = BM25Writer(tmp_path) if self.bm25 else None
+
+        encoder = (
+            ParallelEncoder(self._embeddings_model, self.encode_workers)
+            if self.encode_workers
+            else None
+        )
+        with open(os.path.join(tmp_path, "docs.jsonl"), "wb") as f, Progress(
             expand=True,
-        ) as progress:
-            task = progress.add_task("Building Vector Store...", total=num_docs)
-
-            for i in range(num_batches):
-                start = i * batch_size
-                end = min(start + batch_size, num_docs)
-                batch_docs = docs[start:end]
-                batch_embeddings = self.embeddings_model.encode(
-                    [doc.content for doc in batch_docs]
+        ) as progress, encoder or nullcontext():
+            task = progress.add_task("Building Vector Store...", total=None)
+
+            while block := list(islice(docs, block_size)):
+                embeddings = self._embed_documents(
+                    block, batch_size, progress, task, encoder
                 )
-                embeddings.extend(batch_embeddings)
+                norms = np.linalg.norm(embeddings, axis=1).astype(np.float32)
+                vectors = embeddings / np.where(norms > 0, norms, 1.0)[:, None]
 
-                progress.update(task, advance=len(batch_docs))
+                if num_docs:
+                    append_npy(vectors_path, vectors)
+                    append_npy(norms_path, norms)
+                else:
+                    np.save(vectors_path, vectors)
+                    np.save(norms_path, norms)
+                append_npy(
+                    offsets_path,
+                    np.array(DocStore._write_records(f, block), np.int64),
+                )
+                self._metadata.add(doc.metadata for doc in block)
+                self._metadata.spill(tmp_path)
+                if bm25 is not None:
+                    bm25.add(block)
+                num_docs += len(block)
 
-        self.__vectorstore = np.array(embeddings)
+        if not num_docs:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise ValueError("No documents to build the vector store from.")
 
-        if persist:
-            self.save_embeddings(embeddings_path)
+        self._set_normalized(
+            np.load(vectors_path, mmap_mode="r"), np.load(norms_path)
+        )
+        self.docs = DocStore(tmp_path)
+        self._train_indexes()
+        self._bm25 = bm25.close() if bm25 is not None else None
 
-        return self.__vectorstore
+        self._write_indexes(tmp_path, postings=False)
+        self._swap_in(tmp_path, path)
+        self._mmap_mode = "r"
+        self._open(path)
 
-    def save_embeddings(self, path: str):
+    def _train_indexes(self):
+        """Train the IVF index and the quantizer over the store's vectors."""
+        self._ivf = (
+            IVFIndex.train(self.__vectorstore, self.nlist)
+            if self.index_type == NeoIndex.IVF
+            else None
+        )
+
+        self._quantizer = None
+        if self.quantization == NeoQuantization.INT8:
+            self._quantizer = ScalarQuantizer.train(self.__vectorstore)
+        elif self.quantization == NeoQuantization.PQ:
+            self._quantizer = ProductQuantizer.train(
+                self.__vectorstore, self.pq_subvectors
+            )
+
+    def _encode(
+        self, docs: list[Document], batch_size: int, description: str
+    ) -> np.ndarray:
         """
-        Save the vector store embeddings and associated documents to an .npz file.
+        Embed documents in batches with a rich progress bar.
+
+        Documents whose content is in the embedding cache are not encoded, and
+        documents sharing the same content are encoded once. With
+        ``encode_workers``, batches are encoded by a pool of worker processes
+        while the finished ones are collected.
 
         Args:
-            path (str): Path to save the embeddings and documents.
-        """
-        if not path.endswith(".npz"):
-            path += "neostore.npz"
-        if self.__vectorstore is not None:
-            docs = [(doc.content, doc.metadata) for doc in self.docs]
+            docs (List[Document]): Documents to embed.
+            batch_size (int): Batch size for processing documents.
+            description (str): Progress bar description.
 
-            np.savez(
-                path,
-                embeddings=self.__vectorstore,
-                docs=docs,
+        Returns:
+            np.ndarray: float32 embeddings of shape (num_docs, dim).
+        """
+        with Progress(
+            expand=True,
+        ) as progress:
+            task = progress.add_task(description, total=len(docs))
+            encoder = (
+                ParallelEncoder(self._embeddings_model, self.encode_workers)
+                if self.encode_workers and len(docs) > batch_size
+                else None
             )
+            return self._embed_documents(docs, batch_size, progress, task, encoder)
+
+    def _embed_documents(
+        self,
+        docs: list[Document],
+        batch_size: int,
+        progress: Progress,
+        task,
+        encoder: ParallelEncoder = None,
+    ) -> np.ndarray:
+        """
+        Embed documents through the embedding cache, advancing a progress task.
+
+        Args:
+            docs (List[Document]): Documents to embed.
+            batch_size (int): Batch size for processing documents.
+            progress (Progress): Progress bar to advance.
+            task (TaskID): Progress task advanced by every embedded document.
+            encoder (ParallelEncoder, optional): Pool encoding the batches.
+                Defaults to encoding in-process.
+
+        Returns:
+            np.ndarray: float32 embeddings of shape (num_docs, dim).
+        """
+        contents = [doc.content for doc in docs]
+        num_docs = len(contents)
+        model_name = self.embedding_model_name
+        cache = self.embedding_cache if model_name is not None else None
+
+        keys = [content_hash(content) for content in contents]
+        cached = cache.get(model_name, keys) if cache is not None else {}
+
+        # Positions of the documents to encode, grouped by content.
+        misses = {}
+        for idx, key in enumerate(keys):
+            if key not in cached:
+                misses.setdefault(key, []).append(idx)
+        miss_keys = list(misses)
+
+        embeddings = [cached.get(key) for key in keys]
+        progress.update(task, advance=num_docs - sum(map(len, misses.values())))
+
+        key_batches = [
+            miss_keys[start : start + batch_size]
+            for start in range(0, len(miss_keys), batch_size)
+        ]
+        text_batches = (
+            [contents[misses[key][0]] for key in batch_keys]
+            for batch_keys in key_batches
+        )
+        if encoder is not None and len(key_batches) > 1:
+            encoded = encoder.encode(text_batches)
         else:
+            encoded = (self.embeddings_model.encode(texts) for texts in text_batches)
+
+        for batch_embeddings, batch_keys in zip(encoded, key_batches):
+            for key, embedding in zip(batch_keys, batch_embeddings):
+                for idx in misses[key]:
+                    embeddings[idx] = embedding
+
+            # Cache every batch so an interrupted build keeps its progress.
+            if cache is not None:
+                cache.put(model_name, batch_keys, batch_embeddings)
+
+            progress.update(task, advance=sum(len(misses[key]) for key in batch_keys))
+
+        if cache is not None and misses:
+            cache.evict()
+
+        return np.array(embeddings, dtype=np.float32)
+
+    @staticmethod
+    def _resolve_store_path(path: str) -> str:
+        """
+        Resolve the store directory for a path.
+
+        A path ending with a separator, such as ``Settings.VECTOR_STORE_DIR``, is a
+        parent directory and the store lives in its ``neostore`` subdirectory.
+        Any other path is the store directory itself.
+        """
+        if path.endswith(("/", os.sep)):
+            return os.path.join(path, STORE_NAME)
+        return path
+
+    def save_embeddings(self, path: str):
+        """
+        Save the vector store to a versioned store directory.
+
+        The directory holds a ``manifest.json``, the unit-normalized embeddings in
+        ``vectors.npy``, their norms in ``norms.npy`` and the documents in an
+        offset-indexed ``docs.jsonl`` sidecar. Nothing is pickled. The store is
+        written next to the target and swapped in once complete.
+
+        Args:
+            path (str): Path of the store directory, or of its parent directory
+                when it ends with a path separator.
+        """
+        if self.__vectorstore is None:
             raise ValueError("Vector store is empty. Build the store first.")
 
+        path = self._resolve_store_path(path)
+        tmp_path = f"{path}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+
+        np.save(os.path.join(tmp_path, "vectors.npy"), self.__vectorstore)
+        np.save(os.path.join(tmp_path, "norms.npy"), self._norms)
+        DocStore.write(tmp_path, self.docs)
+        self._write_indexes(tmp_path)
+        self._swap_in(tmp_path, path)
+
+        self.path = path
+
+    def _write_indexes(self, path: str, postings: bool = True):
+        """
+        Write the indexes, tombstones and manifest of the store into a directory.
+
+        Args:
+            path (str): Path to the store directory.
+            postings (bool): Whether to write the BM25 index and the metadata
+                columns, False when they were written into the directory already.
+        """
+        if self._ivf is not None:
+            self._ivf.save(path)
+        if self._quantizer is not None:
+            self._quantizer.save(path)
+        if postings:
+            if self._bm25 is not None:
+                self._bm25.save(path)
+            self._metadata.save(path)
+        np.save(
+            os.path.join(path, "tombstones.npy"),
+            np.flatnonzero(self._deleted)
+            if self._deleted is not None
+            else np.empty(0, dtype=np.int64),
+        )
+        self._write_manifest(path)
+
+    @staticmethod
+    def _swap_in(tmp_path: str, path: str):
+        """Replace the store directory at ``path`` with the one written at ``tmp_path``."""
+        old_path = f"{path}.old"
+        # Readers that still map the previous files keep a valid view of them.
+        shutil.rmtree(old_path, ignore_errors=True)
+        if os.path.exists(path):
+            os.rename(path, old_path)
+        os.rename(tmp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+
+    def _write_manifest(self, path: str):
+        manifest = {
+            "format": STORE_NAME,
+            "version": STORE_FORMAT_VERSION,
+            "num_docs": int(self.__vectorstore.shape[0]),
+            "num_deleted": self.__vectorstore.shape[0] - self.num_live_docs,
+            "dim": int(self.__vectorstore.shape[1]),
+            "index": (NeoIndex.IVF if self._ivf is not None else NeoIndex.FLAT).value,
+            "quantization": (
+                self._quantizer.name
+                if self._quantizer is not None
+                else NeoQuantization.NONE.value
+            ),
+            "bm25": self._bm25 is not None,
+        }
+        with open(os.path.join(path, "manifest.json"), "w") as f:
+            json.dump(manifest, f, indent=4)
+
     @classmethod
     def load_embeddings(
         cls,
         path: str,
-        embedder: SentenceTransformer = None,
+        embedder: "SentenceTransformer" = None,
         similarity_metric=NeoMetric.COSINE,
+        mmap_mode: str = "r",
+        index_type=None,
+        nprobe: int = 8,
+        rerank_factor: int = None,
+        search_mode=NeoSearchMode.DENSE,
+        hybrid_weight: float = 0.5,
+        **store_kwargs,
     ):
         """
-        Load the vector store embeddings and associated documents from an .npz file.
+        Load the vector store from a store directory.
+
+        The embedding matrix is memory-mapped, so loading is near-instant and the
+        pages are shared between processes through the page cache. Documents are
+        only decoded when they are returned by a search. Stores saved as a legacy
+        ``.npz`` file are still loaded, which requires unpickling their documents.
 
         Args:
-            path (str): Path to load the embeddings and documents.
+            path (str): Path of the store directory, or of its parent directory
+                when it ends with a path separator.
             embedder (SentenceTransformer, optional): SentenceTransformer model for embeddings.
             similarity_metric (NeoMetric, optional): Similarity metric to use.
+            mmap_mode (str, optional): Memory-map mode for the embeddings, or None
+                to read them into memory.
+            index_type (NeoIndex, optional): Index to search with. Defaults to the
+                index the store was saved with.
+            nprobe (int, optional): Number of IVF clusters scanned per query.
+            rerank_factor (int, optional): Number of candidates per result that
+                are reranked exactly when the store is quantized.
+            search_mode (NeoSearchMode, optional): Default retrieval mode of ``search``.
+            hybrid_weight (float, optional): Weight of the dense ranking in hybrid search.
+            **store_kwargs: Other options of the NeoStore, such as ``embedding_cache``
+                or ``encode_workers``. The quantization is the one the store was
+                saved with.
 
         Returns:
             NeoStore: Loaded NeoStore instance with embeddings and documents.
         """
+        store_path = cls._resolve_store_path(path)
+        legacy_path = path if path.endswith(".npz") else f"{store_path}.npz"
+
+        if not os.path.isdir(store_path) and os.path.isfile(legacy_path):
+            store = cls._load_legacy_embeddings(
+                legacy_path, embedder, similarity_metric, **store_kwargs
+            )
+            store.search_mode = NeoSearchMode(search_mode)
+            store.hybrid_weight = hybrid_weight
+            return store
+
+        with open(os.path.join(store_path, "manifest.json")) as f:
+            manifest = json.load(f)
+
+        if manifest.get("format") != STORE_NAME:
+            raise ValueError(f"{store_path} is not a NeoStore directory.")
+        if manifest.get("version", 0) > STORE_FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported NeoStore format version {manifest['version']}. "
+                f"This version of NeoGPT supports up to {STORE_FORMAT_VERSION}."
+            )
+
+        if index_type is None:
+            index_type = NeoIndex(manifest.get("index", NeoIndex.FLAT.value))
+
+        store = cls(
+            embedder,
+            similarity_metric,
+            index_type=index_type,
+            nprobe=nprobe,
+            quantization=NeoQuantization(
+                manifest.get("quantization", NeoQuantization.NONE.value)
+            ),
+            rerank_factor=rerank_factor,
+            search_mode=search_mode,
+            hybrid_weight=hybrid_weight,
+            **store_kwargs,
+        )
+        store._mmap_mode = mmap_mode
+        store._open(store_path)
+
+        if index_type == NeoIndex.IVF and store._ivf is None:
+            raise ValueError(f"{store_path} has no IVF index. Rebuild the store.")
+
+        return store
+
+    def _open(self, path: str):
+        """
+        Map the vectors, documents, tombstones and index of a store directory.
+
+        Args:
+            path (str): Path to the store directory.
+        """
+        self._set_normalized(
+            np.load(os.path.join(path, "vectors.npy"), mmap_mode=self._mmap_mode),
+            np.load(os.path.join(path, "norms.npy")),
+        )
+        self.docs = DocStore(path)
+        # Stores saved before metadata columns existed are indexed on load.
+        self._metadata = MetadataIndex.load(path) or MetadataIndex.from_documents(
+            self.docs
+        )
+        self._ivf = IVFIndex.load(path) if self.index_type == NeoIndex.IVF else None
+        self._quantizer = (
+            QUANTIZER_MAP[self.quantization.value].load(path)
+            if self.quantization != NeoQuantization.NONE
+            else None
+        )
+        # Stores saved without a BM25 index build one on their first keyword search.
+        self._bm25 = BM25Index.load(path, self._mmap_mode)
+
+        self._deleted = None
+        tombstones_path = os.path.join(path, "tombstones.npy")
+        if os.path.isfile(tombstones_path):
+            deleted_rows = np.load(tombstones_path)
+            if len(deleted_rows):
+                self._deleted = np.zeros(self.__vectorstore.shape[0], dtype=bool)
+                self._deleted[deleted_rows] = True
+
+        self.path = path
+
+    @classmethod
+    def _load_legacy_embeddings(
+        cls,
+        path: str,
+        embedder: "SentenceTransformer" = None,
+        similarity_metric=NeoMetric.COSINE,
+        **store_kwargs,
+    ):
+        """
+        Load a store saved as an ``.npz`` file with pickled documents.
 
+        Save the returned store again to migrate it to the store directory format.
+        """
         data = np.load(path, allow_pickle=True)
 
         if isinstance(data, np.lib.npyio.NpzFile):
@@ -211,24 +1323,469 @@ class NeoStore:
             embeddings = data
             docs = []
 
-        store = cls(embedder, similarity_metric)
-        store.__vectorstore = embeddings
+        store = cls(embedder, similarity_metric, **store_kwargs)
+        store._set_vectors(embeddings)
         store.docs = docs  # Set the loaded documents to the store
+        store._metadata = MetadataIndex.from_documents(docs)
 
         return store
 
-    def search(self, query: str, k: int = 5) -> list[Document]:
+    def add_documents(self, docs: list[Document], batch_size: int = 32) -> None:
+        """
+        Embed and add documents to the store without rebuilding it.
+
+        When the store has a store directory, the new rows are appended to its
+        files in place instead of rewriting them.
+
+        Args:
+            docs (List[Document]): Documents to add.
+            batch_size (int): Batch size for processing documents.
+        """
+        if not docs:
+            return
+        if self.__vectorstore is None:
+            self.build_store(docs, batch_size)
+            return
+
+        embeddings = self._encode(docs, batch_size, "Adding Documents...")
+        norms = np.linalg.norm(embeddings, axis=1).astype(np.float32)
+        vectors = embeddings / np.where(norms > 0, norms, 1.0)[:, None]
+        num_docs = self.__vectorstore.shape[0]
+
+        if self._ivf is not None:
+            self._ivf = IVFIndex(
+                self._ivf.centroids,
+                np.concatenate((self._ivf.assignments, self._ivf.assign(vectors))),
+            )
+        if self._quantizer is not None:
+            self._quantizer.codes = np.concatenate(
+                (self._quantizer.codes, self._quantizer.encode(vectors))
+            )
+        if self._deleted is not None:
+            self._deleted = np.concatenate(
+                (self._deleted, np.zeros(len(docs), dtype=bool))
+            )
+        self._metadata.add(doc.metadata for doc in docs)
+        # The BM25 delta is merged once it holds a fraction of the documents
+        # above the compaction threshold, which bounds its size.
+        merge_bm25 = False
+        if self._bm25 is not None:
+            self._bm25.add(docs)
+            merge_bm25 = (
+                len(self._bm25.delta.doc_lengths)
+                > self.compaction_threshold * self._bm25.num_docs
+            )
+
+        if self.path is None:
+            if merge_bm25:
+                self._bm25.merge()
+            self.docs = [*self.docs, *docs]
+            self._set_normalized(
+                np.concatenate((self.__vectorstore, vectors)),
+                np.concatenate((self._norms, norms)),
+            )
+            return
+
+        DocStore.append(self.path, docs)
+        append_npy(os.path.join(self.path, "vectors.npy"), vectors)
+        append_npy(os.path.join(self.path, "norms.npy"), norms)
+        if self._ivf is not None:
+            append_npy(
+                os.path.join(self.path, "ivf_assignments.npy"),
+                self._ivf.assignments[num_docs:],
+            )
+        if self._quantizer is not None:
+            append_npy(
+                os.path.join(self.path, "quant_codes.npy"),
+                self._quantizer.codes[num_docs:],
+            )
+        self._metadata.save(self.path, start=num_docs)
+        if merge_bm25:
+            self._bm25 = self._bm25.take(np.arange(self._bm25.num_docs), self.path)
+        elif self._bm25 is not None:
+            self._bm25.save(self.path, start=num_docs)
+
+        if isinstance(self.__vectorstore, np.memmap):
+            self._open(self.path)
+        else:
+            self.docs = DocStore(self.path)
+            self._set_normalized(
+                np.concatenate((self.__vectorstore, vectors)),
+                np.concatenate((self._norms, norms)),
+            )
+        self._write_manifest(self.path)
+
+    def _match_rows(self, where: dict) -> np.ndarray:
+        """
+        Get the live rows whose metadata matches a filter.
+
+        Args:
+            where (dict): Metadata filter, see ``MetadataIndex``.
+
+        Returns:
+            np.ndarray: Sorted row ids.
+        """
+        rows = self._metadata.rows(where)
+        if self._deleted is None:
+            return rows
+        return rows[~self._deleted[rows]]
+
+    def delete_where(self, **where) -> int:
+        """
+        Delete the documents whose metadata matches all the given values.
+
+        Deleted rows are tombstoned and skipped by searches. Once the fraction of
+        deleted rows exceeds ``compaction_threshold`` the store is compacted.
+
+        Example:
+            store.delete_where(file_path="/path/to/file.txt")
+            store.delete_where(file_path={"$prefix": "/path/to/folder/"})
+
+        Args:
+            **where: Metadata filter, see ``MetadataIndex``.
+
+        Returns:
+            int: Number of deleted documents.
+        """
+        if self.__vectorstore is None or not where:
+            return 0
+
+        rows = self._match_rows(where)
+        if len(rows) == 0:
+            return 0
+
+        if self._deleted is None:
+            self._deleted = np.zeros(self.__vectorstore.shape[0], dtype=bool)
+        self._deleted[rows] = True
+        self._bump_generation()
+
+        if self.path is not None:
+            append_npy(os.path.join(self.path, "tombstones.npy"), rows)
+            self._write_manifest(self.path)
+
+        num_docs = self.__vectorstore.shape[0]
+        if (num_docs - self.num_live_docs) / num_docs > self.compaction_threshold:
+            self.compact()
+
+        return len(rows)
+
+    def upsert(self, docs: list[Document], batch_size: int = 32) -> None:
+        """
+        Replace the documents of every file in ``docs`` with ``docs``.
+
+        All existing chunks sharing a ``file_path`` with one of the given
+        documents are deleted before the documents are added.
+
+        Args:
+            docs (List[Document]): Documents to insert or update.
+            batch_size (int): Batch size for processing documents.
+        """
+        for file_path in dict.fromkeys(doc.metadata.get("file_path") for doc in docs):
+            self.delete_where(file_path=file_path)
+
+        self.add_documents(docs, batch_size)
+
+    def compact(self, block_size: int = 4096) -> None:
+        """
+        Drop the deleted rows from the embedding matrix and documents, and merge
+        the documents added since the BM25 index was built into it.
+
+        When the store has a store directory, it is rewritten without them
+        ``block_size`` rows at a time, so the documents and vectors of the whole
+        store are never held in memory.
+
+        Args:
+            block_size (int): Number of rows copied at once.
+        """
+        if self._deleted is None and (self._bm25 is None or self._bm25.delta is None):
+            return
+
+        live_rows = (
+            np.arange(self.__vectorstore.shape[0])
+            if self._deleted is None
+            else np.flatnonzero(~self._deleted)
+        )
+        if self.path is not None:
+            self._rewrite_store(live_rows, block_size)
+            return
+
+        self.docs = [self.docs[idx] for idx in live_rows]
+        self._set_normalized(
+            np.ascontiguousarray(self.__vectorstore[live_rows]), self._norms[live_rows]
+        )
+        if self._ivf is not None:
+            self._ivf = IVFIndex(self._ivf.centroids, self._ivf.assignments[live_rows])
+        if self._quantizer is not None:
+            self._quantizer.codes = self._quantizer.codes[live_rows]
+        self._metadata = self._metadata.take(live_rows)
+        if self._bm25 is not None:
+            self._bm25 = self._bm25.take(live_rows)
+        self._deleted = None
+
+    def _rewrite_store(self, rows: np.ndarray, block_size: int) -> None:
+        """
+        Rewrite the store directory with the given rows only, a block at a time.
+
+        Args:
+            rows (np.ndarray): Sorted row ids to keep.
+            block_size (int): Number of rows copied at once.
+        """
+        tmp_path = f"{self.path}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        offsets_path = os.path.join(tmp_path, "docs_offsets.npy")
+        np.save(offsets_path, np.zeros(1, dtype=np.int64))
+
+        vectors = np.lib.format.open_memmap(
+            os.path.join(tmp_path, "vectors.npy"),
+            mode="w+",
+            dtype=np.float32,
+            shape=(len(rows), self.__vectorstore.shape[1]),
+        )
+        with open(os.path.join(tmp_path, "docs.jsonl"), "wb") as f:
+            for start in range(0, len(rows), block_size):
+                block = rows[start : start + block_size]
+                vectors[start : start + len(block)] = self.__vectorstore[block]
+                append_npy(
+                    offsets_path,
+                    np.array(
+                        DocStore._write_records(f, (self.docs[idx] for idx in block)),
+                        np.int64,
+                    ),
+                )
+        vectors.flush()
+        np.save(os.path.join(tmp_path, "norms.npy"), self._norms[rows])
+
+        if self._ivf is not None:
+            self._ivf = IVFIndex(self._ivf.centroids, self._ivf.assignments[rows])
+        if self._quantizer is not None:
+            self._quantizer.codes = self._quantizer.codes[rows]
+        self._metadata = self._metadata.take(rows)
+        self._metadata.save(tmp_path)
+        if self._bm25 is not None:
+            self._bm25 = self._bm25.take(rows, tmp_path)
+        self._deleted = None
+        self._set_normalized(vectors, self._norms[rows])
+
+        self._write_indexes(tmp_path, postings=False)
+        self._swap_in(tmp_path, self.path)
+        self._open(self.path)
+
+    def search(
+        self,
+        query: str,
+        k: int = 5,
+        nprobe: int = None,
+        where: dict = None,
+        mode=None,
+        hybrid_weight: float = None,
+        mmr_lambda: float = None,
+        fetch_k: int = None,
+    ) -> list[Document]:
         """
         Search for top-k documents similar to a given query.
 
+        Query embeddings and results are kept in LRU caches, see ``cache_stats``.
+        Cached results are dropped whenever the store content changes.
+
         Args:
             query (str): Query string.
             k (int): Number of top-k documents to retrieve.
+            nprobe (int, optional): Number of IVF clusters to scan, overriding the
+                store default. Ignored by flat search.
+            where (dict, optional): Metadata filter, e.g. ``{"file_path": path}``.
+                Rows it excludes are never scored. See ``MetadataIndex``.
+            mode (NeoSearchMode, optional): Dense, sparse (BM25) or hybrid
+                retrieval, overriding the store default. Sparse search does not
+                embed the query.
+            hybrid_weight (float, optional): Weight of the dense ranking in hybrid
+                search, overriding the store default.
+            mmr_lambda (float, optional): Enables maximal marginal relevance: the
+                k results are picked among the top ``fetch_k`` to trade relevance
+                (1) for diversity (0), so overlapping chunks of one passage are
+                not all returned. 0.5 is a common choice.
+            fetch_k (int, optional): Number of MMR candidates. Defaults to 4 * k.
 
         Returns:
             List[Document]: List of top-k documents with content and metadata.
+            Hybrid scores are reciprocal rank fusion scores.
+        """
+        assert k >= 1, f"K should be greater than 0. Got: {k}"
+        mode = self.search_mode if mode is None else NeoSearchMode(mode)
+        # Results are keyed by the resolved options, so changing a store default
+        # such as nprobe or rerank_factor never returns stale results.
+        key = (
+            self.generation,
+            query,
+            k,
+            self.nprobe if nprobe is None else nprobe,
+            json.dumps(where, sort_keys=True, default=str) if where else None,
+            mode,
+            self.hybrid_weight if hybrid_weight is None else hybrid_weight,
+            self.rerank_factor,
+            mmr_lambda,
+            fetch_k,
+        )
+
+        results = self._results.get(key)
+        if results is None:
+            query_embedding = (
+                None
+                if mode == NeoSearchMode.SPARSE and mmr_lambda is None
+                else self._embed_queries([query])[0]
+            )
+            results = self._get_top_k(
+                query_embedding,
+                k,
+                nprobe,
+                self._filter_rows(where),
+                query_text=query,
+                mode=mode,
+                hybrid_weight=hybrid_weight,
+                mmr_lambda=mmr_lambda,
+                fetch_k=fetch_k,
+            )
+            self._results.put(key, results)
+
+        # Callers own the returned metadata, so the cached documents are copied.
+        return [Document(doc.content, doc.metadata.copy()) for doc in results]
+
+    def _embed_queries(self, queries: list[str]) -> np.ndarray:
+        """
+        Embed queries, reusing the cached embeddings of repeated queries.
+
+        Args:
+            queries (List[str]): Query strings.
+
+        Returns:
+            np.ndarray: float32 query embeddings of shape (num_queries, dim).
+        """
+        return embed_queries(
+            queries, self._query_embeddings, lambda misses: self.embeddings_model.encode(misses)
+        )
+
+    def search_batch(
+        self,
+        queries: list[str],
+        k: int = 5,
+        batch_size: int = 64,
+        nprobe: int = None,
+        where: dict = None,
+        mode=None,
+        hybrid_weight: float = None,
+        mmr_lambda: float = None,
+        fetch_k: int = None,
+    ) -> list[list[Document]]:
+        """
+        Search for the top-k documents of many queries at once.
+
+        The queries are encoded together, reusing cached query embeddings, and
+        every block of ``batch_size`` queries is scored against the store with a
+        single matrix product. Batch results are not cached.
+
+        Args:
+            queries (List[str]): Query strings.
+            k (int): Number of top-k documents to retrieve per query.
+            batch_size (int): Number of queries scored per matrix product.
+            nprobe (int, optional): Number of IVF clusters to scan per query. IVF
+                and quantized queries score different candidate rows and are
+                scored one at a time.
+            where (dict, optional): Metadata filter applied to every query.
+            mode (NeoSearchMode, optional): Dense, sparse or hybrid retrieval.
+                Sparse and hybrid queries are ranked one at a time.
+            hybrid_weight (float, optional): Weight of the dense ranking in hybrid search.
+            mmr_lambda (float, optional): Enables maximal marginal relevance, see
+                ``search``. MMR queries are ranked one at a time.
+            fetch_k (int, optional): Number of MMR candidates. Defaults to 4 * k.
+
+        Returns:
+            List[List[Document]]: Top-k documents for each query, in input order.
         """
-        assert self.embeddings_model is not None
         assert k >= 1, f"K should be greater than 0. Got: {k}"
-        query_embedding = self.embeddings_model.encode([query])
-        return self._get_top_k(query_embedding[0], k)
+        assert batch_size >= 1, f"Batch size should be greater than 0. Got: {batch_size}"
+
+        queries = list(queries)
+        mode = self.search_mode if mode is None else NeoSearchMode(mode)
+        query_embeddings = (
+            None
+            if mode == NeoSearchMode.SPARSE and mmr_lambda is None
+            else self._embed_queries(queries)
+        )
+        return self._get_top_k_batch(
+            query_embeddings,
+            k,
+            batch_size,
+            nprobe,
+            where,
+            queries,
+            mode,
+            hybrid_weight,
+            mmr_lambda,
+            fetch_k,
+        )
+
+    def _get_top_k_batch(
+        self,
+        query_embeddings: np.ndarray,
+        k: int,
+        batch_size: int = 64,
+        nprobe: int = None,
+        where: dict = None,
+        queries: list[str] = None,
+        mode=None,
+        hybrid_weight: float = None,
+        mmr_lambda: float = None,
+        fetch_k: int = None,
+        bm25_stats: list = None,
+    ) -> list[list[Document]]:
+        rows = self._filter_rows(where)
+        mode = self.search_mode if mode is None else NeoSearchMode(mode)
+
+        if mode != NeoSearchMode.DENSE or mmr_lambda is not None:
+            if query_embeddings is None:
+                query_embeddings = [None] * len(queries)
+            if queries is None:
+                queries = [None] * len(query_embeddings)
+            if bm25_stats is None:
+                bm25_stats = [None] * len(queries)
+            return [
+                self._get_top_k(
+                    query_embedding,
+                    k,
+                    nprobe,
+                    rows,
+                    query_text,
+                    mode,
+                    hybrid_weight,
+                    mmr_lambda,
+                    fetch_k,
+                    stats,
+                )
+                for query_embedding, query_text, stats in zip(
+                    query_embeddings, queries, bm25_stats
+                )
+            ]
+
+        if self._ivf is not None or self._quantizer is not None:
+            return [
+                self._get_top_k(query_embedding, k, nprobe, rows, mode=mode)
+                for query_embedding in query_embeddings
+            ]
+
+        results = []
+        for start in range(0, len(query_embeddings), batch_size):
+            scores = self._similarity_function(
+                query_embeddings[start : start + batch_size], rows
+            )
+            deleted = self._exclude_deleted(scores, rows)
+            top_k_positions = self._select_top_k(scores, k)
+            top_k_scores = np.take_along_axis(scores, top_k_positions, axis=-1)
+
+            for positions, row_scores in zip(top_k_positions, top_k_scores):
+                if deleted is not None:
+                    live = ~deleted[positions]
+                    positions, row_scores = positions[live], row_scores[live]
+                indices = positions if rows is None else rows[positions]
+                results.append(self._to_documents(indices, row_scores))
+
+        return results
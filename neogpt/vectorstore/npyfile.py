@@ -0,0 +1,50 @@
+import os
+
+import numpy as np
+
+
+def append_npy(path: str, rows: np.ndarray) -> None:
+    """
+    Append rows to a C-ordered ``.npy`` file in place.
+
+    The rows are written after the existing data and the shape in the header is
+    updated. numpy pads ``.npy`` headers so that the first dimension can grow
+    without moving the data; the file is rewritten only when it cannot.
+
+    Args:
+        path (str): Path to the ``.npy`` file.
+        rows (np.ndarray): Rows to append, matching the file's dtype and row shape.
+    """
+    with open(path, "r+b") as f:
+        version = np.lib.format.read_magic(f)
+        read_header = (
+            np.lib.format.read_array_header_1_0
+            if version == (1, 0)
+            else np.lib.format.read_array_header_2_0
+        )
+        shape, fortran_order, dtype = read_header(f)
+        data_offset = f.tell()
+
+        rows = np.ascontiguousarray(rows, dtype=dtype)
+        if fortran_order or rows.shape[1:] != shape[1:]:
+            raise ValueError(f"Cannot append rows of shape {rows.shape} to {path}.")
+
+        new_shape = (shape[0] + rows.shape[0], *shape[1:])
+        header = repr(
+            {
+                "descr": np.lib.format.dtype_to_descr(dtype),
+                "fortran_order": False,
+                "shape": new_shape,
+            }
+        )
+        prefix_length = 10 if version == (1, 0) else 12
+        padding = data_offset - prefix_length - len(header) - 1
+
+        if padding >= 0:
+            f.seek(0, os.SEEK_END)
+            f.write(rows.tobytes())
+            f.seek(prefix_length)
+            f.write((header + " " * padding + "\n").encode("latin1"))
+            return
+
+    np.save(path, np.concatenate((np.load(path), rows)))
@@ -0,0 +1,275 @@
+import os
+
+import numpy as np
+
+
+class ScalarQuantizer:
+    """
+    int8 scalar quantization of the NeoStore vectors.
+
+    Every dimension is mapped linearly from its [min, max] range to 256 levels
+    and stored as one byte, a 4x reduction over float32.
+    """
+
+    name = "int8"
+
+    def __init__(self, minimum: np.ndarray, scale: np.ndarray, codes=None) -> None:
+        """
+        Initialize the quantizer from its trained parameters.
+
+        Args:
+            minimum (np.ndarray): Minimum of every dimension, shape (dim,).
+            scale (np.ndarray): Width of one quantization level per dimension, shape (dim,).
+            codes (np.ndarray, optional): Codes of the store vectors, shape (num_docs, dim).
+        """
+        self.minimum = np.asarray(minimum, dtype=np.float32)
+        self.scale = np.asarray(scale, dtype=np.float32)
+        self.codes = (
+            np.empty((0, len(self.minimum)), dtype=np.uint8) if codes is None else codes
+        )
+
+    @classmethod
+    def train(cls, vectors: np.ndarray, batch_size: int = 65536, **kwargs):
+        """
+        Fit the per-dimension ranges of the vectors and encode them.
+
+        Args:
+            vectors (np.ndarray): Vectors of shape (num_docs, dim).
+            batch_size (int): Number of vectors processed at once.
+
+        Returns:
+            ScalarQuantizer: The trained quantizer holding the codes of ``vectors``.
+        """
+        minimum = np.full(vectors.shape[1], np.inf, dtype=np.float32)
+        maximum = np.full(vectors.shape[1], -np.inf, dtype=np.float32)
+        for start in range(0, vectors.shape[0], batch_size):
+            block = vectors[start : start + batch_size]
+            minimum = np.minimum(minimum, block.min(axis=0))
+            maximum = np.maximum(maximum, block.max(axis=0))
+
+        scale = np.maximum(maximum - minimum, 1e-12) / 255
+        quantizer = cls(minimum, scale)
+        quantizer.codes = quantizer.encode(vectors, batch_size)
+        return quantizer
+
+    def encode(self, vectors: np.ndarray, batch_size: int = 65536) -> np.ndarray:
+        """
+        Quantize vectors to codes.
+
+        Args:
+            vectors (np.ndarray): Vectors of shape (num_vectors, dim).
+            batch_size (int): Number of vectors processed at once.
+
+        Returns:
+            np.ndarray: uint8 codes of shape (num_vectors, dim).
+        """
+        codes = np.empty(vectors.shape, dtype=np.uint8)
+        for start in range(0, vectors.shape[0], batch_size):
+            block = (vectors[start : start + batch_size] - self.minimum) / self.scale
+            codes[start : start + batch_size] = np.clip(np.rint(block), 0, 255)
+        return codes
+
+    def dot(self, query: np.ndarray, rows: np.ndarray = None, batch_size: int = 16384):
+        """
+        Approximate the dot products between a query and the store vectors.
+
+        Since x ~= minimum + scale * code, q . x ~= q . minimum + (q * scale) . code.
+
+        Args:
+            query (np.ndarray): Query vector of shape (dim,).
+            rows (np.ndarray, optional): Row ids to score, or None for all rows.
+            batch_size (int): Number of codes decoded at once.
+
+        Returns:
+            np.ndarray: Approximate dot products of shape (num_rows,).
+        """
+        codes = self.codes if rows is None else self.codes[rows]
+        weights = (query * self.scale).astype(np.float32)
+        offset = np.float32(query @ self.minimum)
+
+        dots = np.empty(codes.shape[0], dtype=np.float32)
+        for start in range(0, codes.shape[0], batch_size):
+            block = codes[start : start + batch_size].astype(np.float32)
+            dots[start : start + batch_size] = block @ weights
+        return dots + offset
+
+    def save(self, path: str) -> None:
+        np.save(os.path.join(path, "quant_codes.npy"), self.codes)
+        np.save(os.path.join(path, "quant_min.npy"), self.minimum)
+        np.save(os.path.join(path, "quant_scale.npy"), self.scale)
+
+    @classmethod
+    def load(cls, path: str):
+        return cls(
+            np.load(os.path.join(path, "quant_min.npy")),
+            np.load(os.path.join(path, "quant_scale.npy")),
+            np.load(os.path.join(path, "quant_codes.npy")),
+        )
+
+
+class ProductQuantizer:
+    """
+    Product quantization (PQ) of the NeoStore vectors.
+
+    Vectors are split into ``num_subvectors`` contiguous sub-vectors and each of
+    them is replaced by the id of its nearest centroid in a per-subspace codebook
+    of 256 centroids, so a vector costs ``num_subvectors`` bytes.
+    """
+
+    name = "pq"
+
+    def __init__(self, codebooks: np.ndarray, codes=None) -> None:
+        """
+        Initialize the quantizer from its trained codebooks.
+
+        Args:
+            codebooks (np.ndarray): Centroids of shape (num_subvectors, ksub, dsub).
+            codes (np.ndarray, optional): Codes of the store vectors, shape (num_docs, num_subvectors).
+        """
+        self.codebooks = np.asarray(codebooks, dtype=np.float32)
+        self.codes = (
+            np.empty((0, self.num_subvectors), dtype=np.uint8) if codes is None else codes
+        )
+
+    @property
+    def num_subvectors(self) -> int:
+        return self.codebooks.shape[0]
+
+    @classmethod
+    def train(
+        cls,
+        vectors: np.ndarray,
+        num_subvectors: int = None,
+        n_iter: int = 15,
+        sample_size: int = 16384,
+        batch_size: int = 65536,
+        seed: int = 0,
+    ):
+        """
+        Train the per-subspace codebooks with k-means and encode the vectors.
+
+        Args:
+            vectors (np.ndarray): Vectors of shape (num_docs, dim).
+            num_subvectors (int, optional): Number of sub-vectors, which must
+                divide the dimension. Defaults to dim / 4, a 16x reduction.
+            n_iter (int): Number of k-means iterations.
+            sample_size (int): Number of vectors the codebooks are trained on.
+            batch_size (int): Number of vectors encoded at once.
+            seed (int): Seed for sampling and initialization.
+
+        Returns:
+            ProductQuantizer: The trained quantizer holding the codes of ``vectors``.
+        """
+        num_docs, dim = vectors.shape
+        if num_subvectors is None:
+            num_subvectors = dim // 4 if dim % 4 == 0 else dim
+        if dim % num_subvectors:
+            raise ValueError(
+                f"The number of sub-vectors ({num_subvectors}) must divide the dimension ({dim})."
+            )
+
+        rng = np.random.default_rng(seed)
+        sample_ids = np.sort(rng.choice(num_docs, min(num_docs, sample_size), replace=False))
+        sample = np.asarray(vectors[sample_ids], dtype=np.float32)
+        subspaces = sample.reshape(len(sample), num_subvectors, -1)
+
+        ksub = min(256, len(sample))
+        codebooks = np.stack(
+            [
+                cls._kmeans(subspaces[:, j], ksub, n_iter, rng)
+                for j in range(num_subvectors)
+            ]
+        )
+
+        quantizer = cls(codebooks)
+        quantizer.codes = quantizer.encode(vectors, batch_size)
+        return quantizer
+
+    @staticmethod
+    def _kmeans(points: np.ndarray, ksub: int, n_iter: int, rng) -> np.ndarray:
+        centroids = points[rng.choice(len(points), ksub, replace=False)].copy()
+        for _ in range(n_iter):
+            labels = ProductQuantizer._nearest(points, centroids)
+            counts = np.bincount(labels, minlength=ksub)
+
+            sums = np.zeros_like(centroids)
+            order = np.argsort(labels, kind="stable")
+            non_empty = np.flatnonzero(counts)
+            starts = np.concatenate(([0], np.cumsum(counts)))[non_empty]
+            sums[non_empty] = np.add.reduceat(points[order], starts, axis=0)
+
+            empty = counts == 0
+            centroids[~empty] = sums[~empty] / counts[~empty, None]
+            # Re-seed empty centroids with random points.
+            centroids[empty] = points[rng.choice(len(points), int(empty.sum()))]
+        return centroids
+
+    @staticmethod
+    def _nearest(points: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        # argmin ||p - c||^2 = argmin ||c||^2 - 2 p . c
+        distances = (centroids * centroids).sum(axis=1) - 2 * points @ centroids.T
+        return np.argmin(distances, axis=1)
+
+    def encode(self, vectors: np.ndarray, batch_size: int = 65536) -> np.ndarray:
+        """
+        Quantize vectors to codes.
+
+        Args:
+            vectors (np.ndarray): Vectors of shape (num_vectors, dim).
+            batch_size (int): Number of vectors processed at once.
+
+        Returns:
+            np.ndarray: uint8 codes of shape (num_vectors, num_subvectors).
+        """
+        codes = np.empty((vectors.shape[0], self.num_subvectors), dtype=np.uint8)
+        for start in range(0, vectors.shape[0], batch_size):
+            block = np.asarray(vectors[start : start + batch_size], dtype=np.float32)
+            block = block.reshape(len(block), self.num_subvectors, -1)
+            for j in range(self.num_subvectors):
+                codes[start : start + batch_size, j] = self._nearest(
+                    block[:, j], self.codebooks[j]
+                )
+        return codes
+
+    def dot(self, query: np.ndarray, rows: np.ndarray = None, batch_size: int = 16384):
+        """
+        Approximate the dot products between a query and the store vectors.
+
+        The dot products of every query sub-vector with its codebook are computed
+        once into a lookup table and summed per code (asymmetric distance).
+
+        Args:
+            query (np.ndarray): Query vector of shape (dim,).
+            rows (np.ndarray, optional): Row ids to score, or None for all rows.
+            batch_size (int): Number of codes looked up at once.
+
+        Returns:
+            np.ndarray: Approximate dot products of shape (num_rows,).
+        """
+        codes = self.codes if rows is None else self.codes[rows]
+        subqueries = np.asarray(query, dtype=np.float32).reshape(self.num_subvectors, -1)
+        table = np.einsum("mkd,md->mk", self.codebooks, subqueries)
+        subspace_ids = np.arange(self.num_subvectors)
+
+        dots = np.empty(codes.shape[0], dtype=np.float32)
+        for start in range(0, codes.shape[0], batch_size):
+            block = codes[start : start + batch_size]
+            dots[start : start + batch_size] = table[subspace_ids, block].sum(axis=1)
+        return dots
+
+    def save(self, path: str) -> None:
+        np.save(os.path.join(path, "quant_codes.npy"), self.codes)
+        np.save(os.path.join(path, "quant_codebooks.npy"), self.codebooks)
+
+    @classmethod
+    def load(cls, path: str):
+        return cls(
+            np.load(os.path.join(path, "quant_codebooks.npy")),
+            np.load(os.path.join(path, "quant_codes.npy")),
+        )
+
+
+QUANTIZER_MAP = {
+    ScalarQuantizer.name: ScalarQuantizer,
+    ProductQuantizer.name: ProductQuantizer,
+}
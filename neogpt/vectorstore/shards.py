@@ -0,0 +1,641 @@
+import heapq
+import json
+import multiprocessing
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+
+import numpy as np
+from settings import Settings
+from vectorstore.bm25 import CorpusStats
+from vectorstore.cache import LRUCache, embed_queries
+from vectorstore.neostore import (
+    RRF_K,
+    Document,
+    NeoMetric,
+    NeoSearchMode,
+    NeoStore,
+    load_embedding_model,
+)
+
+# Name of the sharded store directory created inside a parent directory such as
+# Settings.VECTOR_STORE_DIR, and the version of its manifest.
+SHARDS_NAME = "neostore_shards"
+SHARDS_FORMAT_VERSION = 1
+
+# Options of the shard stores that apply when a saved shard is opened.
+SHARD_LOAD_OPTIONS = ("index_type", "nprobe", "rerank_factor")
+
+# Shards opened by the current worker process, keyed by shard path.
+_worker_shards = {}
+
+
+def _worker_shard(path: str, similarity_metric: str, options: dict) -> NeoStore:
+    """
+    Get a shard in a worker process.
+
+    The shard is memory-mapped on first use and kept open for later queries.
+    """
+    store = _worker_shards.get(path)
+    if store is None:
+        store = NeoStore.load_embeddings(
+            path, similarity_metric=NeoMetric(similarity_metric), **options
+        )
+        _worker_shards[path] = store
+    return store
+
+
+def _call_on_shard(function, path: str, similarity_metric: str, options: dict, *args):
+    """Call a function on one shard in a worker process."""
+    return function(_worker_shard(path, similarity_metric, options), *args)
+
+
+def _search_shard(
+    store: NeoStore,
+    query_embeddings: np.ndarray,
+    k: int,
+    nprobe: int = None,
+    where: dict = None,
+    queries: list[str] = None,
+    mode: str = NeoSearchMode.DENSE.value,
+    bm25_stats: list = None,
+    with_vectors: bool = False,
+) -> list[list[Document]]:
+    """
+    Search one shard.
+
+    With ``with_vectors``, every result is a (document, unit vector) pair.
+    """
+    if not with_vectors:
+        return store._get_top_k_batch(
+            query_embeddings,
+            k,
+            nprobe=nprobe,
+            where=where,
+            queries=queries,
+            mode=NeoSearchMode(mode),
+            bm25_stats=bm25_stats,
+        )
+
+    rows = store._filter_rows(where)
+    results = []
+    for query_embedding, query, stats in zip(
+        query_embeddings, queries, bm25_stats or [None] * len(queries)
+    ):
+        indices, scores = store._rank(
+            query_embedding, k, nprobe, rows, query, NeoSearchMode(mode), bm25_stats=stats
+        )
+        results.append(
+            list(zip(store._to_documents(indices, scores), store._vectors(indices)))
+        )
+    return results
+
+
+def _result_score(result) -> float:
+    """The score of a document, or of a (document, vector) pair."""
+    doc = result if isinstance(result, Document) else result[0]
+    return doc.metadata["score"]
+
+
+def _shard_bm25_stats(store: NeoStore, queries: list[str]) -> list[CorpusStats]:
+    """Get the BM25 statistics of one shard for every query."""
+    return [store._sparse_index().stats(query) for query in queries]
+
+
+class ShardedNeoStore:
+    """
+    A NeoStore split into shard directories that are searched in parallel.
+
+    Queries are embedded once, every shard is searched by a pool of worker
+    processes and the per-shard results are merged into a global top-k. The
+    search interface is the same as NeoStore's.
+    """
+
+    def __init__(
+        self,
+        embedding_model=None,
+        similarity_metric=NeoMetric.COSINE,
+        num_shards: int = 4,
+        num_workers: int = None,
+        search_mode=NeoSearchMode.DENSE,
+        hybrid_weight: float = 0.5,
+        query_cache_size: int = 1024,
+        **store_kwargs,
+    ) -> None:
+        """
+        Initialize the ShardedNeoStore.
+
+        Args:
+            embedding_model (SentenceTransformer, optional): Model used to embed documents and queries.
+            similarity_metric (NeoMetric): Similarity metric to use.
+            num_shards (int): Number of shards built by ``build_store``.
+            num_workers (int, optional): Number of worker processes searching the
+                shards. Defaults to one per shard. 0 searches in-process.
+            search_mode (NeoSearchMode): Default retrieval mode of ``search``.
+            hybrid_weight (float): Weight of the dense ranking in hybrid search.
+            query_cache_size (int): Number of query embeddings and of search
+                results kept in the in-process LRU caches. 0 disables them.
+            **store_kwargs: Options such as ``index_type`` or ``quantization``
+                used to build every shard NeoStore.
+        """
+        self.similarity_metric = similarity_metric
+        self.num_shards = num_shards
+        self.num_workers = num_workers
+        self.search_mode = NeoSearchMode(search_mode)
+        self.hybrid_weight = hybrid_weight
+        self.store_kwargs = store_kwargs
+        self._query_embeddings = LRUCache(query_cache_size)
+        self._results = LRUCache(query_cache_size)
+        # Incremented whenever the searchable content changes.
+        self.generation = 0
+        self.path = None
+        self._embeddings_model = embedding_model
+        self._shard_paths = []
+        # Shard stores searched in-process, opened on demand.
+        self._shards = []
+        self._pool = None
+
+    @property
+    def embeddings_model(self):
+        if self._embeddings_model is None:
+            self._embeddings_model = load_embedding_model()
+        return self._embeddings_model
+
+    @embeddings_model.setter
+    def embeddings_model(self, embedding_model):
+        self._embeddings_model = embedding_model
+        self._query_embeddings.clear()
+        self._bump_generation()
+
+    @property
+    def cache_stats(self) -> dict:
+        """Hit statistics of the query embedding and search result caches."""
+        return {
+            "query_embeddings": self._query_embeddings.stats(),
+            "results": self._results.stats(),
+        }
+
+    def _bump_generation(self):
+        """Mark the store content as changed, invalidating cached search results."""
+        self.generation += 1
+        self._results.clear()
+
+    @property
+    def is_loaded(self) -> bool:
+        """Whether the store has shards that can be searched."""
+        return bool(self._shard_paths or self._shards)
+
+    @staticmethod
+    def _resolve_store_path(path: str) -> str:
+        if path.endswith(("/", os.sep)):
+            return os.path.join(path, SHARDS_NAME)
+        return path
+
+    def build_store(
+        self,
+        docs: list[Document],
+        batch_size: int = 32,
+        persist: bool = False,
+        embeddings_path: str = Settings.VECTOR_STORE_DIR,
+    ) -> None:
+        """
+        Split the documents into contiguous shards and build a NeoStore for each.
+
+        Args:
+            docs (List[Document]): List of documents as NamedTuple instances (Document).
+            batch_size (int): Batch size for processing documents.
+            persist (bool): Whether to persist the shards to disk. Only persisted
+                shards are searched by worker processes.
+            embeddings_path (str): Path of the sharded store directory, or of its
+                parent directory when it ends with a path separator.
+        """
+        self.close()
+        self._shard_paths = []
+        self._shards = []
+        self._bump_generation()
+
+        num_shards = max(1, min(self.num_shards, len(docs)))
+        shard_size = -(-len(docs) // num_shards)
+
+        for shard_id in range(num_shards):
+            shard = NeoStore(
+                self.embeddings_model, self.similarity_metric, **self.store_kwargs
+            )
+            shard.build_store(
+                docs[shard_id * shard_size : (shard_id + 1) * shard_size], batch_size
+            )
+            self._shards.append(shard)
+
+        if persist:
+            self.save_embeddings(embeddings_path)
+
+    def save_embeddings(self, path: str) -> None:
+        """
+        Save every shard as a NeoStore directory next to a shard manifest.
+
+        Args:
+            path (str): Path of the sharded store directory, or of its parent
+                directory when it ends with a path separator.
+        """
+        if not self._shards:
+            raise ValueError("Vector store is empty. Build the store first.")
+
+        path = self._resolve_store_path(path)
+        os.makedirs(path, exist_ok=True)
+
+        shard_names = [f"shard-{shard_id:03d}" for shard_id in range(len(self._shards))]
+        for name, shard in zip(shard_names, self._shards):
+            shard.save_embeddings(os.path.join(path, name))
+
+        with open(os.path.join(path, "shards.json"), "w") as f:
+            json.dump(
+                {
+                    "format": SHARDS_NAME,
+                    "version": SHARDS_FORMAT_VERSION,
+                    "shards": shard_names,
+                },
+                f,
+                indent=4,
+            )
+
+        # Remove shards left over from a previous build with more shards.
+        for name in os.listdir(path):
+            if name.startswith("shard-") and name not in shard_names:
+                shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+
+        self.path = path
+        self._shard_paths = [os.path.join(path, name) for name in shard_names]
+
+    @classmethod
+    def load_embeddings(
+        cls,
+        path: str,
+        embedder=None,
+        similarity_metric=NeoMetric.COSINE,
+        num_workers: int = None,
+        search_mode=NeoSearchMode.DENSE,
+        hybrid_weight: float = 0.5,
+        query_cache_size: int = 1024,
+        **store_kwargs,
+    ):
+        """
+        Open a sharded store directory.
+
+        Shards are memory-mapped by the process that searches them on first use.
+
+        Args:
+            path (str): Path of the sharded store directory, or of its parent
+                directory when it ends with a path separator.
+            embedder (SentenceTransformer, optional): SentenceTransformer model for embeddings.
+            similarity_metric (NeoMetric, optional): Similarity metric to use.
+            num_workers (int, optional): Number of worker processes. Defaults to
+                one per shard. 0 searches in-process.
+            search_mode (NeoSearchMode, optional): Default retrieval mode of ``search``.
+            hybrid_weight (float, optional): Weight of the dense ranking in hybrid search.
+            query_cache_size (int): Number of query embeddings and of search
+                results kept in the in-process LRU caches. 0 disables them.
+            **store_kwargs: Options of the shard NeoStores. Those in
+                ``SHARD_LOAD_OPTIONS``, such as ``nprobe``, apply to the opened
+                shards.
+
+        Returns:
+            ShardedNeoStore: The opened store.
+        """
+        path = cls._resolve_store_path(path)
+        with open(os.path.join(path, "shards.json")) as f:
+            manifest = json.load(f)
+
+        if manifest.get("format") != SHARDS_NAME:
+            raise ValueError(f"{path} is not a sharded NeoStore directory.")
+        if manifest.get("version", 0) > SHARDS_FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported sharded NeoStore format version {manifest['version']}. "
+                f"This version of NeoGPT supports up to {SHARDS_FORMAT_VERSION}."
+            )
+
+        store = cls(
+            embedder,
+            similarity_metric,
+            num_shards=len(manifest["shards"]),
+            num_workers=num_workers,
+            search_mode=search_mode,
+            hybrid_weight=hybrid_weight,
+            query_cache_size=query_cache_size,
+            **store_kwargs,
+        )
+        store.path = path
+        store._shard_paths = [os.path.join(path, name) for name in manifest["shards"]]
+        return store
+
+    def _load_options(self) -> dict:
+        """Options of the shard stores applied when saved shards are opened."""
+        return {
+            name: value
+            for name, value in self.store_kwargs.items()
+            if name in SHARD_LOAD_OPTIONS
+        }
+
+    def _open_shards(self) -> list[NeoStore]:
+        if not self._shards:
+            self._shards = [
+                NeoStore.load_embeddings(
+                    shard_path,
+                    self._embeddings_model,
+                    self.similarity_metric,
+                    **self._load_options(),
+                )
+                for shard_path in self._shard_paths
+            ]
+        return self._shards
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.num_workers or len(self._shard_paths),
+                # Forking a process that has loaded torch is unsafe.
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._pool
+
+    def close(self) -> None:
+        """Shut down the worker processes."""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def _map_shards(self, function, *args) -> list:
+        """
+        Call a function on every shard, in the worker processes if the shards
+        are persisted.
+
+        Args:
+            function (Callable): Module-level function taking the shard NeoStore
+                before ``args``.
+
+        Returns:
+            List: The result of every shard.
+        """
+        if self._shard_paths and self.num_workers != 0:
+            pool = self._get_pool()
+            futures = [
+                pool.submit(
+                    _call_on_shard,
+                    function,
+                    shard_path,
+                    self.similarity_metric.value,
+                    self._load_options(),
+                    *args,
+                )
+                for shard_path in self._shard_paths
+            ]
+            return [future.result() for future in futures]
+        return [function(shard, *args) for shard in self._open_shards()]
+
+    def _search_shards(
+        self,
+        query_embeddings: np.ndarray,
+        k: int,
+        nprobe: int,
+        where: dict,
+        queries: list[str],
+        mode: NeoSearchMode,
+        with_vectors: bool = False,
+    ) -> list[list[Document]]:
+        """
+        Search every shard and merge their dense or sparse results into a global top-k.
+
+        Sparse queries are scored with the BM25 statistics of all the shards,
+        so that the scores of different shards are comparable. With
+        ``with_vectors``, every result is a (document, unit vector) pair.
+        """
+        bm25_stats = None
+        if mode == NeoSearchMode.SPARSE:
+            shard_stats = self._map_shards(_shard_bm25_stats, queries)
+            bm25_stats = [CorpusStats.merge(stats) for stats in zip(*shard_stats)]
+
+        shard_results = self._map_shards(
+            _search_shard,
+            query_embeddings,
+            k,
+            nprobe,
+            where,
+            queries,
+            mode.value,
+            bm25_stats,
+            with_vectors,
+        )
+
+        # Cosine and BM25 scores are higher-is-better, euclidean is a distance.
+        select = (
+            heapq.nsmallest
+            if mode == NeoSearchMode.DENSE
+            and self.similarity_metric == NeoMetric.EUCLIDEAN
+            else heapq.nlargest
+        )
+        return [
+            select(k, chain(*query_results), key=_result_score)
+            for query_results in zip(*shard_results)
+        ]
+
+    def _get_top_k_batch(
+        self,
+        query_embeddings: np.ndarray,
+        k: int,
+        nprobe: int = None,
+        where: dict = None,
+        queries: list[str] = None,
+        mode=None,
+        hybrid_weight: float = None,
+        mmr_lambda: float = None,
+        fetch_k: int = None,
+    ) -> list[list[Document]]:
+        mode = self.search_mode if mode is None else NeoSearchMode(mode)
+        # With MMR, the global top fetch_k candidates are diversified down to k,
+        # so their vectors are returned by the shards along with them.
+        with_vectors = mmr_lambda is not None
+        num_candidates = k if mmr_lambda is None else max(k, fetch_k or 4 * k)
+
+        if mode != NeoSearchMode.HYBRID:
+            results = self._search_shards(
+                query_embeddings, num_candidates, nprobe, where, queries, mode, with_vectors
+            )
+        else:
+            weight = self.hybrid_weight if hybrid_weight is None else hybrid_weight
+            # As in NeoStore, fuse deeper rankings than k. Both global rankings are
+            # fused once here, since rank-based scores of shards are not comparable.
+            depth = max(4 * num_candidates, 50)
+            dense_results = self._search_shards(
+                query_embeddings,
+                depth,
+                nprobe,
+                where,
+                queries,
+                NeoSearchMode.DENSE,
+                with_vectors,
+            )
+            sparse_results = self._search_shards(
+                query_embeddings,
+                depth,
+                nprobe,
+                where,
+                queries,
+                NeoSearchMode.SPARSE,
+                with_vectors,
+            )
+            results = [
+                self._fuse_rankings(dense_docs, sparse_docs, num_candidates, weight)
+                for dense_docs, sparse_docs in zip(dense_results, sparse_results)
+            ]
+
+        if mmr_lambda is None:
+            return results
+        return [
+            [
+                candidates[position][0]
+                for position in NeoStore._select_mmr(
+                    query_embedding,
+                    np.array([vector for _, vector in candidates], dtype=np.float32),
+                    k,
+                    mmr_lambda,
+                )
+            ]
+            if candidates
+            else []
+            for query_embedding, candidates in zip(query_embeddings, results)
+        ]
+
+    @staticmethod
+    def _fuse_rankings(dense_docs, sparse_docs, k: int, weight: float) -> list[Document]:
+        """
+        Fuse global dense and sparse rankings with reciprocal rank fusion, as
+        ``NeoStore._hybrid_top_k`` does for the rows of a single store.
+
+        Rankings of (document, vector) pairs are fused into pairs.
+        """
+        fused = {}
+        for results, ranking_weight in ((dense_docs, weight), (sparse_docs, 1 - weight)):
+            for rank, result in enumerate(results, start=1):
+                doc, vector = (result, None) if isinstance(result, Document) else result
+                metadata = doc.metadata.copy()
+                del metadata["score"]
+                # Documents are identified by content and metadata across rankings.
+                key = (doc.content, json.dumps(metadata, sort_keys=True, default=str))
+                score, fused_doc, _ = fused.get(
+                    key, (0.0, Document(doc.content, metadata), vector)
+                )
+                fused[key] = (score + ranking_weight / (RRF_K + rank), fused_doc, vector)
+
+        top = sorted(fused.values(), key=lambda item: -item[0])[:k]
+        for score, doc, _ in top:
+            doc.metadata["score"] = float(np.float32(score))
+        return [doc if vector is None else (doc, vector) for _, doc, vector in top]
+
+    def search(
+        self,
+        query: str,
+        k: int = 5,
+        nprobe: int = None,
+        where: dict = None,
+        mode=None,
+        hybrid_weight: float = None,
+        mmr_lambda: float = None,
+        fetch_k: int = None,
+    ) -> list[Document]:
+        """
+        Search for top-k documents similar to a given query across all shards.
+
+        Args:
+            query (str): Query string.
+            k (int): Number of top-k documents to retrieve.
+            nprobe (int, optional): Number of IVF clusters to scan in IVF shards.
+            where (dict, optional): Metadata filter, see ``MetadataIndex``.
+            mode (NeoSearchMode, optional): Dense, sparse or hybrid retrieval.
+            hybrid_weight (float, optional): Weight of the dense ranking in hybrid search.
+            mmr_lambda (float, optional): Enables maximal marginal relevance over
+                the global top ``fetch_k`` candidates, see ``NeoStore.search``.
+            fetch_k (int, optional): Number of MMR candidates. Defaults to 4 * k.
+
+        Returns:
+            List[Document]: List of top-k documents with content and metadata.
+        """
+        key = (
+            self.generation,
+            query,
+            k,
+            nprobe,
+            json.dumps(where, sort_keys=True, default=str) if where else None,
+            self.search_mode if mode is None else NeoSearchMode(mode),
+            self.hybrid_weight if hybrid_weight is None else hybrid_weight,
+            mmr_lambda,
+            fetch_k,
+        )
+
+        results = self._results.get(key)
+        if results is None:
+            results = self.search_batch(
+                [query], k, nprobe, where, mode, hybrid_weight, mmr_lambda, fetch_k
+            )[0]
+            self._results.put(key, results)
+
+        # Callers own the returned metadata, so the cached documents are copied.
+        return [Document(doc.content, doc.metadata.copy()) for doc in results]
+
+    def search_batch(
+        self,
+        queries: list[str],
+        k: int = 5,
+        nprobe: int = None,
+        where: dict = None,
+        mode=None,
+        hybrid_weight: float = None,
+        mmr_lambda: float = None,
+        fetch_k: int = None,
+    ) -> list[list[Document]]:
+        """
+        Search for the top-k documents of many queries across all shards.
+
+        Every shard receives all the query embeddings in a single task. Sparse
+        queries are scored in every shard with the BM25 statistics of all the
+        shards, and hybrid queries fuse the merged dense and sparse rankings of
+        all the shards, so the results match those of a single store.
+
+        Args:
+            queries (List[str]): Query strings.
+            k (int): Number of top-k documents to retrieve per query.
+            nprobe (int, optional): Number of IVF clusters to scan in IVF shards.
+            where (dict, optional): Metadata filter applied to every query.
+            mode (NeoSearchMode, optional): Dense, sparse or hybrid retrieval.
+            hybrid_weight (float, optional): Weight of the dense ranking in hybrid search.
+            mmr_lambda (float, optional): Enables maximal marginal relevance, see
+                ``search``.
+            fetch_k (int, optional): Number of MMR candidates. Defaults to 4 * k.
+
+        Returns:
+            List[List[Document]]: Top-k documents for each query, in input order.
+        """
+        assert k >= 1, f"K should be greater than 0. Got: {k}"
+        queries = list(queries)
+        mode = self.search_mode if mode is None else NeoSearchMode(mode)
+        query_embeddings = (
+            None
+            if mode == NeoSearchMode.SPARSE and mmr_lambda is None
+            else self._embed_queries(queries)
+        )
+        return self._get_top_k_batch(
+            query_embeddings,
+            k,
+            nprobe,
+            where,
+            queries,
+            mode,
+            hybrid_weight,
+            mmr_lambda,
+            fetch_k,
+        )
+
+    def _embed_queries(self, queries: list[str]) -> np.ndarray:
+        """Embed queries, reusing the cached embeddings of repeated queries."""
+        return embed_queries(
+            queries, self._query_embeddings, lambda misses: self.embeddings_model.encode(misses)
+        )